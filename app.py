@@ -10,6 +10,7 @@ import os
 import shutil
 import tempfile
 import atexit
+from datetime import date
 
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -21,6 +22,9 @@ from db_utils import get_connection, close_db, get_setting, initialize_pool, exe
 from utils.extensions import limiter
 from utils.logger import logger
 from utils.face_encoder import face_encoder
+from utils.gallery_sync import ensure_changelog_table
+from utils.kiosk_state import kiosk_states
+from utils.attendance_marks import ensure_attendance_key, today_attendance
 from utils.email_service import email_service
 from utils.simple_audio import simple_audio
 from utils.csrf_exemptions import setup_csrf_exemptions
@@ -235,6 +239,16 @@ def _log_session_and_flashes():
     except Exception:
         logger.exception("Error in _log_session_and_flashes")
 
+@app.before_request
+def _sync_face_gallery():
+    """Apply enrollments made in other workers (at most once per second)."""
+    if request.path.startswith('/static'):
+        return
+    try:
+        face_encoder.sync_changes()
+    except Exception:
+        logger.exception("Gallery sync failed")
+
 @app.route("/about")
 def about():
     """Render about page."""
@@ -436,6 +450,10 @@ with app.app_context():
             except Exception:
                 logger.exception("Error parsing min_confidence from settings")
 
+            # Kiosk liveness backend
+            if saved_settings.get('liveness_backend'):
+                app.config['LIVENESS_BACKEND'] = saved_settings.get('liveness_backend')
+
             # Camera index
             try:
                 if 'camera_index' in saved_settings:
@@ -469,10 +487,26 @@ with app.app_context():
     except Exception as e:
         logger.exception("Failed to sync settings from DB at startup: %s", e)
 
+    try:
+        ensure_changelog_table()
+    except Exception as e:
+        logger.error("Failed to create face_data_changes table: %s", e, exc_info=True)
+
+    try:
+        kiosk_states.ensure_table()
+    except Exception as e:
+        logger.error("Failed to create kiosk_state table: %s", e, exc_info=True)
+
+    # Unique (employee_id, date) key for the single-statement kiosk attendance upsert
+    ensure_attendance_key()
+    # Today's marks for kiosk cooldown / already-checked-out answers without a query
+    if today_attendance is not None:
+        today_attendance.warm(date.today())
+
     logger.info("Loading face embeddings from database...")
     try:
         face_encoder.load_all_embeddings()
-        logger.info("Successfully loaded %s face embeddings", len(face_encoder.embeddings))
+        logger.info("Successfully loaded %s face embeddings", face_encoder.embedding_count)
     except Exception as e:
         logger.error("Failed to load face embeddings: %s", e, exc_info=True)
         logger.warning("Application will start but face recognition may not work properly")
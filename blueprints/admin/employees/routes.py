@@ -17,7 +17,7 @@ from datetime import datetime
 from werkzeug.utils import secure_filename
 from mysql.connector import IntegrityError
 from utils.db import get_db
-from utils.face_encoder import face_encoder, invalidate_embeddings_cache
+from utils.face_encoder import face_encoder
 from utils.logger import logger
 from db_utils import log_audit
 from blueprints.auth.utils import login_required, role_required
@@ -41,6 +41,12 @@ def deactivate_employee(emp_id):
     """, (emp_id,))
     db.commit()
 
+    # Inactive employees must no longer be recognized (in every worker)
+    try:
+        face_encoder.publish_change(emp_id)
+    except Exception as e:
+        logger.error(f"Gallery update failed for employee {emp_id}: {e}", exc_info=True)
+
     log_audit(
         user_id=session.get("user_id"),
         action="EMPLOYEE_DEACTIVATED",
@@ -68,6 +74,12 @@ def activate_employee(emp_id):
     """, (emp_id,))
     db.commit()
 
+    # Re-add this employee's face here and in the other workers
+    try:
+        face_encoder.publish_change(emp_id)
+    except Exception as e:
+        logger.error(f"Gallery update failed for employee {emp_id}: {e}", exc_info=True)
+
     log_audit(
         user_id=session.get("user_id"),
         action="EMPLOYEE_ACTIVATED",
@@ -606,9 +618,12 @@ def edit_employee(emp_id):
         
         db.commit()
 
-        # Invalidate cache if photo was updated
-        if update_photo:
-            invalidate_embeddings_cache()
+        # Patch this employee in every worker's gallery: covers a new photo
+        # as well as status/name/department changes, with single-row reads.
+        try:
+            face_encoder.publish_change(emp_id)
+        except Exception as e:
+            logger.error(f"Gallery update failed for employee {emp_id}: {e}", exc_info=True)
 
         # Audit log
         log_audit(
@@ -722,24 +737,11 @@ def process_face_request(request_id, action):
                 logger.error(f"Exception while encoding face for request id={request_id}: {e}", exc_info=True)
                 return jsonify({"success": False, "message": "Error encoding face"}), 500
 
-            # Check for duplicate faces against other employees
-            cursor.execute("SELECT emp_id, embedding FROM face_data WHERE emp_id != %s", (request_data["emp_id"],))
-            existing_faces = cursor.fetchall()
-            
-            # Find best match (highest similarity)
-            max_sim = -1
-            matched_emp_id = None
-            for row in existing_faces:
-                existing_emb = face_encoder._decode_embedding(row['embedding'])
-                # Normalize embeddings
-                emb_norm = embedding / np.linalg.norm(embedding)
-                existing_emb_norm = existing_emb / np.linalg.norm(existing_emb)
-                sim = np.dot(emb_norm, existing_emb_norm)
-                if sim > max_sim:
-                    max_sim = sim
-                    matched_emp_id = row['emp_id']
-            
-            if max_sim >= 0.90:
+            # Check for duplicate faces against other employees (in-memory gallery search)
+            duplicate = face_encoder.find_duplicate(embedding, request_data["emp_id"], 0.90)
+
+            if duplicate:
+                matched_emp_id, max_sim = duplicate
                 # Fetch matched employee name
                 cursor.execute("SELECT full_name FROM employees WHERE id = %s", (matched_emp_id,))
                 matched_emp = cursor.fetchone()
@@ -793,9 +795,6 @@ def process_face_request(request_id, action):
                 WHERE id = %s
             """, (session.get("user_id"), request_id))
 
-            # Invalidate cache
-            invalidate_embeddings_cache()
-
         elif action == "reject":
             # Update request
             cursor.execute("""
@@ -811,6 +810,13 @@ def process_face_request(request_id, action):
 
         db.commit()
 
+        if action == "approve":
+            # Patch this employee in every worker's gallery (no full reload)
+            try:
+                face_encoder.publish_change(request_data["emp_id"])
+            except Exception as e:
+                logger.error(f"Gallery update failed for employee {request_data['emp_id']}: {e}", exc_info=True)
+
         # Get employee details for email (use full_name column)
         cursor.execute("SELECT full_name AS name, email FROM employees WHERE id = %s", (request_data["emp_id"],))
         employee = cursor.fetchone()
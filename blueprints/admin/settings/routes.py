@@ -9,6 +9,7 @@ from . import bp
 from werkzeug.utils import secure_filename
 from PIL import Image
 import cv2
+from utils.liveness_backends import LIVENESS_BACKENDS
 
 UPLOAD_FOLDER = "static/uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -31,7 +32,8 @@ DEFAULTS = {
     "camera_device": "0",
     "session_timeout": "30",
     "login_alerts": "off",
-    "exit_pin": ""
+    "exit_pin": "",
+    "liveness_backend": "heuristic"
 }
 
 
@@ -275,6 +277,12 @@ def _validate_settings_payload(data):
         if v != "" and (len(v) != 4 or not v.isdigit()):
             return False, "exit_pin must be empty or exactly 4 digits"
 
+    # liveness_backend: enum
+    if 'liveness_backend' in settings_data:
+        v = str(settings_data.get('liveness_backend'))
+        if v not in LIVENESS_BACKENDS:
+            return False, f"liveness_backend must be one of: {', '.join(LIVENESS_BACKENDS)}"
+
     return True, None
 
 
@@ -436,6 +444,10 @@ def settings_api():
             except Exception:
                 pass
 
+        # Kiosk liveness backend -> LIVENESS_BACKEND
+        if 'liveness_backend' in data:
+            current_app.config['LIVENESS_BACKEND'] = data.get('liveness_backend')
+
         # Camera device (runtime default)
         if 'camera_device' in data:
             try:
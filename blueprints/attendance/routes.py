@@ -1,3 +1,4 @@
+from utils.attendance_marks import today_attendance
 from utils.email_service import EmailService
 from utils.db import get_db
 from flask import current_app, render_template, request, session, jsonify
@@ -678,6 +679,8 @@ def api_complete_checkout(attendance_id):
         """, (check_out_time, working_hours, check_out_time, attendance_id))
 
         db.commit()
+        if today_attendance is not None:
+            today_attendance.forget(record["employee_id"])
 
         # Send email notification if email is configured
         if record["email"] and current_app:
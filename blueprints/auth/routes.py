@@ -8,12 +8,12 @@ from .utils import get_user_by_username, verify_password, login_required
 from db_utils import get_connection
 from db_utils import execute, log_audit
 from utils.db import get_db
-import base64, io, json
-from PIL import Image
 from datetime import datetime
 import numpy as np
 import cv2
 from utils.face_encoder import face_encoder
+from utils.frame_quality import assess_frame
+from utils.frame_upload import request_frame
 from utils.logger import logger
 
 
@@ -488,17 +488,19 @@ def face_login_api():
         logger.exception('Unexpected error validating CSRF token: %s', e)
         return jsonify({"matched": False, "reason": "Security validation failed. Please refresh the page."}), 403
     
-    data = request.get_json()
-    if not data or "image" not in data:
-        return jsonify({"matched": False, "reason": "No image received"})
-
+    # Raw image/jpeg body, multipart or JSON {"image": base64}
     try:
-        img_str = data["image"].split(",")[1]
-        img_bytes = base64.b64decode(img_str)
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-        frame_rgb = np.array(img)
-    except:
+        frame = request_frame("image")
+    except ValueError:
         return jsonify({"matched": False, "reason": "Invalid image format"})
+    if frame is None:
+        return jsonify({"matched": False, "reason": "No image received"})
+
+    # Frames too dark / bright / blurry for an embedding never reach the model
+    quality = assess_frame(frame)
+    if not quality.ok:
+        return jsonify({"matched": False, "reason": quality.message, "quality": quality.reason})
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
     emb = face_encoder.get_embedding(frame_rgb)
     if emb is None:
@@ -510,7 +512,7 @@ def face_login_api():
             pass
         return jsonify({"matched": False, "reason": "No face detected in frame"})
 
-    face_encoder.load_all_embeddings()
+    # Gallery is kept current by the enrollment routes; no reload per login
     result = face_encoder.match(emb)
 
     if result is None:
@@ -773,52 +775,21 @@ def detect_face():
     Returns: {"face_count": int, "distance": "perfect|far|close", "lighting": "good|dark|bright"}
     """
     try:
-        data = request.get_json()
-        if not data:
-            logger.warning("No JSON data received in detect_face request")
-            return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
-        
-        image_base64 = data.get("image")
-        if not image_base64:
-            logger.warning("No image data in detect_face request")
-            return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
-        
-        # More robust base64 decoding
+        # Raw image/jpeg body, multipart or JSON {"image": base64}
         try:
-            if "," in image_base64:
-                # Handle data URL format: "data:image/jpeg;base64,actualdata"
-                image_data = base64.b64decode(image_base64.split(",")[1])
-            else:
-                # Handle raw base64
-                image_data = base64.b64decode(image_base64)
-        except Exception as e:
-            logger.error(f"Base64 decode error: {e}")
-            return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
-        
-        # Decode image
-        try:
-            np_arr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        except Exception as e:
+            img = request_frame("image")
+        except ValueError as e:
             logger.error(f"Image decode error: {e}")
             return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
         
         if img is None:
-            logger.warning("Image decode returned None")
-            return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
-        
-        # Convert BGR to RGB
-        try:
-            rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        except Exception as e:
-            logger.error(f"Color conversion error: {e}")
+            logger.warning("No image in detect_face request")
             return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
         
-        # Detect faces
+        # Detect faces (detection model only, on a 320 px wide copy)
         try:
-            import face_recognition
-            face_locations = face_recognition.face_locations(rgb, model="hog")
-            face_count = len(face_locations)
+            faces = face_encoder.profile("detect-only").get(img)
+            face_count = len(faces)
         except Exception as e:
             logger.error(f"Face detection error: {e}")
             return jsonify({"face_count": 0, "distance": "unknown", "lighting": "unknown"})
@@ -829,7 +800,7 @@ def detect_face():
         if face_count == 1:
             try:
                 # Calculate distance based on face size
-                top, right, bottom, left = face_locations[0]
+                left, top, right, bottom = faces[0].bbox
                 face_height = bottom - top
                 face_width = right - left
                 face_size = (face_height + face_width) / 2
@@ -1,6 +1,7 @@
 from . import bp
 from flask import render_template, request, redirect, url_for, session, flash, jsonify, send_file, current_app, make_response
 from utils.db import get_db
+from utils.face_encoder import face_encoder
 from werkzeug.security import check_password_hash, generate_password_hash
 import io
 from reportlab.pdfgen import canvas
@@ -15,8 +16,22 @@ from utils.helpers import generate_unique_filename, ensure_folder
 from utils.email_service import EmailService
 from flask_wtf.csrf import CSRFProtect
 from blueprints.auth.utils import login_required
+from utils.logger import logger
 csrf = CSRFProtect()
 
+
+def _publish_gallery_change(employee_id):
+    """Refresh the employee's kiosk details in every worker's gallery.
+
+    Runs after the edit is committed, so a failure is only logged: the
+    change-log sync of the other workers catches up.
+    """
+    try:
+        face_encoder.publish_change(employee_id)
+    except Exception as e:
+        logger.error(f"Gallery update failed for employee {employee_id}: {e}", exc_info=True)
+
+
 # ================================
 # EMPLOYEE DASHBOARD
 # ================================
@@ -119,6 +134,7 @@ def profile():
                 WHERE id = %s
             """, (employee_id,))
             db.commit()
+            _publish_gallery_change(employee_id)
 
             flash('Profile photo removed successfully', 'success')
             return redirect(url_for('employee.profile'))
@@ -161,6 +177,7 @@ def profile():
                             WHERE id = %s
                         """, (photo_path, employee_id))
                         db.commit()
+                        _publish_gallery_change(employee_id)
 
                         flash('Profile photo updated successfully', 'success')
                     except Exception as e:
@@ -190,6 +207,7 @@ def profile():
             """, (email, user_id))
 
             db.commit()
+            _publish_gallery_change(employee_id)
             flash('Profile updated successfully', 'success')
             session['full_name'] = full_name
         else:
@@ -952,7 +970,7 @@ def submit_face_request():
         #     return jsonify({'status': 'error', 'message': 'Photo is too blurry. Please take a clear photo.'}), 400
 
         # B. Face Detection (Presence Control)
-        faces = face_encoder.app.get(frame)
+        faces = face_encoder.profile("kiosk").get(frame)
         if len(faces) == 0:
             return jsonify({'status': 'error', 'message': 'No face detected in the photo.'}), 400
         if len(faces) > 1:
@@ -972,16 +990,10 @@ def submit_face_request():
         # D. Duplicate Check (Prevent same person multiple enrollments)
         DUPLICATE_FACE_THRESHOLD = 0.5  # Same as admin side
         
-        # Check existing face data
-        cur.execute("SELECT emp_id, embedding FROM face_data WHERE emp_id != %s", (employee_id,))
-        existing_faces = cur.fetchall()
-        
-        for face_row in existing_faces:
-            existing_emb = face_encoder._decode_embedding(face_row['embedding'])
-            # Compute cosine similarity (both are normalized)
-            sim = np.dot(embedding, existing_emb)
-            if sim >= DUPLICATE_FACE_THRESHOLD:
-                return jsonify({"status": "error", "message": f"Face already enrolled for employee ID {face_row['emp_id']}"}), 400
+        # Check existing face data (in-memory gallery search)
+        duplicate = face_encoder.find_duplicate(embedding, employee_id, DUPLICATE_FACE_THRESHOLD)
+        if duplicate:
+            return jsonify({"status": "error", "message": f"Face already enrolled for employee ID {duplicate[0]}"}), 400
         
         # --- CHECK KHATAM, AB SAVE KARO ---
 
@@ -9,7 +9,8 @@ from utils.helpers import generate_unique_filename, ensure_folder
 from blueprints.auth.utils import login_required, role_required
 
 from blueprints.kiosk import utils as kiosk_utils
-from utils.face_encoder import invalidate_embeddings_cache, face_encoder
+from utils.face_encoder import face_encoder
+from utils.frame_quality import assess_frame
 from flask_wtf.csrf import CSRFProtect
 csrf = CSRFProtect()
 # import face_recognition  # Moved to local import to avoid startup issues
@@ -125,17 +126,15 @@ def capture_face():
         except Exception:
             return jsonify({"status": "error", "message": "Invalid image format"}), 400
 
-        # --- BLUR CHECK START --- (COMMENTED OUT FOR DEMO)
-        # gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        # 
-        # # If variance is less than 80, the image is blurry
-        # if laplacian_var < 80: 
-        #     return jsonify({
-        #         "status": "error", 
-        #         "message": f"Photo is too blurry (Quality: {laplacian_var:.1f}). Please take a clear photo."
-        #     }), 400
-        # --- BLUR CHECK END ---
+        # Quality gate: reject unusable captures before face detection
+        quality = assess_frame(frame)
+        if not quality.ok:
+            return jsonify({
+                "status": "quality_failed",
+                "reason": quality.reason,
+                "feedback": quality.message,
+                "message": quality.message
+            })
 
         # Save temporary image
         temp_folder = os.path.join("static", "temp")
@@ -150,7 +149,7 @@ def capture_face():
                 f.write(base64.b64decode(image_base64.split(',',1)[1] if ',' in image_base64 else image_base64))
 
         # Proceed to detect face and store embedding
-        faces = face_encoder.app.get(frame)
+        faces = face_encoder.profile("kiosk").get(frame)
         
         # Filter faces by minimum confidence
         from flask import current_app
@@ -177,26 +176,18 @@ def capture_face():
         face = faces[0]
         embedding = face.normed_embedding.astype("float32")
 
-        # Check for duplicate faces across employees
-        db_check = get_db()
-        cursor_check = db_check.cursor(dictionary=True)
-        cursor_check.execute("SELECT emp_id, embedding FROM face_data WHERE emp_id != %s", (employee_id,))
-        existing_faces = cursor_check.fetchall()
-        cursor_check.close()
-
-        for face_row in existing_faces:
-            existing_emb = face_encoder._decode_embedding(face_row['embedding'])
-            # Compute cosine similarity (both are normalized)
-            sim = np.dot(embedding, existing_emb)
-            if sim >= DUPLICATE_FACE_THRESHOLD:  # Prevent duplicate enrollment
-                # Log duplicate detection for audit
-                user_id = session.get('user_id', 'unknown')
-                log.warning(f"DUPLICATE FACE DETECTED: User {user_id} tried to enroll employee {employee_id}, matched with existing employee {face_row['emp_id']}, similarity {sim:.3f}")
-                try:
-                    os.remove(temp_path)
-                except Exception:
-                    pass
-                return jsonify({"status": "duplicate", "message": f"Face already enrolled for employee ID {face_row['emp_id']}"}), 409
+        # Check for duplicate faces across employees (in-memory gallery search)
+        duplicate = face_encoder.find_duplicate(embedding, employee_id, DUPLICATE_FACE_THRESHOLD)
+        if duplicate:  # Prevent duplicate enrollment
+            dup_emp_id, sim = duplicate
+            # Log duplicate detection for audit
+            user_id = session.get('user_id', 'unknown')
+            log.warning(f"DUPLICATE FACE DETECTED: User {user_id} tried to enroll employee {employee_id}, matched with existing employee {dup_emp_id}, similarity {sim:.3f}")
+            try:
+                os.remove(temp_path)
+            except Exception:
+                pass
+            return jsonify({"status": "duplicate", "message": f"Face already enrolled for employee ID {dup_emp_id}"}), 409
 
         emb_bytes = embedding.astype(np.float32).tobytes()
 
@@ -229,22 +220,12 @@ def capture_face():
             except Exception:
                 pass
             return jsonify({"status": "error", "message": f"Database error: {str(e)}"}), 500
+        # Patch the recognizer gallery (embedding and kiosk details) here
+        # and in the other workers, without a full reload.
         try:
-            kiosk_utils.reload_embeddings(force=True)
-        except TypeError:
-            # older signature: call without force
-            kiosk_utils.reload_embeddings()
-        # Invalidate face-encoder cache so recognizer reloads from DB
-        try:
-            invalidate_embeddings_cache()
-        except Exception:
-            pass
-        # Immediately reload face_encoder embeddings so kiosk recognizer
-        # sees the new embedding without waiting for another trigger.
-        try:
-            face_encoder.load_all_embeddings()
-        except Exception:
-            pass
+            face_encoder.publish_change(employee_id)
+        except Exception as e:
+            log.error(f"Gallery update failed for employee {employee_id}: {e}", exc_info=True)
 
         return jsonify({
             "status": "success",
@@ -309,20 +290,18 @@ def update_capture_face():
         except Exception:
             return jsonify({"status": "error", "message": "Invalid image format"}), 400
 
-        # --- BLUR CHECK START --- (COMMENTED OUT FOR DEMO)
-        # gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        # 
-        # # If variance is less than 80, the image is blurry
-        # if laplacian_var < 80: 
-        #     return jsonify({
-        #         "status": "error", 
-        #         "message": f"Photo is too blurry (Quality: {laplacian_var:.1f}). Please take a clear photo."
-        #     }), 400
-        # --- BLUR CHECK END ---
+        # Quality gate: reject unusable captures before face detection
+        quality = assess_frame(frame)
+        if not quality.ok:
+            return jsonify({
+                "status": "quality_failed",
+                "reason": quality.reason,
+                "feedback": quality.message,
+                "message": quality.message
+            })
 
         # Check for faces before embedding
-        faces = face_encoder.app.get(frame)
+        faces = face_encoder.profile("kiosk").get(frame)
         
         # Filter faces by minimum confidence
         from flask import current_app
@@ -341,22 +320,14 @@ def update_capture_face():
         face = faces[0]
         embedding = face.normed_embedding.astype("float32")
 
-        # Check for duplicate faces across other employees
-        db_check = get_db()
-        cursor_check = db_check.cursor(dictionary=True)
-        cursor_check.execute("SELECT emp_id, embedding FROM face_data WHERE emp_id != %s", (employee_id,))
-        existing_faces = cursor_check.fetchall()
-        cursor_check.close()
-
-        for face_row in existing_faces:
-            existing_emb = face_encoder._decode_embedding(face_row['embedding'])
-            # Compute cosine similarity (both are normalized)
-            sim = np.dot(embedding, existing_emb)
-            if sim >= DUPLICATE_FACE_THRESHOLD:  # Prevent duplicate enrollment
-                # Log duplicate detection for audit
-                user_id = session.get('user_id', 'unknown')
-                log.warning(f"DUPLICATE FACE DETECTED: User {user_id} tried to update enrollment for employee {employee_id}, matched with existing employee {face_row['emp_id']}, similarity {sim:.3f}")
-                return jsonify({"status": "duplicate", "message": f"Face already enrolled for employee ID {face_row['emp_id']}"}), 409
+        # Check for duplicate faces across other employees (in-memory gallery search)
+        duplicate = face_encoder.find_duplicate(embedding, employee_id, DUPLICATE_FACE_THRESHOLD)
+        if duplicate:  # Prevent duplicate enrollment
+            dup_emp_id, sim = duplicate
+            # Log duplicate detection for audit
+            user_id = session.get('user_id', 'unknown')
+            log.warning(f"DUPLICATE FACE DETECTED: User {user_id} tried to update enrollment for employee {employee_id}, matched with existing employee {dup_emp_id}, similarity {sim:.3f}")
+            return jsonify({"status": "duplicate", "message": f"Face already enrolled for employee ID {dup_emp_id}"}), 409
 
         embedding_bytes = embedding.astype(np.float32).tobytes()
 
@@ -405,18 +376,11 @@ def update_capture_face():
                 os.remove(image_path)
             return jsonify({"status": "error", "message": f"Database error: {str(e)}"}), 500
 
-        # Reload embeddings
-        try:
-            kiosk_utils.reload_embeddings(force=True)
-        except TypeError:
-            kiosk_utils.reload_embeddings()
-
-        invalidate_embeddings_cache()
-
+        # Patch every worker's recognizer gallery (no full reload)
         try:
-            face_encoder.load_all_embeddings()
-        except Exception:
-            pass
+            face_encoder.publish_change(employee_id)
+        except Exception as e:
+            log.error(f"Gallery update failed for employee {employee_id}: {e}", exc_info=True)
 
         return jsonify({
             "status": "success",
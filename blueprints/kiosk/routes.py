@@ -3,10 +3,18 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from markupsafe import escape
 from blueprints.auth.utils import login_required, role_required
 from . import bp
-from .utils import recognize_and_mark, decode_frame
-from utils.liveness_detector import LivenessDetector
+from .utils import recognize_and_mark, kiosk_id
+from utils.liveness_backends import check_clip, get_liveness_backend
+from utils.face_encoder import face_encoder
+from utils.kiosk_state import kiosk_states
+from utils.frame_gate import FrameGateRegistry
+from utils.frame_quality import assess_frame
+from utils.frame_upload import request_frame, request_frames
+from utils.capture_profile import LoadMonitor, capture_profile
+from utils.inference_profiles import PROFILES
 from db_utils import get_setting, set_setting
 from utils.logger import logger
+import os
 import time
 import random
 import re
@@ -51,8 +59,45 @@ def enforce_kiosk_lock():
         return redirect(url_for("kiosk.kiosk_page"))
 
 
-# --- Global liveness detector (single instance for the blueprint) ---
-liveness = LivenessDetector()
+# --- Per-kiosk change gate: unchanged frames replay the last response ---
+frame_gates = FrameGateRegistry()
+
+# --- Recent /kiosk/recognize and /kiosk/recognize_clip latency, used to size client captures ---
+kiosk_load = LoadMonitor()
+
+# Most frames /kiosk/recognize_clip evaluates from one burst
+_KIOSK_CLIP_MAX_FRAMES = int(os.getenv("KIOSK_CLIP_MAX_FRAMES", "16"))
+
+
+def kiosk_liveness_backend():
+    """Liveness backend picked by the `liveness_backend` setting."""
+    return get_liveness_backend(current_app.config.get("LIVENESS_BACKEND", "heuristic"))
+
+
+def check_kiosk_liveness(state, frame):
+    """Run one frame through the configured liveness backend.
+
+    Multi-frame backends keep their window in `state`. Returns (is_live,
+    confidence, message, faces): the faces liveness looked at, handed on
+    to recognition so the frame goes through the face detector once
+    (None when the backend needed no detections).
+    """
+    backend = kiosk_liveness_backend()
+    faces = None
+    if backend.profile:
+        faces = face_encoder.profile(backend.profile).get(frame, embed=False)
+    return backend.check(state, frame, faces)
+
+
+def check_clip_liveness(state, frames, qualities):
+    """Run a burst through the kiosk's liveness window (see check_clip).
+
+    Returns (is_live, confidence, message, best, faces): the live frame to
+    recognize and the live faces in it.
+    """
+    backend = kiosk_liveness_backend()
+    return check_clip(backend, state, frames, qualities,
+                      lambda frame: face_encoder.profile(backend.profile).get(frame, embed=False))
 
 
 # ---------------------------------------------------------
@@ -66,7 +111,8 @@ def kiosk_page():
     
     # Reset liveness on page load - require fresh liveness check
     session.pop("lv_pass", None)
-    liveness.reset()  # Clear liveness detector state
+    kiosk_states.reset(kiosk_id())  # Clear liveness window, cooldowns and face tracks
+    frame_gates.reset(kiosk_id())
     
     return render_template("kiosk.html")
 
@@ -78,20 +124,20 @@ def kiosk_page():
 def liveness_check():
     """Real liveness detection - prevents photo/video spoofing"""
     try:
-        data = request.get_json()
-        frame_b64 = data.get("frame")
-
-        # Use centralized decoder
+        # Raw image/jpeg body, multipart or JSON {"frame": base64}
         try:
-            pil_img, frame = decode_frame(frame_b64)
+            frame = request_frame("frame")
         except Exception:
             frame = None
 
         if frame is None:
             return jsonify({"success": False, "message": "Invalid frame"}), 400
         
-        # ACTUAL LIVENESS DETECTION using LivenessDetector
-        is_live, confidence, message = liveness.check_liveness(frame)
+        # ACTUAL LIVENESS DETECTION, continuing this kiosk's window
+        kiosk = kiosk_id()
+        state = kiosk_states.load(kiosk)
+        is_live, confidence, message, _ = check_kiosk_liveness(state, frame)
+        kiosk_states.save(kiosk, state)
         
         if not is_live:
             return jsonify({
@@ -122,6 +168,7 @@ def liveness_check():
 # BACKEND RECOGNITION API
 # ---------------------------------------------------------
 @bp.route("/recognize", methods=["POST"])
+@kiosk_load.timed
 def kiosk_recognize():
     """Face recognition + attendance marking (requires liveness pass)"""
     try:
@@ -130,12 +177,10 @@ def kiosk_recognize():
         import cv2
         import traceback
 
-        data = request.get_json()
-        frame_b64 = data.get("frame")
-
-        # --- SAFE FRAME DECODE (central helper) ---
+        # --- SAFE FRAME DECODE (once; the same array feeds every stage) ---
+        # Raw image/jpeg body, multipart or JSON {"frame": base64}
         try:
-            pil_img, frame = decode_frame(frame_b64)
+            frame = request_frame("frame")
         except Exception:
             frame = None
 
@@ -146,17 +191,45 @@ def kiosk_recognize():
                 "message": "Camera frame not ready"
             }), 200
 
-        # --- LIVENESS CHECK ---
-        is_live, confidence, message = liveness.check_liveness(frame)
+        # --- CHANGE GATE (skip inference when the scene did not change) ---
+        kiosk = kiosk_id()
+        signature, cached = frame_gates.check(kiosk, frame)
+        if cached is not None:
+            return jsonify(cached), 200
+
+        # --- QUALITY GATE (before liveness and face inference) ---
+        quality = assess_frame(frame)
+        if not quality.ok:
+            response = {
+                "status": "WAIT",
+                "message": quality.message,
+                "quality": quality.reason
+            }
+            frame_gates.store(kiosk, signature, response)
+            return jsonify(response), 200
+
+        # --- LIVENESS CHECK (window and cooldowns shared by all workers) ---
+        state = kiosk_states.load(kiosk)
+        is_live, confidence, message, faces = check_kiosk_liveness(state, frame)
 
         if not is_live:
-            return jsonify({
+            kiosk_states.save(kiosk, state)
+            response = {
                 "status": "WAIT",
                 "message": message
-            }), 200
+            }
+            # Blink/head-turn windows must see every frame, however similar
+            frame_gates.store(kiosk, signature, response,
+                              replay=kiosk_liveness_backend().replay_wait)
+            return jsonify(response), 200
 
         # --- RECOGNITION (only when liveness passed) ---
-        result = recognize_and_mark(frame_b64, current_app)
+        result = recognize_and_mark(frame, current_app, state, faces)
+
+        # Reset liveness after successful attendance marking
+        if isinstance(result, dict) and result.get("status") in ("check-in", "check-out"):
+            state.pop("liveness", None)
+        kiosk_states.save(kiosk, state)
 
         # Log the result for debugging
         logger.info(f"Kiosk recognition result: {result}")
@@ -167,10 +240,7 @@ def kiosk_recognize():
                 "status": "WAIT",
                 "message": "Face not matched yet"
             }), 200
-
-        # Reset liveness detector after successful attendance marking
-        if result.get("status") in ("check-in", "check-out"):
-            liveness.reset()
+        frame_gates.store(kiosk, signature, result)
 
         # Attach liveness details so frontend can show confidence/meta
         try:
@@ -191,6 +261,99 @@ def kiosk_recognize():
         }), 200
 
 
+# ---------------------------------------------------------
+# BURST RECOGNITION API
+# ---------------------------------------------------------
+@bp.route("/recognize_clip", methods=["POST"])
+@kiosk_load.timed
+def kiosk_recognize_clip():
+    """Liveness over a burst of frames, then recognition of its best frame.
+
+    One request instead of a recognize round trip per frame: frames are
+    several "frames" multipart files, a JSON list or back-to-back JPEGs.
+    The response has the /kiosk/recognize shape plus a "clip" summary.
+    The change gate compares the clip's last frame, the scene as it is now.
+    """
+    try:
+        try:
+            frames = request_frames("frames", _KIOSK_CLIP_MAX_FRAMES)
+        except Exception:
+            frames = []
+
+        if not frames:
+            return jsonify({
+                "status": "WAIT",
+                "message": "Camera frame not ready"
+            }), 200
+        kiosk_load.frames(len(frames))  # busy backoff compares per-frame latency
+
+        # --- CHANGE GATE (skip inference when the scene did not change) ---
+        kiosk = kiosk_id()
+        signature, cached = frame_gates.check(kiosk, frames[-1])
+        if cached is not None:
+            return jsonify(cached), 200
+
+        # --- QUALITY GATE (per frame; unusable frames sit out) ---
+        qualities = [assess_frame(frame) for frame in frames]
+        usable = sum(q.ok for q in qualities)
+        clip = {"frames": len(frames), "usable": usable, "best": None}
+        if not usable:
+            response = {
+                "status": "WAIT",
+                "message": qualities[0].message,
+                "quality": qualities[0].reason,
+                "clip": clip
+            }
+            frame_gates.store(kiosk, signature, response)
+            return jsonify(response), 200
+
+        # --- LIVENESS OVER THE CLIP ---
+        state = kiosk_states.load(kiosk)
+        is_live, confidence, message, best, faces = check_clip_liveness(state, frames, qualities)
+        clip["best"] = best
+
+        if not is_live or best is None:
+            kiosk_states.save(kiosk, state)
+            response = {
+                "status": "WAIT",
+                "message": message,
+                "clip": clip
+            }
+            frame_gates.store(kiosk, signature, response,
+                              replay=kiosk_liveness_backend().replay_wait)
+            return jsonify(response), 200
+
+        # --- RECOGNITION (best frame only, one embedding per face) ---
+        result = recognize_and_mark(frames[best], current_app, state, faces)
+
+        if isinstance(result, dict) and result.get("status") in ("check-in", "check-out"):
+            state.pop("liveness", None)
+        kiosk_states.save(kiosk, state)
+
+        logger.info(f"Kiosk clip recognition result ({usable}/{len(frames)} frames): {result}")
+
+        if not result or not isinstance(result, dict):
+            return jsonify({
+                "status": "WAIT",
+                "message": "Face not matched yet",
+                "clip": clip
+            }), 200
+        frame_gates.store(kiosk, signature, result)
+
+        result.setdefault('liveness_confidence', float(confidence))
+        result.setdefault('liveness_message', str(message))
+        result["clip"] = clip
+        return jsonify(result), 200
+
+    except Exception as e:
+        # Same contract as /recognize: never a 500 to the kiosk frontend
+        logger.error(f"Kiosk clip recognition error: {e}", exc_info=True)
+        return jsonify({
+            "status": "ERROR",
+            "message": "Internal processing error"
+        }), 200
+
+
 # ---------------------------------------------------------
 # EXIT KIOSK (PIN Protected)
 # ---------------------------------------------------------
@@ -359,6 +522,34 @@ def kiosk_status():
     })
 
 
+# ---------------------------------------------------------
+# API: Capture settings for kiosk clients
+# ---------------------------------------------------------
+@bp.route("/api/capture-profile", methods=["GET"])
+def kiosk_capture_profile():
+    """Resolution, JPEG quality and frame interval the kiosk should capture at"""
+    mobile = request.args.get("mobile") in ("1", "true")
+    return jsonify(capture_profile(kiosk_load, PROFILES["kiosk"].detect_width, mobile))
+
+
+# ---------------------------------------------------------
+# API: Kiosk inference metrics (this worker)
+# ---------------------------------------------------------
+@bp.route("/api/metrics", methods=["GET"])
+@role_required("admin")
+def kiosk_metrics():
+    """Frames (or clips) received and inferences skipped by the change gate in this worker.
+
+    recognize_latency_ms averages /kiosk/recognize and /kiosk/recognize_clip
+    requests per frame (a clip's time divided by its frames); each clip is
+    one change-gate frame.
+    """
+    return jsonify({
+        "change_gate": frame_gates.stats(),
+        "recognize_latency_ms": round(kiosk_load.latency_ms, 1),
+    })
+
+
 # ---------------------------------------------------------
 # API: Get Audio Announcement
 # ---------------------------------------------------------
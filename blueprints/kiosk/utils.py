@@ -1,15 +1,18 @@
 import os
-import io
-import base64
+import time
+import uuid
 from datetime import datetime
 import numpy as np
 from PIL import Image
 import cv2
-from flask import url_for, request
+from flask import url_for, request, session
 
 from insightface.app import FaceAnalysis
-from db_utils import fetchall, fetchone, execute
+from db_utils import fetchone, execute
+from utils.attendance_marks import attendance_key_ready, today_attendance, upsert_attendance
 from utils.face_encoder import face_encoder
+from utils.face_tracker import FaceTracker
+from utils.frame_upload import b64_image_bytes, decode_image
 from utils.logger import logger
 
 from blueprints.admin.settings.routes import load_settings
@@ -20,31 +23,41 @@ _env_snap = os.getenv("SAVE_SNAPSHOTS", "1")
 SAVE_SNAPSHOTS = str(_env_snap).lower() not in ("0", "false", "no", "off")
 
 
-# -------------------------------------------------------------
-# EMBEDDING CACHE (With automatic expiry/refresh)
-# -------------------------------------------------------------
-embeddings_cache = None
-cache_timestamp = None
-CACHE_TTL = 300  # 5 minutes - refresh cache to detect new enrollments
+def kiosk_id():
+    """Id of the calling kiosk: X-Kiosk-Id header, else one per browser session."""
+    header_id = request.headers.get("X-Kiosk-Id")
+    if header_id:
+        return header_id[:64]
+    if "kiosk_id" not in session:
+        session["kiosk_id"] = uuid.uuid4().hex
+    return session["kiosk_id"]
 
 
 # -------------------------------------------------------------
 # IMAGE HANDLING
 # -------------------------------------------------------------
 
-def decode_frame(frame_b64):
-    if frame_b64.startswith("data:"):
-        frame_b64 = frame_b64.split(",", 1)[1]
+def decode_bgr(frame_b64):
+    """Base64 / data-URL image -> BGR ndarray, decoded once straight from the buffer."""
+    return decode_image(b64_image_bytes(frame_b64))
 
-    img_bytes = base64.b64decode(frame_b64)
-    pil_img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-    rgb_arr = np.array(pil_img)
-    bgr_arr = cv2.cvtColor(rgb_arr, cv2.COLOR_RGB2BGR)
 
+def decode_frame(frame_b64):
+    """(PIL RGB image, BGR ndarray), for callers that keep the upload as a file."""
+    bgr_arr = decode_bgr(frame_b64)
+    pil_img = Image.fromarray(cv2.cvtColor(bgr_arr, cv2.COLOR_BGR2RGB))
     return pil_img, bgr_arr
 
 
+def _crop(frame, bbox):
+    """View of `frame` inside `bbox`, clipped to the frame (no copy)."""
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = map(int, bbox[:4])
+    return frame[max(0, y1):min(height, y2), max(0, x1):min(width, x2)]
+
+
 def save_snapshot(img, app, filename):
+    """Write a BGR frame or crop as a JPEG snapshot if snapshots are enabled."""
     # app-level override if explicitly set
     app_override = app.config.get("SAVE_SNAPSHOTS", None)
     if app_override is not None:
@@ -61,109 +74,17 @@ def save_snapshot(img, app, filename):
     if settings.get("snapshot_mode", "off") != "on":
         return None
 
+    if img.size == 0:
+        return None
+
     folder = app.config.get("SNAPSHOT_DIR", "static/snapshots")
     os.makedirs(folder, exist_ok=True)
     path = os.path.join(folder, filename)
-    img.save(path, "JPEG")
+    # Quality 75 matches the PIL default snapshots were written with before
+    cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, 75])
     return path.replace("\\", "/")
 
 
-# -------------------------------------------------------------
-# EMBEDDINGS DATABASE
-# -------------------------------------------------------------
-
-def load_embeddings():
-    """Load face embeddings from database with automatic cache refresh.
-    
-    Cache expires after CACHE_TTL seconds to ensure new enrollments are recognized.
-    """
-    global embeddings_cache, cache_timestamp
-    import time
-    
-    now = time.time()
-    
-    # Check if cache is still valid
-    if embeddings_cache is not None and cache_timestamp is not None:
-        age = now - cache_timestamp
-        if age < CACHE_TTL:
-            logger.debug(f"Using cached embeddings (age: {age:.1f}s)")
-            return embeddings_cache
-        else:
-            logger.info(f"Cache expired ({age:.1f}s > {CACHE_TTL}s), reloading embeddings")
-    
-    # Cache miss or expired - reload from database
-    logger.info("Loading face embeddings from database...")
-
-    rows = fetchall("""
-        SELECT
-            e.id AS emp_id,
-            e.full_name,
-            d.name AS department,
-            e.profile_photo AS photo,
-            f.embedding
-        FROM employees e
-        LEFT JOIN departments d ON e.department_id = d.id
-        JOIN face_data f ON f.emp_id = e.id
-        WHERE e.status = 'active'
-    """)
-
-    embeddings = []
-    for row in rows:
-        emb_blob = row.get("embedding")
-        if not emb_blob:
-            continue
-        if isinstance(emb_blob, str):
-            emb_blob = emb_blob.encode("latin1")
-        if isinstance(emb_blob, memoryview):
-            emb_blob = emb_blob.tobytes()
-        if isinstance(emb_blob, bytearray):
-            emb_blob = bytes(emb_blob)
-
-        try:
-            emb = np.frombuffer(emb_blob, dtype=np.float32)
-            if emb.size != 512:
-                raise ValueError(f"unexpected embedding size {emb.size}")
-        except Exception:
-            continue
-
-        embeddings.append({
-            "emp_id": row["emp_id"],
-            "name": row["full_name"],
-            "dept": row["department"],
-            "photo": row["photo"],
-            "embedding": emb
-        })
-
-    embeddings_cache = embeddings
-    cache_timestamp = now  # Update cache timestamp
-    logger.info(f"Loaded {len(embeddings)} face embeddings successfully")
-    
-    return embeddings_cache
-
-
-def clear_embedding_cache():
-    """
-    Clears cache timestamp to force immediate reload on next access.
-    Useful when new employee is enrolled or face data is updated.
-    """
-    global embeddings_cache, cache_timestamp
-    embeddings_cache = None
-    cache_timestamp = None
-    logger.info("Embedding cache cleared, will reload on next access")
-
-
-def reload_embeddings():
-    """
-    Forces immediate reload of embeddings from database.
-    """
-    global embeddings_cache
-    embeddings_cache = None
-    return load_embeddings()
-
-
-# Removed duplicate matching logic - now using face_encoder.match() for consistency
-
-
 # -------------------------------------------------------------
 # ATTENDANCE HELPERS
 # -------------------------------------------------------------
@@ -173,6 +94,26 @@ def mark_attendance(emp_id, snap_path, app=None):
         return {"status": "error", "message": "missing employee id"}
 
     now = datetime.now()
+
+    # cooldown_seconds controlled by app.config['KIOSK_COOLDOWN_SECONDS'] (seconds)
+    cooldown_seconds = float(app.config.get("KIOSK_COOLDOWN_SECONDS", 5)) if app else 5
+
+    # Cooldown and already-checked-out come from today's marks held in this worker
+    if today_attendance is None:
+        return _write_attendance(emp_id, snap_path, now, cooldown_seconds)
+    result = today_attendance.decide(emp_id, now, cooldown_seconds)
+    if result is None:
+        result = _write_attendance(emp_id, snap_path, now, cooldown_seconds)
+        today_attendance.record(emp_id, result, now)
+    return result
+
+
+def _write_attendance(emp_id, snap_path, now, cooldown_seconds):
+    """Decide and store one mark in the database."""
+    # One race-free statement once attendance has its unique (employee_id, date) key
+    if attendance_key_ready():
+        return upsert_attendance(emp_id, snap_path, now, cooldown_seconds)
+
     today_date = now.date()
 
     previous = fetchone("""
@@ -196,8 +137,6 @@ def mark_attendance(emp_id, snap_path, app=None):
         """, (emp_id, today_date, now, "check-in", snap_path, now))
         return {"status": "check-in", "timestamp": now}
 
-    # cooldown_seconds controlled by app.config['KIOSK_COOLDOWN_SECONDS'] (seconds)
-    cooldown_seconds = float(app.config.get("KIOSK_COOLDOWN_SECONDS", 5)) if app else 5
     last_timestamp = previous.get("timestamp") or previous.get("check_in_time") or now
 
     if previous.get("status") == "check-in" and not previous.get("check_out_time"):
@@ -228,36 +167,169 @@ def mark_attendance(emp_id, snap_path, app=None):
 # MAIN KIOSK FLOW
 # -------------------------------------------------------------
 
-def recognize_and_mark(frame_b64, app):
-    from flask import session
+def _face_box(face):
+    """Face box for UI feedback."""
+    bbox = face.bbox
+    return {
+        "x": float(bbox[0]),
+        "y": float(bbox[1]),
+        "width": float(bbox[2] - bbox[0]),
+        "height": float(bbox[3] - bbox[1])
+    }
 
+
+def _process_face(face, matched, fresh, seen_ids, frame, app, now_str):
+    """Mark attendance for one detected face and build its kiosk result.
+
+    Only a `fresh` match (recognized on this frame) marks attendance; a
+    match replayed from the face's track is shown as WAIT until the track
+    is recognized again.
+    """
+    if matched:
+        match, similarity = matched
+        sim_score = float(similarity)
+        logger.info(f"Kiosk: Matched employee_id={match['emp_id']}, similarity={sim_score:.3f}")
+    else:
+        match = None
+        sim_score = 0.0
+        logger.info("Kiosk: No match found for face (similarity below threshold)")
+
+    # The same person can only be marked once per frame
+    if match and match["emp_id"] in seen_ids:
+        match = None
+    if match:
+        seen_ids.add(match["emp_id"])
+
+    snap = save_snapshot(
+        _crop(frame, face.bbox), app, f"face_{datetime.now().strftime('%H%M%S')}.jpg")
+
+    if not match:
+        return {
+            "status": "unknown",
+            "recognized": False,
+            "face_detected": True,
+            "face_box": _face_box(face),
+            "name": "Unknown",
+            "dept": "",
+            "photoUrl": url_for("static", filename="default_user.png"),
+            "time": now_str,
+            "snapshot": snap,
+            "similarity": float(sim_score)
+        }
+
+    emp_id = match["emp_id"]
+    db_photo = match["photo"]
+
+    if db_photo and db_photo.startswith("static/"):
+        photo_url = "/" + db_photo.replace("\\", "/")
+    else:
+        photo_url = url_for("static", filename="default_user.png")
+
+    if not fresh:
+        return {
+            "status": "WAIT",
+            "message": "Verifying...",
+            "recognized": True,
+            "face_detected": True,
+            "face_box": _face_box(face),
+            "name": match["name"],
+            "dept": match["dept"],
+            "photoUrl": photo_url,
+            "time": now_str,
+            "snapshot": snap,
+            "similarity": float(sim_score)
+        }
+
+    attendance_result = mark_attendance(emp_id, snap, app)
+    status = attendance_result.get("status", "unknown")
+    display_timestamp = attendance_result.get("timestamp") or datetime.now()
+    display_time = display_timestamp.strftime("%I:%M %p")
+
+    # Audit attendance marking
+    try:
+        from db_utils import log_audit
+        log_audit(
+            user_id=emp_id,
+            action="ATTENDANCE",
+            module="kiosk",
+            details=f"status={status} similarity={sim_score}",
+            ip_address=request.remote_addr if request else None
+        )
+    except Exception:
+        # best-effort; do not fail recognition flow on audit errors
+        pass
+
+    return {
+        "status": status,
+        "recognized": True,
+        "face_detected": True,
+        "face_box": _face_box(face),
+        "name": match["name"],
+        "dept": match["dept"],
+        "photoUrl": photo_url,
+        "time": display_time,
+        "snapshot": snap,
+        "similarity": float(sim_score)
+    }
+
+
+def _track_and_match(state, faces, np_img, threshold):
+    """((details, similarity) or None, fresh) per face.
+
+    Faces continuing a track reuse its cached result; recognition only runs
+    for new tracks, tracks that moved, and results past their re-check time.
+    `fresh` is True when the face was recognized on this frame and agrees
+    with its track. The tracks live in the kiosk state, so every worker
+    continues them.
+    """
+    tracker = FaceTracker()
+    tracker.load_state(state.get("tracks"))
+    now = time.time()
+    tracks = tracker.assign([f.bbox for f in faces], now)
+    stale = [i for i, track in enumerate(tracks) if tracker.needs_embedding(track, now)]
+    fresh = [False] * len(faces)
+    if stale:
+        stale_faces = face_encoder.profile("kiosk").embed(np_img, [faces[i] for i in stale])
+        embeddings = np.stack([f.normed_embedding for f in stale_faces]).astype("float32")
+        # Details come back with each match: no DB query or lookup per frame
+        matches = face_encoder.match_with_details(embeddings, threshold=threshold)
+        for i, emb, match in zip(stale, embeddings, matches):
+            fresh[i] = tracks[i].record(emb, match, now)
+    state["tracks"] = tracker.state_dict()
+    logger.info(f"Kiosk: embedded {len(stale)}/{len(faces)} face(s), rest reused from tracks")
+    return [(track.decision(), is_fresh) for track, is_fresh in zip(tracks, fresh)]
+
+
+def recognize_and_mark(np_img, app, state, faces=None):
+    """Recognize the faces in a decoded BGR frame and mark their attendance.
+
+    `state` is the kiosk's stored state (utils.kiosk_state); the unknown-face
+    cooldown is kept in it, so it holds whichever worker gets the frame.
+    `faces` are detections already made on this frame (without embeddings),
+    e.g. by landmark liveness; None runs the detector here.
+    """
     try:
         now_str = datetime.now().strftime("%I:%M %p")
-        pil_img, np_img = decode_frame(frame_b64)
-        
-        # Use centralized face_encoder
-        faces = face_encoder.app.get(np_img)
+
+        # Detection only: the tracker decides which faces need recognition
+        if faces is None:
+            faces = face_encoder.profile("kiosk").get(np_img, embed=False)
         
         # DEBUG: Log face detection
         logger.info(f"Kiosk: Detected {len(faces)} face(s) in frame")
 
-        # Thread-safe cooldown using session (per-client)
-        last_unknown_str = session.get("kiosk_last_unknown")
+        # Per-kiosk cooldown after an unknown face
         unknown_cooldown = float(app.config.get("KIOSK_UNKNOWN_COOLDOWN", 3))
         now = datetime.now()
 
-        if last_unknown_str:
-            try:
-                last_unknown = datetime.fromisoformat(last_unknown_str)
-                if (now - last_unknown).total_seconds() < unknown_cooldown:
-                    return {"status": "ignore", "recognized": False}
-            except:
-                pass
+        last_unknown = state.get("last_unknown")
+        if last_unknown and now.timestamp() - last_unknown < unknown_cooldown:
+            return {"status": "ignore", "recognized": False}
 
         if not faces:
             snap = save_snapshot(
-                pil_img, app, f"unknown_{datetime.now().strftime('%H%M%S')}.jpg")
-            session["kiosk_last_unknown"] = now.isoformat()
+                np_img, app, f"unknown_{datetime.now().strftime('%H%M%S')}.jpg")
+            state["last_unknown"] = now.timestamp()
             return {
                 "status": "unknown",
                 "recognized": False,
@@ -277,8 +349,8 @@ def recognize_and_mark(frame_b64, app):
 
         if not faces:
             snap = save_snapshot(
-                pil_img, app, f"low_conf_{datetime.now().strftime('%H%M%S')}.jpg")
-            session["kiosk_last_unknown"] = now.isoformat()
+                np_img, app, f"low_conf_{datetime.now().strftime('%H%M%S')}.jpg")
+            state["last_unknown"] = now.timestamp()
             return {
                 "status": "unknown",
                 "recognized": False,
@@ -290,101 +362,34 @@ def recognize_and_mark(frame_b64, app):
                 "snapshot": snap
             }
 
-        face = max(
-            faces,
-            key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1])
+        # Largest face first - it is the one the UI highlights
+        faces.sort(
+            key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]),
+            reverse=True
         )
 
-        embedding = face.normed_embedding.astype("float32")
-        
-        # Extract face box for UI feedback
-        bbox = face.bbox
-        face_box = {
-            "x": float(bbox[0]),
-            "y": float(bbox[1]),
-            "width": float(bbox[2] - bbox[0]),
-            "height": float(bbox[3] - bbox[1])
-        }
-        
-        # Use centralized face_encoder.match() for consistency
+        # Match the faces with one similarity search, reusing tracked results
         threshold = float(app.config.get("EMBED_THRESHOLD", 0.75))
-        result = face_encoder.match(embedding, threshold=threshold)
-        
-        logger.info(f"Kiosk: Threshold={threshold}, Match result={result}")
-
-        if result is None:
-            match = None
-            sim_score = 0.0
-            logger.info(f"Kiosk: No match found (similarity below {threshold})")
-        else:
-            emp_id_match, similarity = result
-            sim_score = float(similarity)
-            logger.info(f"Kiosk: Matched employee_id={emp_id_match}, similarity={sim_score:.3f}")
-            # Find full employee details from cache
-            db_entries = load_embeddings()
-            match = next((e for e in db_entries if e["emp_id"] == emp_id_match), None)
-
-        x1, y1, x2, y2 = map(int, face.bbox)
-        face_crop = pil_img.crop((x1, y1, x2, y2))
-        snap = save_snapshot(
-            face_crop, app, f"face_{datetime.now().strftime('%H%M%S')}.jpg")
-
-        if not match:
-            session["kiosk_last_unknown"] = now.isoformat()
-            return {
-                "status": "unknown",
-                "recognized": False,
-                "face_detected": True,
-                "face_box": face_box,
-                "name": "Unknown",
-                "dept": "",
-                "photoUrl": url_for("static", filename="default_user.png"),
-                "time": now_str,
-                "snapshot": snap,
-                "similarity": float(sim_score)
-            }
-
-        emp_id = match["emp_id"]
-        name = match["name"]
-        dept = match["dept"]
-        db_photo = match["photo"]
-
-        if db_photo and db_photo.startswith("static/"):
-            photo_url = "/" + db_photo.replace("\\", "/")
-        else:
-            photo_url = url_for("static", filename="default_user.png")
-
-        attendance_result = mark_attendance(emp_id, snap, app)
-        status = attendance_result.get("status", "unknown")
-        display_timestamp = attendance_result.get("timestamp") or datetime.now()
-        display_time = display_timestamp.strftime("%I:%M %p")
-
-        # Audit attendance marking
-        try:
-            from db_utils import log_audit
-            log_audit(
-                user_id=emp_id,
-                action="ATTENDANCE",
-                module="kiosk",
-                details=f"status={status} similarity={sim_score}",
-                ip_address=request.remote_addr if request else None
-            )
-        except Exception:
-            # best-effort; do not fail recognition flow on audit errors
-            pass
-
-        return {
-            "status": status,
-            "recognized": True,
-            "face_detected": True,
-            "face_box": face_box,
-            "name": name,
-            "dept": dept,
-            "photoUrl": photo_url,
-            "time": display_time,
-            "snapshot": snap,
-            "similarity": float(sim_score)
-        }
+        matches = _track_and_match(state, faces, np_img, threshold)
+
+        logger.info(f"Kiosk: Threshold={threshold}, Match results={matches}")
+
+        results = []
+        seen_ids = set()
+        for face, (matched, fresh) in zip(faces, matches):
+            results.append(_process_face(face, matched, fresh, seen_ids, np_img, app, now_str))
+
+        recognized = [r for r in results if r["recognized"]]
+        if not recognized:
+            state["last_unknown"] = now.timestamp()
+
+        # Primary result (largest marked face, else largest recognized face,
+        # else largest face) keeps the single-face response shape; every
+        # face is listed under "faces".
+        marked = [r for r in recognized if r["status"] != "WAIT"]
+        primary = dict((marked or recognized or results)[0])
+        primary["faces"] = results
+        return primary
     except Exception as e:
         logger.error(f"recognize_and_mark error: {e}", exc_info=True)
         # Ensure we always return a dictionary expected by the frontend
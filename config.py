@@ -26,8 +26,12 @@ class BaseConfig:
     
     # --- FACE RECOGNITION SETTINGS ---
     RECOGNITION_THRESHOLD = float(os.getenv("RECOGNITION_THRESHOLD", "1.1"))
-    RECOGNITION_PROVIDER = os.getenv("RECOGNITION_PROVIDER", "CPU")
+    RECOGNITION_PROVIDER = os.getenv("RECOGNITION_PROVIDER", "CPU")  # CPU, CUDA or ONNX Runtime provider names
     EMBED_THRESHOLD = float(os.getenv("EMBED_THRESHOLD", "0.75"))
+    # Recognition pipeline tuning (ORT_*, ANN_*, EMBED_STORAGE, GALLERY_*, INFERENCE_*,
+    # KIOSK_DETECT_WIDTH, KIOSK_CHANGE_*, FRAME_*, KIOSK_CAPTURE_* / KIOSK_CLIP_*) is read
+    # from the environment by the utils module that uses it, at import time, so the
+    # inference server and gunicorn workers agree. See .env.example; it is not a Flask setting.
     
     # --- APP SETTINGS ---
     APP_MODE = os.getenv("APP_MODE", "development")
@@ -46,6 +50,10 @@ class BaseConfig:
     # --- KIOSK SETTINGS ---
     KIOSK_COOLDOWN_SECONDS = float(os.getenv("KIOSK_COOLDOWN_SECONDS", "5"))
     KIOSK_UNKNOWN_COOLDOWN = float(os.getenv("KIOSK_UNKNOWN_COOLDOWN", "3"))
+    # KIOSK_ATTENDANCE_CACHE, KIOSK_STATE_*, LIVENESS_MODE / LIVENESS_EAR_THRESHOLD /
+    # LIVENESS_YAW_RANGE and ANTISPOOF_* are environment-only as well (see .env.example)
+    # Liveness backend (admin setting liveness_backend overrides): "heuristic" or "onnx"
+    LIVENESS_BACKEND = os.getenv("LIVENESS_BACKEND", "heuristic")
     
     # --- EMAIL SETTINGS ---
     SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
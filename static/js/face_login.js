@@ -111,7 +111,7 @@ function stopCamera() {
   }
 }
 
-/* Capture frame as compressed JPEG dataURL */
+/* Capture frame as a compressed JPEG Blob (sent as the raw request body) */
 function captureFrame() {
   const v = modalCam;
   const w = v.videoWidth || 320;
@@ -121,7 +121,13 @@ function captureFrame() {
   canvas.height = h;
   const ctx = canvas.getContext("2d");
   ctx.drawImage(v, 0, 0, w, h);
-  return canvas.toDataURL("image/jpeg", JPEG_QUALITY);
+  return new Promise((resolve, reject) => {
+    canvas.toBlob(
+      blob => blob ? resolve(blob) : reject(new Error("Frame encoding failed")),
+      "image/jpeg",
+      JPEG_QUALITY
+    );
+  });
 }
 
 /* Draw face detection box on canvas overlay */
@@ -210,7 +216,7 @@ async function sendFrameToServer(imageData) {
       // Get CSRF token from meta tag
       const csrfToken = document.querySelector('meta[name="csrf-token"]')?.content;
       
-      const headers = { "Content-Type": "application/json" };
+      const headers = { "Content-Type": "image/jpeg" };
       if (csrfToken) {
         headers["X-CSRFToken"] = csrfToken;
       }
@@ -218,7 +224,7 @@ async function sendFrameToServer(imageData) {
       const resp = await fetch("/auth/face_login", {
         method: "POST",
         headers: headers,
-        body: JSON.stringify({ image: imageData }),
+        body: imageData,
       });
       
       if (resp.status === 403) {
@@ -266,7 +272,7 @@ async function captureLoop() {
       processingOverlay.classList.remove("hidden");
       processingOverlay.classList.add("flex");
       
-      const image = captureFrame();
+      const image = await captureFrame();
       const result = await sendFrameToServer(image);
       
       // Hide processing state
@@ -328,7 +334,7 @@ modalForce.addEventListener("click", async () => {
     return;
   }
   // Immediate single capture
-  const image = captureFrame();
+  const image = await captureFrame();
   const result = await sendFrameToServer(image);
   if (result && result.matched) {
     showSuccessThenRedirect(result.redirect_url || "/employee/dashboard/");
@@ -798,15 +798,16 @@ if (startBtn) {
                 console.log('📹 Using admin selected camera:', selectedDevice);
             }
 
+            // Capture size negotiated with the server (falls back to 1280x720)
+            await loadCaptureProfile();
+
             // Mobile-friendly camera constraints
             const constraints = {
                 video: selectedDevice ? {
                     deviceId: { exact: selectedDevice },
-                    width: { ideal: 1280 },
-                    height: { ideal: 720 }
+                    ...captureSizeConstraints()
                 } : {
-                    width: { ideal: 1280 },
-                    height: { ideal: 720 },
+                    ...captureSizeConstraints(),
                     facingMode: 'user' // Front camera for face recognition
                 },
                 audio: false
@@ -1263,8 +1264,77 @@ function drawKioskFaceBox() {
 // =======================
 // RECOGNITION LOOP
 // =======================
-// Load from localStorage or use default
-window.POLLING_DELAY_MS = parseInt(localStorage.getItem('pollingDelayMs') || '800', 10);
+// Load from localStorage; otherwise the server's capture profile decides
+const savedPollingDelay = localStorage.getItem('pollingDelayMs');
+window.POLLING_DELAY_MS = savedPollingDelay !== null ? parseInt(savedPollingDelay, 10) : null;
+
+// Capture resolution, JPEG quality and frame interval from /kiosk/api/capture-profile
+window.CAPTURE_PROFILE = null;
+const CAPTURE_PROFILE_REFRESH_MS = 30000;
+let captureProfileLoadedAt = 0;
+
+async function loadCaptureProfile() {
+    try {
+        const mobile = /Mobi|Android|iPhone|iPad/i.test(navigator.userAgent) ? 1 : 0;
+        const res = await fetch(`/kiosk/api/capture-profile?mobile=${mobile}`);
+        if (res.ok) {
+            window.CAPTURE_PROFILE = await res.json();
+            captureProfileLoadedAt = Date.now();
+        }
+    } catch (err) {
+        console.warn("Capture profile unavailable, using defaults", err);
+    }
+    return window.CAPTURE_PROFILE;
+}
+
+function captureSizeConstraints() {
+    const profile = window.CAPTURE_PROFILE;
+    return {
+        width: { ideal: profile ? profile.width : 1280 },
+        height: { ideal: profile ? profile.height : 720 }
+    };
+}
+
+function pollingDelay() {
+    const profile = window.CAPTURE_PROFILE;
+    let delay = window.POLLING_DELAY_MS || (profile ? profile.interval_ms : 800);
+    // A busy server asks every kiosk to slow down, whatever was configured locally
+    if (profile && profile.busy) delay = Math.max(delay, profile.interval_ms);
+    return delay;
+}
+
+function canvasToJpeg(canvas, quality) {
+    return new Promise((resolve, reject) => {
+        canvas.toBlob(
+            blob => blob ? resolve(blob) : reject(new Error("Frame encoding failed")),
+            "image/jpeg",
+            quality
+        );
+    });
+}
+
+// Current video frame, scaled down to the negotiated width if the camera delivers more
+function captureCanvas() {
+    const profile = window.CAPTURE_PROFILE;
+    const scale = profile && video.videoWidth > profile.width ? profile.width / video.videoWidth : 1;
+    const canvas = document.createElement("canvas");
+    canvas.width = Math.round(video.videoWidth * scale);
+    canvas.height = Math.round(video.videoHeight * scale);
+    canvas.getContext("2d").drawImage(video, 0, 0, canvas.width, canvas.height);
+    return canvas;
+}
+
+// Burst of JPEG frames, intervalMs apart, as one multipart body for /kiosk/recognize_clip
+async function captureClip(count, intervalMs, quality) {
+    const form = new FormData();
+    let canvas = null;
+    for (let i = 0; i < count; i++) {
+        if (i > 0) await new Promise(r => setTimeout(r, intervalMs));
+        canvas = captureCanvas();
+        form.append("frames", await canvasToJpeg(canvas, quality), `frame${i}.jpg`);
+    }
+    return { form, canvas };
+}
 
 async function sendFrame() {
     if (!cameraRunning || sendingFrame || !video.videoWidth) return;
@@ -1290,18 +1360,30 @@ async function sendFrame() {
 
         // (Intentionally left blank) do not overwrite backend messages here
 
-        const canvas = document.createElement("canvas");
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
-        canvas.getContext("2d").drawImage(video, 0, 0);
+        const profile = window.CAPTURE_PROFILE;
+        const quality = profile ? profile.jpeg_quality : 0.75;
+        let canvas, res;
+
+        if (profile && profile.clip_frames > 0) {
+            // Burst: the server checks liveness over the whole clip in one round trip
+            const clip = await captureClip(profile.clip_frames, profile.clip_interval_ms, quality);
+            canvas = clip.canvas;
+            res = await fetch("/kiosk/recognize_clip", {
+                method: "POST",
+                body: clip.form
+            });
+        } else {
+            canvas = captureCanvas();
 
-        const frame = canvas.toDataURL("image/jpeg", 0.75); // Better quality
+            // Raw JPEG body: ~25% smaller than a base64 data URL, no JSON/base64 work on the server
+            const frame = await canvasToJpeg(canvas, quality);
 
-        const res = await fetch("/kiosk/recognize", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ frame })
-        });
+            res = await fetch("/kiosk/recognize", {
+                method: "POST",
+                headers: { "Content-Type": "image/jpeg" },
+                body: frame
+            });
+        }
 
         const data = await res.json();
         console.log('🎯 Recognition response:', JSON.stringify(data));
@@ -1396,7 +1478,10 @@ async function startRecognitionLoop() {
 
     while (recognitionRunning) {
         await sendFrame();
-        await new Promise(r => setTimeout(r, window.POLLING_DELAY_MS || 800));
+        if (Date.now() - captureProfileLoadedAt > CAPTURE_PROFILE_REFRESH_MS) {
+            await loadCaptureProfile();
+        }
+        await new Promise(r => setTimeout(r, pollingDelay()));
     }
 }
 
@@ -29,11 +29,12 @@
             // Toggle facing mode
             window.currentFacingMode = window.currentFacingMode === 'user' ? 'environment' : 'user';
             
-            // Request new camera
+            // Request new camera at the server-negotiated capture size (kiosk.js)
+            const profile = window.CAPTURE_PROFILE;
             const constraints = {
                 video: {
-                    width: { ideal: 1280 },
-                    height: { ideal: 720 },
+                    width: { ideal: profile ? profile.width : 1280 },
+                    height: { ideal: profile ? profile.height : 720 },
                     facingMode: window.currentFacingMode
                 },
                 audio: false
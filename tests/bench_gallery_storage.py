@@ -0,0 +1,59 @@
+"""
+Gallery storage benchmark
+Memory and per-query latency of float32 / float16 / int8 galleries at
+50k and 200k identities (exact scan + float32 re-rank).
+
+Usage:
+    python tests/bench_gallery_storage.py [sizes...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ann_index import ExactIndex, search_gallery
+from utils.embedding_store import make_store
+from tests.test_ann_index import make_gallery, make_queries
+
+QUERIES = 50
+RERANK = 32
+
+
+def legacy_bytes(n):
+    """Before: encoder list + encoder matrix + kiosk cache, 3 float32 copies."""
+    return 3 * n * 512 * 4
+
+
+def bench(n):
+    gallery = make_gallery(n)
+    queries = make_queries(gallery, QUERIES)
+    exact_rows, _ = ExactIndex().search(gallery, queries, k=1)
+
+    print(f"\n{n} identities (legacy 3-copy layout: {legacy_bytes(n) / 1e6:.0f} MB)")
+    print(f"{'mode':8s} {'MB':>8s} {'vs legacy':>10s} {'+float32':>9s} {'ms/query':>9s} {'recall@1':>9s}")
+    for mode in ("float32", "float16", "int8"):
+        store = make_store(gallery, mode)
+        index = ExactIndex()
+        search_gallery(index, store, queries[:1], k=1, rerank=RERANK)  # warm-up
+
+        start = time.perf_counter()
+        rows = np.array([
+            search_gallery(index, store, q, k=1, rerank=RERANK)[0][0, 0]
+            for q in queries
+        ])
+        ms = (time.perf_counter() - start) * 1000 / QUERIES
+        recall = float(np.mean(rows == exact_rows[:, 0]))
+        # Float32 rows kept for the re-rank (a gallery file mapping in production)
+        exact = getattr(store, "exact", None)
+        exact_mb = exact.nbytes / 1e6 if exact is not None else 0.0
+        print(f"{mode:8s} {store.nbytes / 1e6:8.1f} {legacy_bytes(n) / store.nbytes:9.1f}x "
+              f"{exact_mb:9.1f} {ms:9.2f} {recall:9.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [50000, 200000]
+    for size in sizes:
+        bench(size)
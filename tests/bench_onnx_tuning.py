@@ -0,0 +1,99 @@
+"""
+ONNX Runtime tuning benchmark
+Sweeps intra-op threads, execution mode and graph optimization level over
+a fixed frame set (kiosk profile: detection + recognition) and reports
+per-frame latency and throughput with N concurrent callers, e.g. the two
+gunicorn threads of one worker.
+
+Usage:
+    python tests/bench_onnx_tuning.py [frame_dir] [--callers N] [--rounds N]
+
+Frames default to the enrolled photos under static/uploads; each is
+resized to the kiosk's 1280x720 so runs are comparable between machines.
+"""
+import argparse
+import glob
+import itertools
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.inference_profiles import PROFILES, ProfileAnalysis
+from utils.onnx_tuning import OnnxPlan, apply_plan, cpu_count, load_face_analysis, plan_from_env
+
+FRAME_SIZE = (1280, 720)
+MAX_FRAMES = 16
+
+
+def load_frames(frame_dir):
+    paths = sorted(
+        p for ext in ("jpg", "jpeg", "png")
+        for p in glob.glob(os.path.join(frame_dir, "**", f"*.{ext}"), recursive=True)
+    )[:MAX_FRAMES]
+    frames = [cv2.imread(p) for p in paths]
+    frames = [cv2.resize(f, FRAME_SIZE) for f in frames if f is not None]
+    if not frames:
+        raise SystemExit(f"No images found under {frame_dir}")
+    return frames
+
+
+def run(analysis, frames, callers, rounds):
+    """Every caller runs all frames `rounds` times; returns (ms/frame, frames/s)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def caller():
+        local = []
+        for _ in range(rounds):
+            for frame in frames:
+                start = time.perf_counter()
+                analysis.get(frame)
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return float(np.median(latencies)) * 1000, len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("frame_dir", nargs="?", default="static/uploads")
+    parser.add_argument("--callers", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frame_dir)
+    cores = cpu_count()
+    base = plan_from_env()
+    app = load_face_analysis("buffalo_l", base)
+    analysis = ProfileAnalysis(app, PROFILES["kiosk"])
+    print(f"{len(frames)} frames at {FRAME_SIZE[0]}x{FRAME_SIZE[1]}, {args.callers} callers, "
+          f"{cores} cores, providers {','.join(base.providers)}")
+
+    threads = sorted({1, 2, max(1, cores // 4), max(1, cores // 2), cores})
+    print(f"{'intra':>5s} {'mode':>10s} {'graph_opt':>9s} {'ms/frame':>9s} {'frames/s':>9s}")
+    for intra, mode, graph_opt in itertools.product(threads, ("sequential", "parallel"),
+                                                    ("basic", "all")):
+        plan = OnnxPlan(base.providers, intra, inter_op_threads=2 if mode == "parallel" else 1,
+                        execution_mode=mode, graph_optimization=graph_opt, cores=cores)
+        apply_plan(app, plan)
+        run(analysis, frames[:1], 1, 1)  # warm-up
+        ms, fps = run(analysis, frames, args.callers, args.rounds)
+        print(f"{intra:5d} {mode:>10s} {graph_opt:>9s} {ms:9.1f} {fps:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+ANN index recall test
+Compares IVFIndex against exact search on synthetic 512-d unit vectors.
+Uniform random vectors have no cluster structure, which is the worst case
+for IVF; real face embeddings reach the same recall with fewer probes.
+
+Run with pytest, or directly to print the recall/latency table:
+    python tests/test_ann_index.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ann_index import ExactIndex, IVFIndex, build_index
+
+
+def make_gallery(n, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((n, dim)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    return gallery
+
+
+def make_queries(gallery, count, noise=0.033, seed=1):
+    """Noisy copies of gallery rows (cosine ~0.8, like a live kiosk frame)."""
+    rng = np.random.default_rng(seed)
+    targets = rng.choice(gallery.shape[0], count, replace=False)
+    queries = gallery[targets] + noise * rng.standard_normal((count, gallery.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def recall_at_1(gallery, queries, index):
+    exact_rows, _ = ExactIndex().search(gallery, queries, k=1)
+    rows, _ = index.search(gallery, queries, k=1)
+    return float(np.mean(rows[:, 0] == exact_rows[:, 0]))
+
+
+def test_ivf_recall_matches_exact():
+    gallery = make_gallery(20000)
+    queries = make_queries(gallery, 200)
+    index = IVFIndex(nprobe=32).build(gallery)
+    assert recall_at_1(gallery, queries, index) >= 0.95
+
+
+def test_nprobe_is_recall_knob():
+    gallery = make_gallery(5000)
+    queries = make_queries(gallery, 200, noise=0.05)
+    index = IVFIndex(nlist=100, nprobe=1).build(gallery)
+    low = recall_at_1(gallery, queries, index)
+    index.nprobe = 100
+    full = recall_at_1(gallery, queries, index)
+    assert full == 1.0
+    assert full >= low
+
+
+def test_topk_and_similarities_match_exact():
+    gallery = make_gallery(3000)
+    queries = make_queries(gallery, 20)
+    index = IVFIndex(nlist=50, nprobe=50).build(gallery)
+    rows, sims = index.search(gallery, queries, k=5)
+    exact_rows, exact_sims = ExactIndex().search(gallery, queries, k=5)
+    assert rows.shape == (20, 5)
+    np.testing.assert_array_equal(rows, exact_rows)
+    np.testing.assert_allclose(sims, exact_sims, rtol=1e-5)
+
+
+def test_small_gallery_falls_back_to_exact():
+    gallery = make_gallery(500)
+    assert build_index(gallery, kind="auto", min_size=10000).kind == "exact"
+    assert build_index(gallery, kind="auto", min_size=100).kind == "ivf"
+    assert build_index(gallery, kind="exact", min_size=0).kind == "exact"
+
+
+def test_empty_gallery():
+    gallery = np.empty((0, 512), dtype=np.float32)
+    for index in (ExactIndex().build(gallery), IVFIndex().build(gallery)):
+        rows, sims = index.search(gallery, np.ones(512, dtype=np.float32), k=1)
+        assert rows[0, 0] == -1
+
+
+if __name__ == "__main__":
+    gallery = make_gallery(50000)
+    queries = make_queries(gallery, 500)
+
+    start = time.perf_counter()
+    exact_rows, _ = ExactIndex().search(gallery, queries, k=1)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    index = IVFIndex().build(gallery)
+    print(f"gallery=50000 nlist={len(index.lists)} exact={exact_ms:.3f} ms/query")
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        index.nprobe = nprobe
+        start = time.perf_counter()
+        rows, _ = index.search(gallery, queries, k=1)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = float(np.mean(rows[:, 0] == exact_rows[:, 0]))
+        print(f"nprobe={nprobe:3d} recall@1={recall:.3f} {ms:.3f} ms/query")
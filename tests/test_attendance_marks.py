@@ -0,0 +1,261 @@
+"""
+Attendance marks test
+Single-statement kiosk attendance upsert against a stand-in connection,
+and against a real MySQL server when one is reachable.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import attendance_marks
+from utils.attendance_marks import (
+    CHECK_OUT, CHECKED_OUT, COOLDOWN, _DECISION_FLAG, _EPOCH, TodayAttendance, decode_decision,
+)
+
+
+class FakeConnection:
+    """Connection/cursor pair recording statements; `lastrowid` is what the upsert reports."""
+
+    def __init__(self, indexes=(), fail_alter=False, lastrowid=None, rows=()):
+        self.indexes = list(indexes)
+        self.rows = list(rows)
+        self.fail_alter = fail_alter
+        self.lastrowid = lastrowid
+        self.queries = []
+        self.commits = 0
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=None):
+        self.queries.append((query.strip(), params))
+        if query.lstrip().startswith("ALTER") and self.fail_alter:
+            raise RuntimeError("Duplicate entry '7-2026-10-17' for key 'uq_attendance_employee_date'")
+
+    def fetchall(self):
+        if "FROM attendance" in self.queries[-1][0]:
+            return self.rows
+        return self.indexes
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+
+def _reported(code, when):
+    return _DECISION_FLAG + 4 * int((when - _EPOCH).total_seconds()) + code
+
+
+def test_decode_decision():
+    now = datetime(2026, 10, 17, 18, 0, 0)
+    assert decode_decision(42, now) == {"status": "check-in", "timestamp": now}
+
+    check_in = datetime(2026, 10, 17, 9, 30, 0)
+    out = decode_decision(_reported(CHECK_OUT, check_in), now)
+    assert out["status"] == "check-out" and out["timestamp"] == now
+    assert abs(out["working_hours"] - 8.5) < 1e-9
+
+    last = now - timedelta(seconds=20)
+    assert decode_decision(_reported(COOLDOWN, last), now) == {
+        "status": "already", "timestamp": last, "reason": "cooldown"}
+    assert decode_decision(_reported(CHECKED_OUT, last), now) == {
+        "status": "already", "timestamp": last, "reason": "already_checked_out"}
+
+
+def test_ensure_key_adds_it_once(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    assert attendance_marks.ensure_attendance_key()
+    assert conn.queries[-1][0].startswith("ALTER TABLE attendance ADD UNIQUE KEY")
+    assert attendance_marks.attendance_key_ready()
+
+    conn = FakeConnection(indexes=[("uq_attendance_employee_date",)])
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    assert attendance_marks.ensure_attendance_key()
+    assert not any(q.startswith("ALTER") for q, _ in conn.queries)
+
+
+def test_duplicate_rows_keep_the_legacy_path(monkeypatch):
+    conn = FakeConnection(fail_alter=True)
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    assert not attendance_marks.ensure_attendance_key()
+    assert not attendance_marks.attendance_key_ready()
+
+
+def test_upsert_is_one_statement(monkeypatch):
+    check_in = datetime(2026, 10, 17, 9, 0, 0)
+    conn = FakeConnection(lastrowid=_reported(CHECK_OUT, check_in))
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+
+    result = attendance_marks.upsert_attendance(7, "snap.jpg", datetime(2026, 10, 17, 17, 0, 0, 400000), 30)
+    assert len(conn.queries) == 1 and conn.commits == 1
+    query, params = conn.queries[0]
+    assert query.startswith("INSERT INTO attendance") and "ON DUPLICATE KEY UPDATE" in query
+    assert params["now"] == datetime(2026, 10, 17, 17, 0, 0)  # whole seconds
+    assert params["date"] == check_in.date() and params["cooldown_us"] == 30_000_000
+    assert result["status"] == "check-out" and result["working_hours"] == 8.0
+
+
+def test_today_attendance_answers_repeats_without_a_query(monkeypatch):
+    nine = datetime(2026, 10, 17, 9, 0, 0)
+    conn = FakeConnection(rows=[
+        (7, "check-in", nine, nine, None),
+        (8, "check-out", nine + timedelta(hours=8), nine, nine + timedelta(hours=8)),
+    ])
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    cache = TodayAttendance()
+    cache.warm(nine.date())
+
+    assert cache.decide(8, nine + timedelta(hours=9), 5)["reason"] == "already_checked_out"
+    assert cache.decide(7, nine + timedelta(seconds=3), 5)["reason"] == "cooldown"
+    assert cache.decide(7, nine + timedelta(hours=1), 5) is None  # check-out goes to the database
+    assert cache.decide(9, nine, 5) is None  # not marked today
+    assert len(conn.queries) == 1
+
+    # Write-through: marks decided by the database are answered from memory next time
+    ten = nine + timedelta(hours=1)
+    cache.record(9, {"status": "check-in", "timestamp": ten}, ten)
+    cache.record(7, {"status": "check-out", "timestamp": ten, "working_hours": 1.0}, ten)
+    assert cache.decide(9, ten + timedelta(seconds=1), 5)["reason"] == "cooldown"
+    assert cache.decide(7, ten + timedelta(seconds=1), 5)["reason"] == "already_checked_out"
+    assert cache.entries[7] == ("check-out", ten, nine)
+    cache.forget(7)
+    assert cache.decide(7, ten + timedelta(seconds=1), 5) is None
+    assert len(conn.queries) == 1
+
+
+def test_today_attendance_reloads_after_midnight(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    cache = TodayAttendance()
+    late = datetime(2026, 10, 17, 23, 59, 58)
+    cache.decide(7, late, 5)
+    cache.record(7, {"status": "check-in", "timestamp": late}, late)
+
+    morning = datetime(2026, 10, 18, 0, 0, 1)
+    assert cache.decide(7, morning, 5) is None  # yesterday's check-in does not count
+    assert cache.day == morning.date() and conn.queries[-1][1] == (morning.date(),)
+
+
+# ---------------------------------------------------------
+# Against a real MySQL server (DB_HOST / DB_USER / DB_PASSWORD; skipped without one)
+# ---------------------------------------------------------
+_SCRATCH_DB = "facetrack_test_attendance"
+
+
+@pytest.fixture
+def mysql_conn(monkeypatch):
+    """Connection to a scratch database holding an empty attendance table."""
+    connector = pytest.importorskip("mysql.connector")
+    try:
+        conn = connector.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=int(os.getenv("DB_PORT", "3306")),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASSWORD") or "",
+            connection_timeout=3,
+        )
+    except Exception as e:
+        pytest.skip(f"no MySQL server: {e}")
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP DATABASE IF EXISTS {_SCRATCH_DB}")
+        cur.execute(f"CREATE DATABASE {_SCRATCH_DB}")
+    except Exception as e:
+        conn.close()
+        pytest.skip(f"cannot create the scratch database: {e}")
+    cur.execute(f"USE {_SCRATCH_DB}")
+    cur.execute("""
+        CREATE TABLE attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            employee_id INT NOT NULL,
+            date DATE NOT NULL,
+            check_in_time DATETIME NULL,
+            check_out_time DATETIME NULL,
+            status VARCHAR(20) NULL,
+            working_hours DECIMAL(6, 2) NULL,
+            captured_photo_path VARCHAR(255) NULL,
+            timestamp DATETIME NULL
+        )
+    """)
+    conn.commit()
+    cur.close()
+    monkeypatch.setattr(attendance_marks, "get_db", lambda: conn)
+    yield conn
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {_SCRATCH_DB}")
+    cur.close()
+    conn.close()
+
+
+def _last_insert_id(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT LAST_INSERT_ID()")
+    value = cur.fetchone()[0]
+    cur.close()
+    return value
+
+
+def _row(conn, emp_id, day):
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT id, status, check_in_time, check_out_time, working_hours, captured_photo_path, timestamp
+        FROM attendance WHERE employee_id = %s AND date = %s
+    """, (emp_id, day))
+    rows = cur.fetchall()
+    cur.close()
+    assert len(rows) == 1
+    return rows[0]
+
+
+def test_upsert_against_mysql(mysql_conn):
+    conn = mysql_conn
+    assert attendance_marks.ensure_attendance_key()
+    assert attendance_marks.ensure_attendance_key()  # found, not added twice
+
+    nine = datetime(2026, 10, 17, 9, 0, 0)
+    day = nine.date()
+
+    # No row today: the insert path reports the new row's auto-increment id
+    result = attendance_marks.upsert_attendance(7, "in.jpg", nine, 30)
+    assert result == {"status": "check-in", "timestamp": nine}
+    row = _row(conn, 7, day)
+    assert _last_insert_id(conn) == row["id"] < _DECISION_FLAG
+    assert row["status"] == "check-in" and row["check_in_time"] == nine and row["check_out_time"] is None
+
+    # Within the cooldown: the update path reports the encoded decision, the row is unchanged
+    result = attendance_marks.upsert_attendance(7, "again.jpg", nine + timedelta(seconds=10), 30)
+    assert result == {"status": "already", "timestamp": nine, "reason": "cooldown"}
+    assert _last_insert_id(conn) == _reported(COOLDOWN, nine)
+    assert _row(conn, 7, day) == row
+
+    # Past the cooldown: check-out, working hours from the check-in time
+    five = datetime(2026, 10, 17, 17, 0, 0, 700000)
+    result = attendance_marks.upsert_attendance(7, "out.jpg", five, 30)
+    five = five.replace(microsecond=0)
+    assert result["status"] == "check-out" and result["timestamp"] == five
+    assert result["working_hours"] == 8.0
+    assert _last_insert_id(conn) == _reported(CHECK_OUT, nine)
+    out = _row(conn, 7, day)
+    assert out["id"] == row["id"] and out["status"] == "check-out"
+    assert out["check_in_time"] == nine and out["check_out_time"] == five and out["timestamp"] == five
+    assert float(out["working_hours"]) == 8.0 and out["captured_photo_path"] == "out.jpg"
+
+    # Checked out: unchanged, reported with the check-out time
+    result = attendance_marks.upsert_attendance(7, "late.jpg", five + timedelta(minutes=5), 30)
+    assert result == {"status": "already", "timestamp": five, "reason": "already_checked_out"}
+    assert _last_insert_id(conn) == _reported(CHECKED_OUT, five)
+    assert _row(conn, 7, day) == out
+
+    # Another employee, and the same employee the next day, get rows of their own
+    assert attendance_marks.upsert_attendance(8, "b.jpg", five, 30)["status"] == "check-in"
+    assert _last_insert_id(conn) == _row(conn, 8, day)["id"] < _DECISION_FLAG
+    tomorrow = nine + timedelta(days=1)
+    assert attendance_marks.upsert_attendance(7, "c.jpg", tomorrow, 30)["status"] == "check-in"
+    assert _row(conn, 7, tomorrow.date())["id"] != row["id"]
@@ -0,0 +1,56 @@
+"""
+Capture profile test
+Kiosk capture settings follow the detection width, device and server load.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.capture_profile import LoadMonitor, capture_profile
+
+
+def test_idle_server_profile():
+    profile = capture_profile(LoadMonitor(), detect_width=640)
+    assert (profile["width"], profile["height"]) == (960, 540)
+    assert profile["jpeg_quality"] == 0.75 and profile["interval_ms"] == 800
+    assert not profile["busy"]
+    assert profile["clip_frames"] == 8 and profile["clip_interval_ms"] == 100
+
+    mobile = capture_profile(LoadMonitor(), detect_width=640, mobile=True)
+    assert mobile["width"] == 640 and mobile["jpeg_quality"] < 0.75
+    # Never below the detection width
+    assert capture_profile(LoadMonitor(), detect_width=1024, mobile=True)["width"] == 1024
+
+
+def test_busy_server_slows_clients_down():
+    load = LoadMonitor()
+    load.record(900)
+    profile = capture_profile(load, detect_width=640)
+    assert profile["busy"]
+    assert profile["width"] == 640 and profile["jpeg_quality"] == 0.6
+    assert profile["interval_ms"] == 1800
+
+
+def test_timed_view_records_latency():
+    load = LoadMonitor()
+
+    @load.timed
+    def view():
+        return "ok"
+
+    assert view() == "ok" and view.__name__ == "view"
+    assert load.latency_ms > 0 and load.in_flight == 0
+
+
+def test_burst_latency_counts_per_frame():
+    load = LoadMonitor()
+
+    @load.timed
+    def clip():
+        load.frames(8)
+        time.sleep(0.08)
+
+    clip()
+    assert 8 <= load.latency_ms < 40
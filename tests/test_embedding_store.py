@@ -0,0 +1,86 @@
+"""
+Quantized embedding store test
+int8 / float16 galleries with float32 re-rank against the float32 exact path.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ann_index import ExactIndex, IVFIndex, search_gallery
+from utils.embedding_store import Float32Store, QuantizedStore, make_store
+from tests.test_ann_index import make_gallery, make_queries
+
+
+def test_quantized_memory_footprint():
+    gallery = make_gallery(2000)
+    float32 = Float32Store(gallery)
+    assert float32.nbytes / QuantizedStore(gallery, "int8").nbytes >= 3.9
+    assert float32.nbytes / QuantizedStore(gallery, "float16").nbytes == 2.0
+
+
+def test_quantized_search_matches_float32():
+    gallery = make_gallery(10000)
+    queries = make_queries(gallery, 200)
+    exact_rows, exact_sims = ExactIndex().search(gallery, queries, k=1)
+
+    for mode in ("int8", "float16"):
+        store = make_store(gallery, mode)
+        rows, sims = search_gallery(ExactIndex(), store, queries, k=1, rerank=32)
+        assert np.mean(rows[:, 0] == exact_rows[:, 0]) >= 0.99
+        # Re-ranked against the float32 rows: the scores are exact
+        hit = rows[:, 0] == exact_rows[:, 0]
+        np.testing.assert_allclose(sims[hit, 0], exact_sims[hit, 0], rtol=0, atol=1e-6)
+
+
+def test_quantized_store_with_ivf():
+    gallery = make_gallery(5000)
+    queries = make_queries(gallery, 100)
+    exact_rows, _ = ExactIndex().search(gallery, queries, k=1)
+
+    store = make_store(gallery, "int8")
+    index = IVFIndex(nlist=70, nprobe=70).build(store)
+    rows, _ = search_gallery(index, store, queries, k=3, rerank=32)
+    assert rows.shape == (100, 3)
+    assert np.mean(rows[:, 0] == exact_rows[:, 0]) >= 0.99
+
+
+def test_unknown_mode_rejected():
+    try:
+        make_store(make_gallery(10), "int4")
+    except ValueError:
+        return
+    raise AssertionError("int4 storage should be rejected")
+
+
+def test_incremental_updates_keep_index_consistent():
+    rng = np.random.default_rng(3)
+    gallery = make_gallery(3000)
+    extra = make_gallery(200, seed=7)
+
+    for mode in ("float32", "int8"):
+        store = make_store(gallery, mode)
+        index = IVFIndex(nlist=40, nprobe=40).build(store)
+
+        for vec in extra[:100]:  # add
+            index.add(len(store), vec)
+            store = store.appended(vec)
+        for row, vec in zip(rng.choice(len(store), 50, replace=False), extra[100:150]):  # update
+            store = store.with_row(row, vec)
+            index.update(row, vec)
+        for _ in range(80):  # remove (last row moves into the hole)
+            row = int(rng.integers(len(store)))
+            last = len(store) - 1
+            store = store.without_row(row)
+            index.remove(row, last)
+
+        assert sorted(np.concatenate(index.lists).tolist()) == list(range(len(store)))
+        if mode == "int8":  # the float32 rows follow the codes
+            dequantized = store.codes.astype(np.float32) * store.scale[:, None]
+            assert np.abs(store.take(slice(None)) - dequantized).max() < 0.01
+        queries = make_queries(store.take(slice(None)), 50)
+        exact_rows, _ = search_gallery(ExactIndex(), store, queries, k=1)
+        rows, _ = search_gallery(index, store, queries, k=1)
+        np.testing.assert_array_equal(rows, exact_rows)
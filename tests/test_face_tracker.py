@@ -0,0 +1,106 @@
+"""
+Face tracker test
+Track association, re-embedding rules and identity voting.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.face_tracker import FaceTracker, box_iou
+
+
+def _match(emp_id, sim=0.8):
+    return ({"emp_id": emp_id, "name": f"e{emp_id}"}, sim)
+
+
+def test_boxes_follow_tracks_across_frames():
+    tracker = FaceTracker()
+    first = tracker.assign([(0, 0, 100, 100), (300, 0, 400, 100)], now=0.0)
+    second = tracker.assign([(305, 2, 405, 102), (4, 0, 104, 100)], now=0.2)
+    assert second[0] is first[1] and second[1] is first[0]
+
+    # A face appearing elsewhere starts a new track
+    third = tracker.assign([(600, 0, 700, 100)], now=0.4)
+    assert third[0] not in first
+    # Unseen tracks expire
+    tracker.assign([], now=10.0)
+    assert tracker.tracks == []
+
+
+def test_embedding_is_reused_until_moved_or_expired():
+    tracker = FaceTracker(result_ttl=2.0)
+    track = tracker.assign([(0, 0, 100, 100)], now=0.0)[0]
+    assert tracker.needs_embedding(track, now=0.0)
+    track.record([1.0], _match(7), now=0.0)
+
+    tracker.assign([(3, 0, 103, 100)], now=0.5)
+    assert not tracker.needs_embedding(track, now=0.5)
+    assert tracker.needs_embedding(track, now=2.5)
+
+    tracker.assign([(40, 0, 140, 100)], now=0.7)  # same track, moved
+    assert box_iou(track.bbox, track.embedded_bbox) < tracker.reembed_iou
+    assert tracker.needs_embedding(track, now=0.7)
+
+
+def test_identity_is_voted():
+    tracker = FaceTracker()
+    track = tracker.assign([(0, 0, 100, 100)], now=0.0)[0]
+    assert track.decision() is None
+    assert track.record([1.0], _match(7, 0.7), now=0.0)
+    assert track.record([1.0], _match(7, 0.9), now=1.0)
+    assert not track.record([1.0], None, now=2.0)  # one blurry frame
+    details, sim = track.decision()
+    assert details["emp_id"] == 7 and sim == 0.9
+
+    assert not track.record([1.0], None, now=3.0)
+    # 2 vs 2: most recent wins
+    assert track.decision() is None
+    assert track.record([1.0], _match(7), now=4.0)
+    assert track.decision()[0]["emp_id"] == 7
+
+
+def test_person_swap_restarts_the_vote():
+    """A stands at the kiosk for 10 s, then B steps into almost the same box."""
+    tracker = FaceTracker(result_ttl=2.0)
+    marked = []
+    for n in range(50):
+        now = n * 0.4
+        emp_id, box = (7, (0, 0, 100, 100)) if now < 10 else (9, (2, 1, 102, 101))
+        track = tracker.assign([box], now=now)[0]
+        fresh = False
+        if tracker.needs_embedding(track, now=now):
+            fresh = track.record([1.0], _match(emp_id), now=now)
+        assert track.track_id == 1  # the track carries on through the swap
+        if fresh:  # what the kiosk marks attendance on
+            marked.append((now, track.decision()[0]["emp_id"]))
+        if now >= 10 and track.embedded_at >= 10:
+            assert track.decision()[0]["emp_id"] == 9
+
+    assert marked[0] == (0.0, 7)
+    assert all(emp_id == 7 for now, emp_id in marked if now < 10)
+    assert all(emp_id == 9 for now, emp_id in marked if now >= 10)
+    # B is marked on the first re-check after the swap
+    assert min(now for now, emp_id in marked if emp_id == 9) <= 10 + tracker.result_ttl
+
+
+def test_tracks_continue_in_another_worker():
+    """Frames of one kiosk alternate between workers that share only the kiosk state."""
+    state = {}
+    votes = [7, 7, None, 9, 7]
+    for n, emp_id in enumerate(votes):
+        tracker = FaceTracker()  # a fresh tracker per frame, as in the kiosk route
+        tracker.load_state(state.get("tracks"))
+        track = tracker.assign([(n, 0, 100 + n, 100)], now=n * 0.8)[0]
+        assert track.track_id == 1
+        assert tracker.needs_embedding(track, now=n * 0.8) == (n == 0)
+        track.record([1.0], _match(emp_id) if emp_id else None, now=n * 0.8)
+        state["tracks"] = json.loads(json.dumps(tracker.state_dict()))
+
+    tracker = FaceTracker()
+    tracker.load_state(state["tracks"])
+    assert len(tracker.tracks) == 1 and tracker.tracks[0].track_id == 1
+    assert tracker.tracks[0].decision()[0]["emp_id"] == 7
+    tracker.load_state(None)
+    assert tracker.tracks == []
@@ -0,0 +1,92 @@
+"""
+Frame gate test
+Unchanged kiosk frames replay the last side-effect-free response.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_gate import FrameGateRegistry
+from utils.liveness_backends import HeuristicLiveness
+from test_landmark_liveness import _face
+
+
+def _frame(value=100, noise=0, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = np.full((720, 1280, 3), value, dtype=np.int16)
+    frame += rng.integers(-noise, noise + 1, frame.shape, dtype=np.int16) if noise else 0
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def test_unchanged_frames_replay_wait_response():
+    gates = FrameGateRegistry(threshold=2.0, max_age=3.0)
+    sig, cached = gates.check("k1", _frame(), now=0.0)
+    assert cached is None
+    gates.store("k1", sig, {"status": "WAIT", "message": "No face"}, now=0.0)
+
+    # Sensor noise averages out in the thumbnail
+    _, cached = gates.check("k1", _frame(noise=8, seed=1), now=0.5)
+    assert cached == {"status": "WAIT", "message": "No face"}
+    # Another kiosk has its own state
+    assert gates.check("k2", _frame(), now=0.5)[1] is None
+    # A changed scene and an expired response are processed again
+    assert gates.check("k1", _frame(value=140), now=0.6)[1] is None
+    assert gates.check("k1", _frame(), now=5.0)[1] is None
+
+    assert gates.stats()["skipped"] == 1 and gates.stats()["frames"] == 5
+
+
+def test_attendance_results_are_never_replayed():
+    gates = FrameGateRegistry(threshold=2.0)
+    sig, _ = gates.check("k1", _frame(), now=0.0)
+    gates.store("k1", sig, {"status": "check-in", "name": "A"}, now=0.0)
+    assert gates.check("k1", _frame(), now=0.1)[1] is None
+
+
+def test_zero_threshold_disables_gate():
+    gates = FrameGateRegistry(threshold=0)
+    sig, _ = gates.check("k1", _frame())
+    gates.store("k1", sig, {"status": "WAIT"})
+    assert gates.check("k1", _frame()) == (None, None)
+
+
+def _person(opening):
+    """Kiosk frame of someone standing still, eyes open (0.3) or closed (0.08)."""
+    frame = np.full((360, 640, 3), 90, dtype=np.uint8)
+    cv2.rectangle(frame, (240, 80), (400, 300), (150, 160, 190), -1)
+    for cx in (285, 355):
+        cv2.ellipse(frame, (cx, 160), (18, max(1, int(60 * opening))), 0, 0, 360, (40, 40, 40), -1)
+    return frame
+
+
+def _recognize(gates, backend, state, opening, now):
+    """The change gate and liveness steps of /kiosk/recognize for one frame."""
+    signature, cached = gates.check("k1", _person(opening), now=now)
+    if cached is not None:
+        return cached
+    is_live, _, message, _ = backend.check(state, None, [_face(opening=opening)])
+    if is_live:
+        return {"status": "check-in"}
+    response = {"status": "WAIT", "message": message}
+    gates.store("k1", signature, response, now=now, replay=backend.replay_wait)
+    return response
+
+
+def test_blink_reaches_liveness_through_the_gate():
+    blink = [0.3, 0.3, 0.08, 0.08, 0.3, 0.3]
+    backend = HeuristicLiveness(mode="landmarks")
+    gates, state = FrameGateRegistry(threshold=2.0, max_age=3.0), {}
+    statuses = [_recognize(gates, backend, state, o, now=0.2 * i)["status"] for i, o in enumerate(blink)]
+    assert statuses == ["WAIT"] * 4 + ["check-in", "check-in"]
+
+    # Replaying the WAIT would hide the blink: the frames differ too little
+    class Replaying(HeuristicLiveness):
+        replay_wait = True
+    gates, state = FrameGateRegistry(threshold=2.0, max_age=3.0), {}
+    statuses = [_recognize(gates, Replaying(mode="landmarks"), state, o, now=0.2 * i)["status"]
+                for i, o in enumerate(blink)]
+    assert statuses == ["WAIT"] * 6
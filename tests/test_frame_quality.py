@@ -0,0 +1,54 @@
+"""
+Frame quality test
+Reason codes of the pre-inference quality gate.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_quality import (LOW_CONTRAST, QUALITY_OK, TOO_BLURRY, TOO_BRIGHT, TOO_DARK,
+                                 assess_frame, region_sharpness)
+
+
+def _scene():
+    """Textured 720p frame: a bright face-sized disc with dark features."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(60, 180, (720, 1280), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (5, 5), 0)
+    cv2.circle(frame, (640, 360), 150, 200, -1)
+    cv2.circle(frame, (590, 320), 20, 30, -1)
+    cv2.circle(frame, (690, 320), 20, 30, -1)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+def test_reason_codes():
+    frame = _scene()
+    assert assess_frame(frame).reason == QUALITY_OK
+    assert assess_frame((frame * 0.15).astype(np.uint8)).reason == TOO_DARK
+    assert assess_frame(np.clip(frame.astype(np.int16) + 200, 0, 255).astype(np.uint8)).reason == TOO_BRIGHT
+    assert assess_frame(np.full_like(frame, 120)).reason == LOW_CONTRAST
+    assert assess_frame(cv2.GaussianBlur(frame, (41, 41), 15)).reason == TOO_BLURRY
+
+
+def test_white_background_is_not_overexposed():
+    frame = np.full((720, 1280, 3), 250, dtype=np.uint8)
+    frame[200:560, 500:780] = _scene()[200:560, 500:780]
+    assert assess_frame(frame).reason == QUALITY_OK
+
+
+def test_rgb_frames():
+    rgb = cv2.cvtColor(_scene(), cv2.COLOR_BGR2RGB)
+    quality = assess_frame(rgb, rgb=True)
+    assert quality.ok and quality.message
+
+
+def test_region_sharpness_prefers_the_sharper_face():
+    frame = _scene()
+    blurred = cv2.GaussianBlur(frame, (9, 9), 0)
+    box = (490, 210, 790, 510)
+    assert region_sharpness(frame, box) > region_sharpness(blurred, box) > 0
+    assert region_sharpness(frame, (-50, -50, 1, 1)) == 0.0
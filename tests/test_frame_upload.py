@@ -0,0 +1,92 @@
+"""
+Frame upload test
+The same frame (or burst) sent as a raw JPEG body, multipart files or base64 JSON.
+"""
+import base64
+import io
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_upload import decode_image, request_frame, request_frames, split_jpeg_stream
+
+app = Flask(__name__)
+
+
+def _jpeg():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:, 32:] = (0, 0, 255)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+def _upload(**kwargs):
+    with app.test_request_context("/kiosk/recognize", method="POST", **kwargs):
+        return request_frame("frame")
+
+
+def test_all_upload_forms_decode_the_same_frame():
+    jpeg = _jpeg()
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    frames = [
+        _upload(data=jpeg, content_type="image/jpeg"),
+        _upload(data={"frame": (io.BytesIO(jpeg), "frame.jpg")}, content_type="multipart/form-data"),
+        _upload(data=json.dumps({"frame": data_url}), content_type="application/json"),
+    ]
+    for frame in frames:
+        assert frame.shape == (48, 64, 3)
+        np.testing.assert_array_equal(frame, frames[0])
+    assert frames[0][0, 60, 2] > 200  # BGR order: red half
+
+
+def test_missing_and_invalid_uploads():
+    assert _upload(data=json.dumps({}), content_type="application/json") is None
+    assert _upload(data=b"", content_type="image/jpeg") is None
+    with pytest.raises(ValueError):
+        _upload(data=b"not a jpeg", content_type="image/jpeg")
+
+
+def _jpeg_with_thumbnail(value):
+    """JPEG whose APP1 segment embeds a whole second JPEG, like an EXIF thumbnail."""
+    jpeg = cv2.imencode(".jpg", np.full((48, 64, 3), value, dtype=np.uint8))[1].tobytes()
+    thumb = cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+    payload = b"Exif\x00\x00" + thumb
+    app1 = b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return jpeg[:2] + app1 + jpeg[2:]
+
+
+def test_split_jpeg_stream():
+    images = [_jpeg_with_thumbnail(v) for v in (40, 120, 200)]
+    parts = split_jpeg_stream(b"".join(images))
+    assert parts == images
+    assert [int(decode_image(p)[0, 0, 0]) for p in parts] == pytest.approx([40, 120, 200], abs=2)
+    with pytest.raises(ValueError):
+        split_jpeg_stream(images[0][:-40])
+    with pytest.raises(ValueError):
+        split_jpeg_stream(b"not a jpeg")
+
+
+def _burst(**kwargs):
+    with app.test_request_context("/kiosk/recognize_clip", method="POST", **kwargs):
+        return request_frames("frames", max_frames=2)
+
+
+def test_bursts_in_every_upload_form():
+    jpegs = [_jpeg(), _jpeg(), _jpeg()]
+    data_urls = ["data:image/jpeg;base64," + base64.b64encode(j).decode() for j in jpegs]
+    bursts = [
+        _burst(data=b"".join(jpegs), content_type="video/x-motion-jpeg"),
+        _burst(data={"frames": [(io.BytesIO(j), f"{i}.jpg") for i, j in enumerate(jpegs)]},
+               content_type="multipart/form-data"),
+        _burst(data=json.dumps({"frames": data_urls}), content_type="application/json"),
+    ]
+    for frames in bursts:
+        assert len(frames) == 2  # capped at max_frames
+        assert all(f.shape == (48, 64, 3) for f in frames)
+    assert _burst(data=json.dumps({"frames": "x"}), content_type="application/json") == []
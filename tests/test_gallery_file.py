@@ -0,0 +1,95 @@
+"""
+Gallery file test
+Round-trips gallery snapshots through the memory-mapped file format.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.gallery import FaceGallery
+from utils.gallery_file import file_signature, read_gallery_file, write_gallery_file
+from tests.test_ann_index import make_gallery, make_queries
+
+
+def _gallery(storage, index_kind, n=2000):
+    vectors = make_gallery(n)
+    gallery = FaceGallery(storage=storage, index_kind=index_kind, min_size=0, nlist=20, nprobe=20,
+                          columns=("name",))
+    gallery.load(list(range(100, 100 + n)), vectors, {"name": [f"e{i}" for i in range(n)]})
+    return gallery, vectors
+
+
+def test_round_trip_is_zero_copy(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    for storage, index_kind in (("float32", "exact"), ("int8", "ivf")):
+        gallery, vectors = _gallery(storage, index_kind)
+        snap = gallery.snapshot
+        write_gallery_file(path, snap, watermark=42, generation=3, model="buffalo_l")
+
+        mapped = read_gallery_file(path, nprobe=20)
+        assert mapped.generation == 3 and mapped.watermark == 42
+        assert mapped.header["model"] == "buffalo_l"
+        assert mapped.store.mode == storage
+        assert mapped.index.kind == index_kind
+        assert mapped.employee_ids == list(snap.employee_ids)
+        assert mapped.columns["name"][5] == "e5"
+
+        codes = mapped.store.matrix if storage == "float32" else mapped.store.codes
+        assert not codes.flags.writeable and not codes.flags.owndata
+        if storage != "float32":  # float32 rows for the re-rank, also mapped
+            assert not mapped.store.exact.flags.owndata
+            np.testing.assert_array_equal(mapped.store.take(slice(None)), vectors)
+
+        reader = FaceGallery(storage=storage, index_kind=index_kind, min_size=0, columns=("name",))
+        reader.adopt(mapped.employee_ids, mapped.store, mapped.columns, mapped.index)
+        assert reader.snapshot.index is mapped.index
+        queries = make_queries(vectors, 20)
+        assert reader.match_batch(queries, 0.5) == gallery.match_batch(queries, 0.5)
+
+
+def test_updates_on_mapped_gallery_copy(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    gallery, vectors = _gallery("float32", "ivf", n=500)
+    write_gallery_file(path, gallery.snapshot, watermark=0, generation=1)
+    mapped = read_gallery_file(path)
+
+    reader = FaceGallery(index_kind="ivf", min_size=0, columns=("name",))
+    reader.adopt(mapped.employee_ids, mapped.store, mapped.columns, mapped.index)
+    reader.upsert(100, vectors[1], {"name": "moved"})
+    reader.remove(101)
+    assert reader.snapshot.details(100)["name"] == "moved"
+    # The mapping itself is untouched
+    np.testing.assert_array_equal(mapped.store.matrix[0], vectors[0])
+
+
+def test_replace_keeps_old_mapping_valid(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    gallery, vectors = _gallery("float32", "exact", n=100)
+    write_gallery_file(path, gallery.snapshot, watermark=1, generation=1)
+    old = read_gallery_file(path)
+
+    gallery.remove(100)
+    write_gallery_file(path, gallery.snapshot, watermark=2, generation=2)
+    assert file_signature(path) != old.signature
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+    new = read_gallery_file(path)
+    assert len(new.employee_ids) == 99 and new.generation == 2
+    # A worker still on the old version keeps reading it
+    np.testing.assert_array_equal(old.store.matrix[0], vectors[0])
+
+
+def test_republished_file_keeps_its_load_time(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    gallery, _ = _gallery("float32", "exact", n=50)
+    write_gallery_file(path, gallery.snapshot, watermark=1, generation=1)
+    first = read_gallery_file(path)
+    assert first.loaded_at == first.header["created_at"]
+
+    write_gallery_file(path, gallery.snapshot, watermark=2, generation=2, loaded_at=first.loaded_at - 3600)
+    second = read_gallery_file(path)
+    assert second.loaded_at == first.loaded_at - 3600
+    assert second.header["created_at"] >= first.header["created_at"]
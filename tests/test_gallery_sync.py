@@ -0,0 +1,94 @@
+"""
+Gallery change log test
+GallerySync against an in-memory stand-in for the face_data_changes table.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import gallery_sync
+from utils.gallery_sync import GallerySync
+
+
+class FakeChangeLog:
+    """Connection/cursor pair serving `face_data_changes` rows."""
+
+    def __init__(self):
+        self.rows = []
+        self.queries = 0
+        self._result = []
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=()):
+        self.queries += 1
+        if query.lstrip().startswith("INSERT"):
+            self.rows.append((len(self.rows) + 1, params[0]))
+        elif "MAX(id)" in query:
+            self._result = [(len(self.rows),)]
+        else:
+            watermark, limit = params
+            self._result = [r for r in self.rows if r[0] > watermark][:limit]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_poll_applies_only_new_changes(monkeypatch):
+    log = FakeChangeLog()
+    monkeypatch.setattr(gallery_sync, "get_db", lambda: log)
+    applied = []
+    sync = GallerySync(applied.append, interval=0)
+
+    gallery_sync.record_change(7)
+    assert sync.poll() == 0  # no watermark until the gallery is loaded
+
+    sync.watermark = gallery_sync.latest_change_id()
+    for emp_id in (3, 4, 3):
+        gallery_sync.record_change(emp_id)
+
+    assert sync.poll() == 2
+    assert applied == [3, 4]
+    assert sync.watermark == 4
+    assert sync.poll() == 0
+    assert applied == [3, 4]
+
+
+def test_poll_is_rate_limited(monkeypatch):
+    log = FakeChangeLog()
+    monkeypatch.setattr(gallery_sync, "get_db", lambda: log)
+    sync = GallerySync(lambda emp_id: None, interval=60)
+    sync.watermark = 0
+
+    sync.poll()
+    queries = log.queries
+    for _ in range(10):
+        sync.poll()
+    assert log.queries == queries
+    sync.poll(force=True)
+    assert log.queries == queries + 1
+
+
+def test_capture_holds_off_polls(monkeypatch):
+    log = FakeChangeLog()
+    monkeypatch.setattr(gallery_sync, "get_db", lambda: log)
+    applied = []
+    sync = GallerySync(applied.append, interval=0)
+    sync.watermark = 0
+    gallery_sync.record_change(5)
+
+    # A poll from another thread while the gallery file is being captured
+    snap, watermark = sync.capture(lambda: (sync.poll(), list(applied)))
+    assert snap == (0, []) and watermark == 0
+    assert sync.poll() == 1 and sync.watermark == 1
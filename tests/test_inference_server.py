@@ -0,0 +1,122 @@
+"""
+Inference server test
+Micro-batching and the socket round trip, with stand-in detection and
+recognition models (needs insightface for Face / face_align).
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("insightface")
+
+from utils.inference_client import RemoteFaceAnalysis
+from utils.inference_profiles import PROFILES, analyze_batch
+from utils.inference_server import InferenceServer
+
+KPS = np.array([[38, 52], [74, 52], [56, 72], [42, 92], [70, 92]], dtype=np.float32)
+
+
+class FakeDetector:
+    def __init__(self):
+        self.sizes = []
+
+    def detect(self, img, input_size=None, max_num=0, metric="default"):
+        self.sizes.append(input_size)
+        # One face per 100 px of width
+        n = img.shape[1] // 100
+        bboxes = np.array([[i * 100, 0, i * 100 + 100, 100, 0.9] for i in range(n)], dtype=np.float32)
+        kpss = np.stack([KPS + [i * 100, 0] for i in range(n)]) if n else None
+        return bboxes.reshape(n, 5), kpss
+
+
+class FakeRecognizer:
+    input_size = (112, 112)
+
+    def __init__(self):
+        self.calls = []
+
+    def get_feat(self, imgs):
+        self.calls.append(len(imgs))
+        return np.ones((len(imgs), 512), dtype=np.float32)
+
+
+class FakeApp:
+    def __init__(self):
+        self.det_model = FakeDetector()
+        self.rec = FakeRecognizer()
+        self.models = {"detection": self.det_model, "recognition": self.rec}
+
+
+def test_recognition_is_batched_across_frames():
+    app = FakeApp()
+    frames = [np.zeros((120, w, 3), dtype=np.uint8) for w in (100, 300, 50)]
+    results = analyze_batch(app, frames)
+    assert [len(faces) for faces in results] == [1, 3, 0]
+    assert app.rec.calls == [4]
+    assert results[1][2].normed_embedding.shape == (512,)
+
+
+def test_profiles_pick_modules_and_det_size():
+    app = FakeApp()
+    frames = [np.zeros((120, 200, 3), dtype=np.uint8)] * 2
+    results = analyze_batch(app, frames, profiles=[PROFILES["detect-only"], PROFILES["kiosk"]])
+    assert app.det_model.sizes == [(224, 128), (224, 128)]  # fitted to the frame, no padding
+    assert results[0][0].embedding is None
+    assert results[1][0].embedding.shape == (512,)
+    assert app.rec.calls == [2]
+
+
+def test_detection_on_downscaled_frame_maps_back_to_full_resolution():
+    app = FakeApp()
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    faces = analyze_batch(app, [frame], profiles=[PROFILES["kiosk"]])[0]
+    assert app.det_model.sizes == [(640, 384)]
+    # 6 faces found on the 640x360 copy, boxes and keypoints in frame coordinates
+    assert len(faces) == 6
+    np.testing.assert_allclose(faces[1].bbox, [200, 0, 400, 200])
+    np.testing.assert_allclose(faces[1].kps[0], (KPS[0] + [100, 0]) * 2)
+    assert app.rec.calls == [6]
+
+
+def test_remote_get_round_trip(tmp_path):
+    app = FakeApp()
+    server = InferenceServer(str(tmp_path / "inference.sock"), app, max_batch=8,
+                             max_wait_ms=50, authkey=b"test")
+    ready = threading.Event()
+    threading.Thread(target=server.serve_forever, args=(ready,), daemon=True).start()
+    assert ready.wait(5)
+
+    client = RemoteFaceAnalysis(server.address, authkey=b"test")
+    results = [None] * 4
+
+    def worker(i):
+        results[i] = client.get(np.zeros((120, 200, 3), dtype=np.uint8))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    detected = client.profile("detect-only").get(np.zeros((120, 100, 3), dtype=np.uint8))
+
+    # Detect without embedding, then embed one face from its aligned crop
+    frame = np.zeros((120, 300, 3), dtype=np.uint8)
+    kiosk = client.profile("kiosk")
+    faces = kiosk.get(frame, embed=False)
+    calls = len(app.rec.calls)
+    kiosk.embed(frame, faces[1:2])
+    server.close()
+
+    assert [f.embedding is None for f in faces] == [True, False, True]
+    assert app.rec.calls[calls:] == [1]
+
+    assert all(len(faces) == 2 for faces in results)
+    assert results[0][1].bbox[0] == 100
+    # Concurrent requests shared recognition calls
+    assert sum(app.rec.calls[:calls]) == 8 and calls < 4
+    assert len(detected) == 1 and detected[0].embedding is None
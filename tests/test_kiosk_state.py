@@ -0,0 +1,117 @@
+"""
+Kiosk state store test
+Per-kiosk liveness/cooldown state in memory and in a stand-in kiosk_state table.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import kiosk_state
+from utils.kiosk_state import DbKioskStateStore, MemoryKioskStateStore
+from utils.liveness_detector import LivenessDetector
+
+
+class FakeStateTable:
+    """Connection/cursor pair serving `kiosk_state` rows (expiry handled by `now`)."""
+
+    def __init__(self):
+        self.rows = {}  # kiosk_id -> (state, updated_at)
+        self.now = 0.0
+        self._result = None
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=()):
+        query = query.lstrip()
+        if query.startswith("INSERT"):
+            self.rows[params[0]] = (params[1], self.now)
+        elif query.startswith("SELECT"):
+            kiosk_id, ttl = params
+            row = self.rows.get(kiosk_id)
+            self._result = (row[0],) if row and row[1] >= self.now - ttl else None
+        elif "kiosk_id = %s" in query:
+            self.rows.pop(params[0], None)
+        elif query.startswith("DELETE"):
+            self.rows = {k: v for k, v in self.rows.items() if v[1] >= self.now - params[0]}
+
+    def fetchone(self):
+        return self._result
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_memory_store_keeps_kiosks_apart():
+    store = MemoryKioskStateStore(ttl=300)
+    assert store.load("k1") == {}
+    store.save("k1", {"last_unknown": 10.0}, now=0.0)
+    store.save("k2", {"last_unknown": 20.0}, now=0.0)
+    assert store.load("k1", now=1.0) == {"last_unknown": 10.0}
+    assert store.load("k2", now=1.0) == {"last_unknown": 20.0}
+
+    # Loaded state is a copy; only save() changes what is stored
+    store.load("k1", now=1.0)["last_unknown"] = 99.0
+    assert store.load("k1", now=1.0) == {"last_unknown": 10.0}
+
+    store.reset("k1")
+    assert store.load("k1", now=1.0) == {}
+
+
+def test_memory_store_evicts_idle_and_least_recent_kiosks():
+    store = MemoryKioskStateStore(ttl=60, max_kiosks=2)
+    store.save("k1", {"n": 1}, now=0.0)
+    store.save("k2", {"n": 2}, now=0.0)
+    store.load("k1", now=1.0)
+    store.save("k3", {"n": 3}, now=1.0)  # k2 was used least recently
+    assert len(store) == 2 and store.load("k2", now=1.0) == {}
+    assert store.load("k1", now=61.5) == {}  # idle past the TTL
+    assert store.load("k3", now=61.0) == {"n": 3}
+
+
+def test_db_store_is_shared_between_workers(monkeypatch):
+    table = FakeStateTable()
+    monkeypatch.setattr(kiosk_state, "get_db", lambda: table)
+    worker_a = DbKioskStateStore(ttl=300, prune_interval=0)
+    worker_b = DbKioskStateStore(ttl=300)
+
+    worker_a.save("k1", {"liveness": {"frame_count": 1}})
+    state = worker_b.load("k1")
+    state["liveness"]["frame_count"] += 1
+    worker_b.save("k1", state)
+    assert worker_a.load("k1") == {"liveness": {"frame_count": 2}}
+
+    table.now = 400.0
+    assert worker_a.load("k1") == {}
+    worker_a.save("k2", {})  # prunes the expired row
+    assert list(table.rows) == ["k2"]
+
+    worker_b.reset("k2")
+    assert worker_a.load("k2") == {}
+
+
+def test_liveness_window_survives_a_round_trip():
+    detector = LivenessDetector()
+    detector.frame_count = 7
+    detector.cached_face_box = np.array([10, 20, 100, 120], dtype=np.int32)
+    detector.prev_nose_position = (np.int32(60), np.int32(80))
+    detector.frame_results = [{"passed": True, "confidence": 0.7}]
+
+    store = MemoryKioskStateStore()
+    store.save("k1", {"liveness": detector.state_dict()})
+
+    restored = LivenessDetector()
+    restored.load_state(store.load("k1")["liveness"])
+    assert restored.frame_count == 7
+    assert list(restored.cached_face_box) == [10, 20, 100, 120]
+    assert list(restored.prev_nose_position) == [60, 80]
+    assert restored.frame_results == [{"passed": True, "confidence": 0.7}]
+
+    restored.load_state(None)
+    assert restored.frame_count == 0 and restored.cached_face_box is None
@@ -0,0 +1,110 @@
+"""
+Landmark liveness test
+Blinks and head turns read from InsightFace-style landmarks of synthetic faces.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.liveness_detector import (
+    EYES_106, LandmarkLivenessDetector, eye_aspect_ratio, face_ear, face_yaw, largest_face,
+)
+
+
+class FakeFace(dict):
+    """insightface.app.common.Face stand-in: a dict with attribute access."""
+    __getattr__ = dict.get
+
+
+def _eye(cx, cy, width, opening, n=10):
+    """Eye contour as an ellipse of the given opening (height / width)."""
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.stack([cx + width / 2 * np.cos(t), cy + width * opening / 2 * np.sin(t)], axis=1)
+
+
+def _face(opening=0.3, nose_offset=0.0, x=0):
+    landmarks = np.zeros((106, 2), dtype=np.float32)
+    landmarks[list(EYES_106[0])] = _eye(x + 140, 200, 40, opening)
+    landmarks[list(EYES_106[1])] = _eye(x + 260, 200, 40, opening)
+    kps = np.array([[x + 140, 200], [x + 260, 200], [x + 200 + nose_offset, 260],
+                    [x + 150, 320], [x + 250, 320]], dtype=np.float32)
+    return FakeFace(bbox=np.array([x + 100, 120, x + 300, 380], dtype=np.float32),
+                    kps=kps, landmark_2d_106=landmarks)
+
+
+def _rolled(face, degrees):
+    """The same face rotated in the image plane about its box centre (a tilted photo)."""
+    angle = np.radians(degrees)
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+    centre = face.bbox.reshape(2, 2).mean(axis=0)
+    turn = lambda points: (points - centre) @ rot.T + centre
+    return FakeFace(face, kps=turn(face.kps), landmark_2d_106=turn(face.landmark_2d_106))
+
+
+def test_eye_aspect_ratio_ignores_point_order_and_rotation():
+    eye = _eye(0, 0, 40, 0.3)
+    assert abs(eye_aspect_ratio(eye) - 0.3) < 0.02
+    angle = np.radians(25)
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    shuffled = (eye @ rot.T)[np.random.default_rng(0).permutation(len(eye))]
+    assert abs(eye_aspect_ratio(shuffled) - eye_aspect_ratio(eye)) < 1e-4
+
+
+def test_face_signals():
+    assert face_ear(_face(opening=0.08)) < 0.1 < face_ear(_face(opening=0.3))
+    assert abs(face_yaw(_face())) < 1e-6
+    assert face_yaw(_face(nose_offset=30)) > 10 > 0 > face_yaw(_face(nose_offset=-30))
+    # The 3D landmark pose wins when that model ran
+    assert face_yaw(FakeFace(_face(), pose=np.array([0.0, -7.5, 0.0]))) == -7.5
+    assert face_ear(FakeFace(kps=_face().kps)) is None
+
+    assert largest_face([_face(x=0), FakeFace(_face(), bbox=np.array([0, 0, 500, 500]))]).bbox[2] == 500
+    assert largest_face([]) is None
+
+
+def test_blink_passes_liveness():
+    detector = LandmarkLivenessDetector(ear_threshold=0.2, yaw_range=12)
+    assert detector.check_liveness(None) == (False, 0.0, "No face detected")
+    assert not detector.check_liveness(_face(opening=0.3))[0]
+    assert not detector.check_liveness(_face(opening=0.08))[0]  # eyes closed
+    assert not detector.check_liveness(_face(opening=0.08))[0]
+    assert detector.check_liveness(_face(opening=0.3))[0]  # ...and open again
+
+
+def test_single_closed_frame_is_not_a_blink():
+    detector = LandmarkLivenessDetector(ear_threshold=0.2, yaw_range=12)
+    for opening in (0.3, 0.08, 0.3, 0.08, 0.3):
+        assert not detector.check_liveness(_face(opening=opening))[0]
+    assert detector.blinks == 0
+
+
+def test_head_turn_passes_liveness_across_saved_state():
+    state = None
+    results = []
+    for offset in (0, 5, 15, 25):
+        detector = LandmarkLivenessDetector(ear_threshold=0.2, yaw_range=12)
+        detector.load_state(state)  # a new detector per frame, as in the kiosk route
+        results.append(detector.check_liveness(_face(nose_offset=offset))[0])
+        state = detector.state_dict()
+    assert results == [False, False, False, True]
+    assert state["frame_count"] == 4
+
+
+def test_still_photo_never_passes():
+    detector = LandmarkLivenessDetector(ear_threshold=0.2, yaw_range=12)
+    # A flat photo moved around the frame keeps its eyes open and its nose centred
+    assert not any(detector.check_liveness(_face(x=x))[0] for x in range(0, 300, 10))
+
+
+def test_tilted_photo_never_passes():
+    # Rotating a flat photo in its own plane is roll, not yaw
+    for degrees in (5, 10, 15, 30):
+        assert abs(face_yaw(_rolled(_face(), degrees))) < 1e-3
+        assert face_yaw(_rolled(_face(nose_offset=30), degrees)) == pytest.approx(
+            face_yaw(_face(nose_offset=30)), abs=1e-3)
+    detector = LandmarkLivenessDetector(ear_threshold=0.2, yaw_range=12)
+    assert not any(detector.check_liveness(_rolled(_face(), d))[0] for d in (-8, 0, 8, -15, 15))
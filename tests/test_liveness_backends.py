@@ -0,0 +1,119 @@
+"""
+Liveness backends test
+Heuristic and ONNX anti-spoofing backends behind the kiosk liveness interface.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_quality import assess_frame
+from utils.liveness_backends import (
+    HeuristicLiveness, OnnxAntiSpoofLiveness, check_clip, get_liveness_backend,
+)
+from test_frame_quality import _scene
+from test_landmark_liveness import FakeFace, _face
+
+
+def test_heuristic_backend_keeps_its_window_in_the_kiosk_state():
+    backend = HeuristicLiveness(mode="landmarks")
+    assert backend.profile == "kiosk-landmarks"
+    state = {}
+    faces = [_face(opening=0.3)]
+    assert not backend.check(state, None, faces)[0]
+    assert not backend.check(state, None, [_face(opening=0.08)])[0]
+    assert not backend.check(state, None, [_face(opening=0.08)])[0]
+    is_live, _, _, returned = backend.check(state, None, faces)
+    assert is_live and returned is faces
+    assert state["liveness"]["blinks"] == 1
+
+
+def test_missing_model_falls_back_to_heuristic():
+    assert get_liveness_backend("onnx").name == "heuristic"
+    assert get_liveness_backend("heuristic").name == "heuristic"
+
+
+def _brightness_model(path, batch):
+    """Stand-in anti-spoof model: a crop is "real" when its mean pixel is above 128."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    axes = helper.make_tensor("axes", TensorProto.INT64, [3], [1, 2, 3])
+    weight = helper.make_tensor("w", TensorProto.FLOAT, [1, 2], [-0.1, 0.1])
+    bias = helper.make_tensor("b", TensorProto.FLOAT, [1, 2], [12.8, -12.8])
+    col = helper.make_tensor("col", TensorProto.INT64, [1], [1])
+    graph = helper.make_graph(
+        [
+            helper.make_node("ReduceMean", ["input", "axes"], ["mean"], keepdims=0),
+            helper.make_node("Unsqueeze", ["mean", "col"], ["mean2"]),
+            helper.make_node("Mul", ["mean2", "w"], ["scaled"]),
+            helper.make_node("Add", ["scaled", "b"], ["logits"]),
+        ],
+        "antispoof",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [batch, 3, 80, 80])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, [batch, 2])],
+        initializer=[axes, weight, bias, col],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 18)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+class _CpuPlan:
+    providers = ["CPUExecutionProvider"]
+
+    def session_options(self):
+        import onnxruntime as ort
+        return ort.SessionOptions()
+
+
+@pytest.mark.parametrize("batch", ["N", 1])
+def test_onnx_backend_scores_every_face_and_drops_spoofs(tmp_path, batch):
+    pytest.importorskip("onnxruntime")
+    backend = OnnxAntiSpoofLiveness(_brightness_model(tmp_path / "m.onnx", batch),
+                                    threshold=0.8, scale=1.0, plan=_CpuPlan())
+    assert backend.input_size == (80, 80) and backend.batched == (batch == "N")
+
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    frame[100:200, 100:200] = 250  # "real" face
+    frame[100:200, 400:500] = 40  # "photo"
+    real = FakeFace(bbox=np.array([100, 100, 200, 200], dtype=np.float32))
+    photo = FakeFace(bbox=np.array([400, 100, 500, 200], dtype=np.float32))
+
+    scores = backend.scores(frame, [real, photo])
+    assert scores[0] > 0.99 and scores[1] < 0.01
+
+    is_live, confidence, _, faces = backend.check({}, frame, [real, photo])
+    assert is_live and faces == [real] and confidence > 0.99
+    assert not backend.check({}, frame, [photo])[0]
+    assert backend.check({}, frame, [])[:3] == (False, 0.0, "No face detected")
+
+
+def test_clip_never_recognizes_a_spoof_frame():
+    # A blurry live frame, then a sharp frame showing only a printed photo
+    frames = [cv2.GaussianBlur(_scene(), (9, 9), 0), _scene()]
+    live_face = FakeFace(bbox=np.array([490, 210, 790, 510], dtype=np.float32), live=True)
+    photo = FakeFace(bbox=np.array([490, 210, 790, 510], dtype=np.float32), live=False)
+    detections = {id(frames[0]): [live_face], id(frames[1]): [photo]}
+
+    backend = OnnxAntiSpoofLiveness.__new__(OnnxAntiSpoofLiveness)  # no model needed
+    backend.threshold = 0.8
+    backend.scores = lambda frame, faces: [0.95 if face.live else 0.05 for face in faces]
+
+    qualities = [assess_frame(frame) for frame in frames]
+    assert all(q.ok for q in qualities) and qualities[1].sharpness > qualities[0].sharpness
+    is_live, _, message, best, faces = check_clip(
+        backend, {}, frames, qualities, lambda frame: detections[id(frame)])
+    assert is_live and message == "Live verified"
+    assert best == 0 and faces == [live_face]
+
+    # Nothing live in the burst: nothing to recognize
+    detections[id(frames[0])] = [photo]
+    is_live, _, _, best, faces = check_clip(
+        backend, {}, frames, qualities, lambda frame: detections[id(frame)])
+    assert not is_live and best is None and faces is None
@@ -0,0 +1,41 @@
+"""
+ONNX tuning test
+Thread split and provider parsing of the ONNX Runtime execution plan.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("insightface")
+
+from utils import onnx_tuning
+from utils.onnx_tuning import parse_providers, plan_from_env
+
+
+def test_threads_are_split_between_workers(monkeypatch):
+    monkeypatch.setattr(onnx_tuning, "cpu_count", lambda: 8)
+    monkeypatch.delenv("ORT_INTRA_OP_THREADS", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert plan_from_env().intra_op_threads == 2
+    assert plan_from_env(workers=1).intra_op_threads == 8
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert plan_from_env().intra_op_threads == 1
+
+    monkeypatch.setenv("ORT_INTRA_OP_THREADS", "3")
+    assert plan_from_env().intra_op_threads == 3
+
+
+def test_invalid_settings_are_rejected(monkeypatch):
+    monkeypatch.setenv("ORT_EXECUTION_MODE", "fastest")
+    with pytest.raises(ValueError):
+        plan_from_env()
+
+
+def test_providers_fall_back_to_cpu():
+    assert parse_providers("CPU") == ["CPUExecutionProvider"]
+    assert parse_providers("NoSuchExecutionProvider") == ["CPUExecutionProvider"]
+    assert parse_providers("cpu,CUDA")[-1] == "CPUExecutionProvider"
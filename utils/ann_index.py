@@ -0,0 +1,281 @@
+"""
+Similarity indexes for the face embedding gallery.
+
+Every index works on an embedding store (utils/embedding_store.py, or a
+plain (n, 512) matrix) of unit-length rows and answers cosine-similarity
+(dot product) top-k queries with row positions into that store. Mapping
+rows back to employee ids is left to the caller.
+
+- ExactIndex: brute-force scan, used for small galleries.
+- IVFIndex: inverted-file index over spherical k-means clusters. Only the
+  `nprobe` closest clusters are scanned; raising `nprobe` trades latency
+  for recall (nprobe == nlist is an exact search).
+"""
+import math
+import numpy as np
+
+from utils.embedding_store import EMBEDDING_DIM, Float32Store
+
+
+def _as_store(store):
+    if isinstance(store, np.ndarray):
+        return Float32Store(store)
+    return store
+
+
+def _as_queries(queries):
+    """Return queries as a 2-D float32 array of unit rows."""
+    q = np.asarray(queries, dtype=np.float32)
+    if q.ndim == 1:
+        q = q.reshape(1, -1)
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return q / norms
+
+
+def _topk(sims, k):
+    """Top-k positions and scores of a 1-D score vector, best first."""
+    n = sims.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    k = min(k, n)
+    if k < n:
+        part = np.argpartition(-sims, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    order = part[np.argsort(-sims[part], kind="stable")]
+    return order.astype(np.int64), sims[order].astype(np.float32)
+
+
+def _pad(rows, sims, k):
+    """Pad a short result to length k with row -1 / similarity -inf."""
+    if rows.shape[0] == k:
+        return rows, sims
+    out_rows = np.full(k, -1, dtype=np.int64)
+    out_sims = np.full(k, -np.inf, dtype=np.float32)
+    out_rows[:rows.shape[0]] = rows
+    out_sims[:sims.shape[0]] = sims
+    return out_rows, out_sims
+
+
+class ExactIndex:
+    """Brute-force search over the whole matrix."""
+
+    kind = "exact"
+
+    def build(self, store):
+        return self
+
+    def copy(self):
+        return self
+
+    # Nothing to maintain: every search scans the whole store
+    def add(self, row, vec):
+        pass
+
+    def update(self, row, vec):
+        pass
+
+    def remove(self, row, last):
+        pass
+
+    def search(self, store, queries, k=1):
+        """Return (rows, sims), each shaped (len(queries), k)."""
+        store = _as_store(store)
+        q = _as_queries(queries)
+        rows = np.full((q.shape[0], k), -1, dtype=np.int64)
+        sims = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        if len(store) == 0:
+            return rows, sims
+
+        scores = store.scores(q)
+        for j in range(q.shape[0]):
+            r, s = _pad(*_topk(scores[:, j], k), k)
+            rows[j], sims[j] = r, s
+        return rows, sims
+
+
+class IVFIndex:
+    """Inverted-file index with spherical k-means coarse clusters.
+
+    nlist:  number of clusters (0 = about sqrt(n))
+    nprobe: clusters scanned per query - the recall/latency knob
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist=0, nprobe=32, train_iters=10, seed=0):
+        self.nlist = int(nlist)
+        self.nprobe = max(1, int(nprobe))
+        self.train_iters = int(train_iters)
+        self.seed = seed
+        self.centroids = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.lists = []
+        self.row_list = np.empty(0, dtype=np.int64)
+
+    # ----------------------------------------------------
+    # TRAINING
+    # ----------------------------------------------------
+    def _train(self, store, nlist):
+        rng = np.random.default_rng(self.seed)
+        n = len(store)
+
+        # k-means only needs a sample; 64 points per cluster is plenty
+        sample_size = min(n, nlist * 64)
+        sample = store.take(np.sort(rng.choice(n, sample_size, replace=False)))
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assign = np.argmax(np.dot(sample, centroids.T), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+
+            # Re-seed empty clusters with random sample points
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        return centroids
+
+    def build(self, store):
+        store = _as_store(store)
+        n = len(store)
+        if n == 0:
+            self.centroids = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            self.lists = []
+            self.row_list = np.empty(0, dtype=np.int64)
+            return self
+
+        nlist = self.nlist or int(round(math.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+        self.centroids = self._train(store, nlist)
+
+        assign = np.concatenate([
+            self.assign(store.take(slice(start, start + 8192)))
+            for start in range(0, n, 8192)
+        ])
+        return self.from_assignment(self.centroids, assign)
+
+    def from_assignment(self, centroids, assign):
+        """Restore a built index from its centroids and row -> cluster array."""
+        nlist = centroids.shape[0]
+        self.centroids = centroids
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]].astype(np.int64) for c in range(nlist)]
+        self.row_list = np.asarray(assign, dtype=np.int64).copy()
+        return self
+
+    def assign(self, vectors):
+        """Nearest cluster for each row of `vectors`."""
+        return np.argmax(np.dot(vectors, self.centroids.T), axis=1)
+
+    # ----------------------------------------------------
+    # INCREMENTAL UPDATES (centroids stay fixed until the next build)
+    #
+    # Updates replace list arrays rather than writing into them, so a
+    # copy() can be patched while searches keep using the original.
+    # ----------------------------------------------------
+    def copy(self):
+        index = IVFIndex(self.nlist, self.nprobe, self.train_iters, self.seed)
+        index.centroids = self.centroids
+        index.lists = list(self.lists)
+        index.row_list = self.row_list.copy()
+        return index
+
+    def add(self, row, vec):
+        """Register a new row appended at position `row`."""
+        c = int(self.assign(np.asarray(vec, dtype=np.float32).reshape(1, -1))[0])
+        self.lists[c] = np.append(self.lists[c], row)
+        self.row_list = np.append(self.row_list, c)
+
+    def update(self, row, vec):
+        """Re-file `row` after its vector changed."""
+        old = int(self.row_list[row])
+        new = int(self.assign(np.asarray(vec, dtype=np.float32).reshape(1, -1))[0])
+        if old == new:
+            return
+        self.lists[old] = self.lists[old][self.lists[old] != row]
+        self.lists[new] = np.append(self.lists[new], row)
+        self.row_list[row] = new
+
+    def remove(self, row, last):
+        """Drop `row`; the store moved its `last` row into that position."""
+        c = int(self.row_list[row])
+        self.lists[c] = self.lists[c][self.lists[c] != row]
+        if row != last:
+            c_last = int(self.row_list[last])
+            moved = self.lists[c_last].copy()
+            moved[moved == last] = row
+            self.lists[c_last] = moved
+            self.row_list[row] = c_last
+        self.row_list = self.row_list[:last]
+
+    # ----------------------------------------------------
+    # SEARCH
+    # ----------------------------------------------------
+    def search(self, store, queries, k=1):
+        """Return (rows, sims), each shaped (len(queries), k)."""
+        store = _as_store(store)
+        q = _as_queries(queries)
+        rows = np.full((q.shape[0], k), -1, dtype=np.int64)
+        sims = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        if not self.lists or len(store) == 0:
+            return rows, sims
+
+        nprobe = min(self.nprobe, len(self.lists))
+        centroid_sims = np.dot(q, self.centroids.T)
+        for j in range(q.shape[0]):
+            probe, _ = _topk(centroid_sims[j], nprobe)
+            cand = np.concatenate([self.lists[c] for c in probe])
+            if cand.size == 0:
+                continue
+            top, top_sims = _topk(store.scores_rows(cand, q[j]), k)
+            rows[j], sims[j] = _pad(cand[top], top_sims, k)
+        return rows, sims
+
+
+def build_index(store, kind="auto", min_size=10000, nlist=0, nprobe=32):
+    """Build the index for `store`.
+
+    kind="auto" uses IVF only once the gallery has at least `min_size`
+    rows; below that an exact scan is both faster and exact.
+    """
+    store = _as_store(store)
+    kind = (kind or "auto").lower()
+    if kind == "exact" or (kind == "auto" and len(store) < min_size):
+        return ExactIndex().build(store)
+    if kind not in ("auto", "ivf"):
+        raise ValueError(f"Unknown ANN index kind: {kind}")
+    return IVFIndex(nlist=nlist, nprobe=nprobe).build(store)
+
+
+def search_gallery(index, store, queries, k=1, rerank=32):
+    """Search `store` through `index`, re-ranking compact stores in float32.
+
+    Quantized stores score the query on their own code grid, so the best
+    max(k, rerank) candidates are re-scored with the float32 query against
+    the store's float32 rows before the final top-k is taken. The returned
+    similarities are exact, so EMBED_THRESHOLD means the same in every
+    storage mode; only the candidate list comes from the codes.
+    """
+    store = _as_store(store)
+    if not store.approximate:
+        return index.search(store, queries, k=k)
+
+    q = _as_queries(queries)
+    cand_rows, _ = index.search(store, q, k=max(k, rerank))
+    rows = np.full((q.shape[0], k), -1, dtype=np.int64)
+    sims = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+    for j in range(q.shape[0]):
+        cand = cand_rows[j][cand_rows[j] >= 0]
+        if cand.size == 0:
+            continue
+        top, top_sims = _topk(np.dot(store.take(cand), q[j]), k)
+        rows[j], sims[j] = _pad(cand[top], top_sims, k)
+    return rows, sims
@@ -0,0 +1,227 @@
+"""
+Kiosk attendance marks in one statement.
+
+mark_attendance used to read today's row for the employee and then
+INSERT or UPDATE it, two round trips and two commits. Two kiosks
+recognizing the same person at once could both see no row and both
+insert. With a unique (employee_id, date) key the whole decision is one
+INSERT ... ON DUPLICATE KEY UPDATE:
+
+    no row today                          -> insert, check-in
+    checked in, past the cooldown         -> check-out (working hours set)
+    checked in, within the cooldown       -> unchanged, "already" (cooldown)
+    checked out                           -> unchanged, "already" (already_checked_out)
+
+MySQL has no RETURNING, so the UPDATE branch reports what it decided
+through LAST_INSERT_ID(expr). The client receives that value as the
+statement's insert id (cursor.lastrowid) in the same reply: a flag bit
+(never reached by real row ids), the decision code and the time the
+response needs (last mark, or check-in time for a check-out). A new row
+reports its plain auto-increment id.
+
+The key is added at startup (ensure_attendance_key). If existing
+duplicate rows prevent that, mark_attendance keeps its read-then-write
+path until they are merged.
+
+TodayAttendance keeps each worker's copy of today's marks, so a person
+standing at the kiosk during the cooldown, or coming back after checking
+out, gets "already" without a query. A row only moves forward (none ->
+check-in -> check-out), so a copy that is behind another worker can only
+send a mark on to the database, never decide a wrong one; at most a
+cooldown is reported where that worker already checked the person out.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from utils.db import get_db
+from utils.logger import logger
+
+_KEY_NAME = "uq_attendance_employee_date"
+
+# Decision reported through LAST_INSERT_ID: FLAG + 4 * seconds since EPOCH + code
+_DECISION_FLAG = 1 << 48
+_EPOCH = datetime(2000, 1, 1)
+COOLDOWN = 1
+CHECKED_OUT = 2
+CHECK_OUT = 3
+
+_key_ready = False
+
+_ATTENDANCE_CACHE = os.getenv("KIOSK_ATTENDANCE_CACHE", "1") == "1"
+
+# Checked in, not yet out, last mark at least the cooldown ago
+_CAN_CHECK_OUT = """(status = 'check-in' AND check_out_time IS NULL
+        AND TIMESTAMPDIFF(MICROSECOND, COALESCE(timestamp, check_in_time, %(now)s), %(now)s)
+            >= %(cooldown_us)s)"""
+# Same row after check_out_time was set by this statement: MySQL applies the
+# assignments left to right and later ones see the new values
+_CHECKED_OUT_NOW = "(status = 'check-in' AND check_out_time <=> %(now)s)"
+
+_UPSERT_SQL = f"""
+    INSERT INTO attendance (
+        employee_id,
+        date,
+        check_in_time,
+        status,
+        captured_photo_path,
+        timestamp
+    )
+    VALUES (%(emp_id)s, %(date)s, %(now)s, 'check-in', %(photo)s, %(now)s)
+    ON DUPLICATE KEY UPDATE
+        id = IF(LAST_INSERT_ID(%(flag)s
+                + 4 * TIMESTAMPDIFF(SECOND, %(epoch)s, IF({_CAN_CHECK_OUT},
+                    COALESCE(check_in_time, %(now)s),
+                    COALESCE(timestamp, check_in_time, %(now)s)))
+                + IF({_CAN_CHECK_OUT}, {CHECK_OUT},
+                    IF(status = 'check-in' AND check_out_time IS NULL, {COOLDOWN}, {CHECKED_OUT}))
+            ), id, id),
+        working_hours = IF({_CAN_CHECK_OUT},
+            TIMESTAMPDIFF(MICROSECOND, check_in_time, %(now)s) / 3600000000, working_hours),
+        captured_photo_path = IF({_CAN_CHECK_OUT}, %(photo)s, captured_photo_path),
+        check_out_time = IF({_CAN_CHECK_OUT}, %(now)s, check_out_time),
+        timestamp = IF({_CHECKED_OUT_NOW}, %(now)s, timestamp),
+        status = IF({_CHECKED_OUT_NOW}, 'check-out', status)
+"""
+
+
+def ensure_attendance_key():
+    """Add the unique (employee_id, date) key if missing; True once it exists."""
+    global _key_ready
+    try:
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("""
+            SELECT index_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'attendance' AND non_unique = 0
+            GROUP BY index_name
+            HAVING GROUP_CONCAT(column_name ORDER BY seq_in_index) = 'employee_id,date'
+        """)
+        if not cur.fetchall():
+            cur.execute(f"ALTER TABLE attendance ADD UNIQUE KEY {_KEY_NAME} (employee_id, date)")
+            db.commit()
+            logger.info("Added unique (employee_id, date) key to attendance")
+        cur.close()
+        _key_ready = True
+    except Exception as e:
+        logger.error(
+            f"Attendance has no unique (employee_id, date) key ({e}); kiosk marks keep the "
+            "read-then-write path until duplicate rows for an employee and day are merged")
+        _key_ready = False
+    return _key_ready
+
+
+def attendance_key_ready():
+    return _key_ready
+
+
+def decode_decision(value, now):
+    """mark_attendance result from the insert id reported by the upsert."""
+    if not value or value < _DECISION_FLAG:
+        return {"status": "check-in", "timestamp": now}
+    value -= _DECISION_FLAG
+    code = value % 4
+    when = _EPOCH + timedelta(seconds=value // 4)
+    if code == CHECK_OUT:
+        working_hours = (now - when).total_seconds() / 3600
+        return {"status": "check-out", "timestamp": now, "working_hours": working_hours}
+    if code == COOLDOWN:
+        return {"status": "already", "timestamp": when, "reason": "cooldown"}
+    return {"status": "already", "timestamp": when, "reason": "already_checked_out"}
+
+
+def upsert_attendance(emp_id, snap_path, now, cooldown_seconds):
+    """Apply one kiosk mark for `emp_id` at `now` and return the decision."""
+    # Whole seconds: the value written must compare equal within the statement
+    now = now.replace(microsecond=0)
+    db = get_db()
+    cur = db.cursor()
+    try:
+        cur.execute(_UPSERT_SQL, {
+            "emp_id": emp_id,
+            "date": now.date(),
+            "now": now,
+            "photo": snap_path,
+            "cooldown_us": int(cooldown_seconds * 1_000_000),
+            "flag": _DECISION_FLAG,
+            "epoch": _EPOCH,
+        })
+        value = cur.lastrowid
+        db.commit()
+    finally:
+        cur.close()
+    return decode_decision(value, now)
+
+
+class TodayAttendance:
+    """Today's kiosk attendance per employee in this worker: emp_id -> (status, last mark, check-in).
+
+    Loaded from the database on first use each day (startup, then after
+    midnight) and updated with every mark decided by the database.
+    """
+
+    def __init__(self):
+        self.day = None
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def warm(self, day):
+        """Load `day`'s attendance rows; on failure start empty and learn from marks."""
+        entries = {}
+        try:
+            db = get_db()
+            cur = db.cursor()
+            cur.execute("""
+                SELECT employee_id, status, timestamp, check_in_time, check_out_time
+                FROM attendance
+                WHERE date = %s
+            """, (day,))
+            for emp_id, status, timestamp, check_in_time, check_out_time in cur.fetchall():
+                if check_out_time:
+                    status = "check-out"
+                entries[emp_id] = (status, timestamp or check_in_time, check_in_time)
+            cur.close()
+            logger.info(f"Attendance cache: {len(entries)} mark(s) for {day}")
+        except Exception as e:
+            logger.error(f"Attendance cache warm-up for {day} failed: {e}")
+        with self._lock:
+            self.day = day
+            self.entries = entries
+
+    def decide(self, emp_id, now, cooldown_seconds):
+        """mark_attendance result when it needs no write, else None."""
+        if self.day != now.date():
+            self.warm(now.date())
+        entry = self.entries.get(emp_id)
+        if entry is None:
+            return None
+        status, timestamp, _ = entry
+        if status == "check-out":
+            return {"status": "already", "timestamp": timestamp, "reason": "already_checked_out"}
+        if status == "check-in" and timestamp and (now - timestamp).total_seconds() < cooldown_seconds:
+            return {"status": "already", "timestamp": timestamp, "reason": "cooldown"}
+        return None
+
+    def record(self, emp_id, result, now):
+        """Write-through: remember the mark the database just decided."""
+        status = result.get("status")
+        reason = result.get("reason")
+        with self._lock:
+            if self.day != now.date():
+                return
+            check_in_time = self.entries.get(emp_id, (None, None, None))[2]
+            if status == "check-in":
+                self.entries[emp_id] = ("check-in", result["timestamp"], result["timestamp"])
+            elif status == "check-out" or reason == "already_checked_out":
+                self.entries[emp_id] = ("check-out", result["timestamp"], check_in_time)
+            elif reason == "cooldown":
+                self.entries[emp_id] = ("check-in", result["timestamp"], check_in_time)
+
+    def forget(self, emp_id):
+        """Drop one employee, e.g. after their row was edited outside the kiosk."""
+        with self._lock:
+            self.entries.pop(emp_id, None)
+
+
+today_attendance = TodayAttendance() if _ATTENDANCE_CACHE else None
@@ -0,0 +1,97 @@
+"""
+Capture settings the server hands to kiosk clients.
+
+Kiosks used to upload every frame at the camera's 1280x720 while the
+server detects on a 640 px wide copy. /kiosk/api/capture-profile tells
+each client the resolution, JPEG quality and frame interval to use:
+
+- width: KIOSK_CAPTURE_WIDTH, never below the kiosk detection width (the
+  extra pixels only feed the recognition crop), lower on mobile kiosks;
+- when recent kiosk frames in this worker take longer than
+  KIOSK_LATENCY_BUDGET_MS, smaller and more compressed frames, sent
+  less often, until latency recovers (a burst counts per frame);
+- clip_frames: with KIOSK_CLIP_FRAMES > 0 the client captures that many
+  frames, clip_interval_ms apart, and posts them to /kiosk/recognize_clip
+  in one request instead of one /kiosk/recognize call per frame.
+"""
+import functools
+import os
+import threading
+import time
+
+_KIOSK_CAPTURE_WIDTH = int(os.getenv("KIOSK_CAPTURE_WIDTH", "960"))
+_KIOSK_JPEG_QUALITY = float(os.getenv("KIOSK_JPEG_QUALITY", "0.75"))
+_KIOSK_FRAME_INTERVAL_MS = int(os.getenv("KIOSK_FRAME_INTERVAL_MS", "800"))
+_KIOSK_LATENCY_BUDGET_MS = float(os.getenv("KIOSK_LATENCY_BUDGET_MS", "300"))
+_KIOSK_CLIP_FRAMES = int(os.getenv("KIOSK_CLIP_FRAMES", "8"))
+_KIOSK_CLIP_INTERVAL_MS = int(os.getenv("KIOSK_CLIP_INTERVAL_MS", "100"))
+
+_MOBILE_WIDTH = 640
+_MOBILE_JPEG_QUALITY = 0.65
+_BUSY_JPEG_QUALITY = 0.6
+
+
+class LoadMonitor:
+    """Recent per-frame latency (moving average) of the kiosk endpoints in this worker."""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.latency_ms = 0.0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, ms):
+        with self._lock:
+            self.latency_ms = ms if not self.latency_ms else (
+                self.alpha * ms + (1 - self.alpha) * self.latency_ms)
+
+    def frames(self, count):
+        """Called inside a timed view that handled `count` frames (a burst)."""
+        self._local.frames = max(1, int(count))
+
+    def timed(self, view):
+        """Decorator recording the latency of every call to `view`, per frame."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self.in_flight += 1
+            self._local.frames = 1
+            start = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self.record((time.perf_counter() - start) * 1000 / self._local.frames)
+        return wrapper
+
+
+def capture_profile(load, detect_width=0, mobile=False):
+    """Capture resolution (16:9), JPEG quality and frame interval for a kiosk client."""
+    width = _KIOSK_CAPTURE_WIDTH
+    quality = _KIOSK_JPEG_QUALITY
+    if mobile:
+        width = min(width, _MOBILE_WIDTH)
+        quality = min(quality, _MOBILE_JPEG_QUALITY)
+
+    busy = load.latency_ms > _KIOSK_LATENCY_BUDGET_MS
+    interval = _KIOSK_FRAME_INTERVAL_MS
+    if busy:
+        width = min(width, _MOBILE_WIDTH)
+        quality = min(quality, _BUSY_JPEG_QUALITY)
+        # Leave the server room to catch up: at least twice its current latency
+        interval = max(interval, int(2 * load.latency_ms))
+    width = max(width, detect_width or 0)
+
+    return {
+        "width": width,
+        "height": int(round(width * 9 / 16)),
+        "jpeg_quality": quality,
+        "interval_ms": interval,
+        "busy": busy,
+        "detect_width": detect_width,
+        "server_latency_ms": round(load.latency_ms, 1),
+        "clip_frames": _KIOSK_CLIP_FRAMES,
+        "clip_interval_ms": _KIOSK_CLIP_INTERVAL_MS,
+    }
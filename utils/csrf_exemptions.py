@@ -8,9 +8,10 @@ def setup_csrf_exemptions(app, csrf):
     """
 
     # Kiosk: Exempt all kiosk API endpoints (real-time face recognition and PIN verification)
-    from blueprints.kiosk.routes import liveness_check, kiosk_recognize, kiosk_exit, verify_pin, set_kiosk_pin, force_unlock
+    from blueprints.kiosk.routes import liveness_check, kiosk_recognize, kiosk_recognize_clip, kiosk_exit, verify_pin, set_kiosk_pin, force_unlock
     csrf.exempt(liveness_check)
     csrf.exempt(kiosk_recognize)
+    csrf.exempt(kiosk_recognize_clip)
     csrf.exempt(kiosk_exit)
     csrf.exempt(verify_pin)
     csrf.exempt(set_kiosk_pin)
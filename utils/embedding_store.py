@@ -0,0 +1,206 @@
+"""
+Storage for the face embedding gallery matrix.
+
+- Float32Store: plain (n, 512) float32 rows (default, exact scores).
+- QuantizedStore: float16 codes, or int8 codes with a per-row scale,
+  plus the float32 rows. Scores from the compact codes are approximate;
+  callers re-rank the best candidates (see utils.ann_index.search_gallery)
+  against the float32 rows, so the final scores are exact.
+
+The compact modes trade latency for memory, they are not faster: the
+full scan upcasts every code to float32. At 50k identities an exact scan
+takes 21.7 ms per query in float32, 38.9 ms in int8 and 112.8 ms in
+float16 (tests/bench_gallery_storage.py). What they save is the scanned
+matrix: int8 codes take 516 bytes per identity against 2048 for float32.
+The float32 rows for the re-rank are kept as well; with a gallery file
+(GALLERY_FILE) they are a view on the shared mapping, where only the
+pages of re-ranked rows are read. Without one they sit in each worker's
+memory, and a compact mode then uses more memory than float32.
+float16 is not recommended.
+"""
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+# Rows upcast to float32 at a time when scanning compact codes
+_CHUNK_ROWS = 8192
+
+
+class Float32Store:
+    mode = "float32"
+    approximate = False
+
+    def __init__(self, matrix):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def scores(self, queries):
+        """Similarity of every row to every query, shaped (n, m)."""
+        return np.dot(self.matrix, queries.T)
+
+    def scores_rows(self, rows, query):
+        """Similarity of the given rows to one query."""
+        return np.dot(self.matrix[rows], query)
+
+    def take(self, rows):
+        """Rows as float32 (a copy for fancy indexes, a view for slices)."""
+        return self.matrix[rows]
+
+    # ----------------------------------------------------
+    # COPY-ON-WRITE UPDATES (the original store is never modified)
+    # ----------------------------------------------------
+    def with_row(self, row, vec):
+        matrix = self.matrix.copy()
+        matrix[row] = vec
+        return Float32Store(matrix)
+
+    def appended(self, vec):
+        return Float32Store(np.vstack([self.matrix, np.asarray(vec, dtype=np.float32)[None, :]]))
+
+    def without_row(self, row):
+        """Copy without `row`; the last row moves into its place."""
+        last = len(self) - 1
+        matrix = self.matrix[:last].copy()
+        if row != last:
+            matrix[row] = self.matrix[last]
+        return Float32Store(matrix)
+
+
+class QuantizedStore:
+    """Compact codes searched first; float32 rows only for re-ranked candidates.
+
+    mode="int8":    codes = round(row / scale), scale = max|row| / 127
+    mode="float16": codes = row as float16, no scale
+    `exact` holds the float32 rows the codes were made from.
+    """
+
+    approximate = True
+
+    def __init__(self, matrix, mode="int8"):
+        if mode not in ("int8", "float16"):
+            raise ValueError(f"Unsupported embedding storage mode: {mode}")
+        self.mode = mode
+        self.exact = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.codes, self.scale = self._encode(self.exact)
+
+    def _encode(self, matrix):
+        if self.mode == "int8":
+            scale = (np.abs(matrix).max(axis=1) / 127.0).astype(np.float32)
+            scale[scale == 0] = 1.0
+            return np.round(matrix / scale[:, None]).astype(np.int8), scale
+        return matrix.astype(np.float16), None
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self):
+        """Bytes of the scanned codes (the float32 rows are not counted)."""
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _quantize_queries(self, queries):
+        """Queries on the same code grid as the rows (symmetric scoring)."""
+        if self.mode == "int8":
+            q_scale = np.abs(queries).max(axis=1) / 127.0
+            q_scale[q_scale == 0] = 1.0
+            q_codes = np.round(queries / q_scale[:, None]).astype(np.float32)
+            return q_codes, q_scale.astype(np.float32)
+        return queries.astype(np.float16).astype(np.float32), None
+
+    def scores(self, queries):
+        q_codes, q_scale = self._quantize_queries(queries)
+        out = np.empty((len(self), queries.shape[0]), dtype=np.float32)
+        for start in range(0, len(self), _CHUNK_ROWS):
+            chunk = self.codes[start:start + _CHUNK_ROWS].astype(np.float32)
+            out[start:start + _CHUNK_ROWS] = np.dot(chunk, q_codes.T)
+        if self.scale is not None:
+            out *= self.scale[:, None]
+            out *= q_scale[None, :]
+        return out
+
+    def scores_rows(self, rows, query):
+        q_codes, q_scale = self._quantize_queries(query.reshape(1, -1))
+        out = np.dot(self.codes[rows].astype(np.float32), q_codes[0])
+        if self.scale is not None:
+            out *= self.scale[rows] * q_scale[0]
+        return out
+
+    def take(self, rows):
+        """Rows as float32: the original rows, dequantized codes if there are none."""
+        if self.exact is not None:
+            return self.exact[rows]
+        out = self.codes[rows].astype(np.float32)
+        if self.scale is not None:
+            out *= self.scale[rows][..., None]
+        return out
+
+    # ----------------------------------------------------
+    # COPY-ON-WRITE UPDATES (the original store is never modified)
+    # ----------------------------------------------------
+    @classmethod
+    def from_codes(cls, mode, codes, scale=None, exact=None):
+        """Wrap already-encoded codes and their float32 rows (e.g. a memory-mapped gallery file)."""
+        store = cls.__new__(cls)
+        store.mode = mode
+        store.codes = codes
+        store.scale = scale
+        store.exact = exact
+        return store
+
+    def _with_codes(self, codes, scale, exact):
+        return QuantizedStore.from_codes(self.mode, codes, scale, exact)
+
+    def with_row(self, row, vec):
+        vec = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+        new_codes, new_scale = self._encode(vec)
+        codes = self.codes.copy()
+        codes[row] = new_codes[0]
+        scale = None
+        if self.scale is not None:
+            scale = self.scale.copy()
+            scale[row] = new_scale[0]
+        exact = None
+        if self.exact is not None:
+            exact = self.exact.copy()
+            exact[row] = vec[0]
+        return self._with_codes(codes, scale, exact)
+
+    def appended(self, vec):
+        vec = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+        new_codes, new_scale = self._encode(vec)
+        codes = np.vstack([self.codes, new_codes])
+        scale = np.concatenate([self.scale, new_scale]) if self.scale is not None else None
+        exact = np.vstack([self.exact, vec]) if self.exact is not None else None
+        return self._with_codes(codes, scale, exact)
+
+    def without_row(self, row):
+        """Copy without `row`; the last row moves into its place."""
+        last = len(self) - 1
+        codes = self.codes[:last].copy()
+        scale = self.scale[:last].copy() if self.scale is not None else None
+        exact = self.exact[:last].copy() if self.exact is not None else None
+        if row != last:
+            codes[row] = self.codes[last]
+            if scale is not None:
+                scale[row] = self.scale[last]
+            if exact is not None:
+                exact[row] = self.exact[last]
+        return self._with_codes(codes, scale, exact)
+
+
+def make_store(matrix, mode="float32"):
+    """Wrap a float32 (n, 512) matrix in the configured storage mode."""
+    mode = (mode or "float32").lower()
+    if mode == "float32":
+        return Float32Store(matrix)
+    return QuantizedStore(matrix, mode)
+
+
+def empty_store(mode="float32"):
+    return make_store(np.empty((0, EMBEDDING_DIM), dtype=np.float32), mode)
@@ -1,76 +1,459 @@
+import os
+import threading
+import time
 import numpy as np
 import ast
-from insightface.app import FaceAnalysis
 from utils.db import get_db
+from utils.inference_client import RemoteFaceAnalysis
+from utils.inference_profiles import ProfileAnalysis, get_profile
 from utils.logger import logger
+from utils.onnx_tuning import load_face_analysis, plan_from_env
+from utils.gallery import FaceGallery
+from utils.gallery_sync import GallerySync, latest_change_id, record_change
+from utils.gallery_file import FileLock, file_signature, read_gallery_file, write_gallery_file
 import cv2
 
+# Similarity index settings (see utils/ann_index.py)
+_ANN_INDEX = os.getenv("ANN_INDEX", "auto")
+_ANN_MIN_GALLERY = int(os.getenv("ANN_MIN_GALLERY", "10000"))
+_ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+_ANN_NPROBE = int(os.getenv("ANN_NPROBE", "32"))
+
+# Gallery storage: float32, float16 or int8 (see utils/embedding_store.py)
+_EMBED_STORAGE = os.getenv("EMBED_STORAGE", "float32").lower()
+if _EMBED_STORAGE == "float16":
+    logger.warning("EMBED_STORAGE=float16 is not recommended: scans are about 4-5x slower than float32 on CPU")
+_EMBED_RERANK = int(os.getenv("EMBED_RERANK", "32"))
+
+# Memory-mapped gallery file shared by all workers and reused across
+# restarts ("" = every worker loads its own copy from the DB). Rewritten
+# after every full DB load and after this many incremental changes.
+_GALLERY_FILE = os.getenv("GALLERY_FILE", "cache/gallery.bin")
+_GALLERY_FILE_REPUBLISH = int(os.getenv("GALLERY_FILE_REPUBLISH", "100"))
+# A file whose rows were last read in full longer ago than this is rebuilt
+# from the DB at startup instead of reused (0 = no limit), so details
+# changed without a change-log row do not last
+_GALLERY_FILE_MAX_AGE = float(os.getenv("GALLERY_FILE_MAX_AGE_HOURS", "24")) * 3600
+
+# Recognition model; gallery files built with another model are rebuilt
+FACE_MODEL = "buffalo_l"
+
+# Unix socket of the shared inference server ("" = run the model in-process)
+_INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+_EMBEDDING_BYTES = 512 * 4
+
+# Per-employee details kept next to each gallery row for the kiosk
+GALLERY_COLUMNS = ("name", "dept", "photo")
+
 
 class FaceEncoder:
     def __init__(self):
         try:
-            logger.info("[*] Loading InsightFace Model...")
-            self.app = FaceAnalysis(name="buffalo_l")
-            self.app.prepare(ctx_id=0, det_size=(640, 640))
-            logger.info("[+] InsightFace Ready")
+            if _INFERENCE_SOCKET:
+                # Model runs once in the inference server, shared by all workers
+                self.app = RemoteFaceAnalysis(_INFERENCE_SOCKET)
+                logger.info(f"[+] Using inference server at {_INFERENCE_SOCKET}")
+            else:
+                logger.info("[*] Loading InsightFace Model...")
+                # Each gunicorn worker gets its share of the cores (utils/onnx_tuning.py)
+                self.app = load_face_analysis(FACE_MODEL, plan_from_env())
+                logger.info("[+] InsightFace Ready")
         except Exception as e:
             logger.error(f"Failed to initialize FaceAnalysis model: {e}", exc_info=True)
             raise
 
-        self.embeddings = []
-        self.employee_ids = []
-        self._emb_matrix = np.empty((0, 512), dtype=np.float32)
+        # Inference profiles, created on first use (utils/inference_profiles.py)
+        self._profiles = {}
+        self._profiles_lock = threading.Lock()
+
+        # Immutable gallery snapshots: readers never lock (utils/gallery.py)
+        self.gallery = FaceGallery(
+            storage=_EMBED_STORAGE,
+            index_kind=_ANN_INDEX,
+            min_size=_ANN_MIN_GALLERY,
+            nlist=_ANN_NLIST,
+            nprobe=_ANN_NPROBE,
+            rerank=_EMBED_RERANK,
+            columns=GALLERY_COLUMNS,
+        )
+        # Picks up enrollments made by other workers (utils/gallery_sync.py)
+        self.sync = GallerySync(self.reload_embedding, refresh=self._remap_if_changed)
+
+        # Gallery file currently mapped (utils/gallery_file.py)
+        self._file_signature = None
+        self._file_generation = 0
+        self._changes_since_file = 0
+        self._loaded_at = None  # last full read of the gallery from the DB
+
+    def profile(self, name):
+        """FaceAnalysis-like object for one inference profile.
+
+        Profiles share this encoder's models and only run the modules they
+        need: "kiosk" (detection + recognition), "kiosk-landmarks" (adds
+        2D landmarks), "enroll-quality" (adds pose and landmarks),
+        "detect-only" (320x320 detection) or "full".
+        """
+        view = self._profiles.get(name)
+        if view is None:
+            with self._profiles_lock:
+                view = self._profiles.get(name)
+                if view is None:
+                    if isinstance(self.app, RemoteFaceAnalysis):
+                        get_profile(name)  # validate the name locally
+                        view = self.app.profile(name)
+                    else:
+                        view = ProfileAnalysis(self.app, get_profile(name))
+                    self._profiles[name] = view
+        return view
+
+    @property
+    def employee_ids(self):
+        return list(self.gallery.snapshot.employee_ids)
+
+    @property
+    def embeddings(self):
+        """Copy of the gallery rows as a float32 (n, 512) array."""
+        return self.gallery.snapshot.store.take(slice(None)).copy()
+
+    @property
+    def embedding_count(self):
+        return len(self.gallery.snapshot)
+
+    def clear_embeddings(self):
+        self.gallery.clear()
 
     # ----------------------------------------------------
     # LOAD EMBEDDINGS
     # ----------------------------------------------------
     def load_all_embeddings(self):
+        start = time.perf_counter()
+        source = self._load_gallery()
+        logger.info(
+            f"[+] Gallery ready in {(time.perf_counter() - start) * 1000:.0f} ms "
+            f"from {source} ({self.embedding_count} embeddings)"
+        )
+
+    def _load_gallery(self):
+        if not _GALLERY_FILE:
+            self._load_from_db()
+            return "database"
+
+        # The first worker builds the file from the DB; the others wait for
+        # it and map it instead of running the same query. After a restart
+        # the file from the last run is mapped and only the change-log
+        # delta since its watermark is read from the DB.
+        with FileLock(_GALLERY_FILE):
+            if self._map_gallery_file() and not self._gallery_file_stale():
+                applied = 0
+                while True:
+                    count = self.sync.poll(force=True)
+                    if not count:
+                        break
+                    applied += count
+                return f"gallery file + {applied} change(s)"
+            self._load_from_db()
+            self._write_gallery_file()
+            return "database"
+
+    def _load_from_db(self):
         logger.info("Loading all face embeddings from database...")
 
+        loaded_at = time.time()
+        # Changes logged from here on are applied by sync_changes(); read
+        # first so nothing committed during the load is missed.
+        try:
+            watermark = latest_change_id()
+        except Exception as e:
+            logger.warning(f"Gallery change log unavailable, cross-worker sync disabled: {e}")
+            watermark = None
+
         db = get_db()
-        cur = db.cursor(dictionary=True)
-        cur.execute("SELECT emp_id, embedding FROM face_data")
+        # Plain tuple cursor: (emp_id, embedding, name, dept, photo)
+        cur = db.cursor()
+        # Only active employees can be recognized; embeddings and kiosk
+        # display details come back in one query
+        cur.execute("""
+            SELECT f.emp_id, f.embedding, e.full_name, d.name AS department,
+                   e.profile_photo AS photo
+            FROM face_data f
+            JOIN employees e ON e.id = f.emp_id
+            LEFT JOIN departments d ON e.department_id = d.id
+            WHERE e.status = 'active'
+        """)
         rows = cur.fetchall()
         cur.close()
 
-        self.embeddings = []
-        self.employee_ids = []
-
+        # Current rows hold raw float32 bytes: decode them all with one
+        # np.frombuffer over the joined blobs. Legacy rows (text lists,
+        # other encodings) go through _decode_embedding one at a time.
+        raw_rows, legacy_rows = [], []
         for row in rows:
-            emb_blob = row.get("embedding")
-            if emb_blob is None:
+            blob = row[1]
+            if blob is None:
                 continue
-            
+            if isinstance(blob, (bytes, bytearray)) and len(blob) == _EMBEDDING_BYTES:
+                raw_rows.append(row)
+            else:
+                legacy_rows.append(row)
+
+        matrices = []
+        if raw_rows:
+            blobs = b"".join(row[1] for row in raw_rows)
+            matrices.append(np.frombuffer(blobs, dtype=np.float32).reshape(-1, 512))
+
+        legacy, legacy_kept = [], []
+        for row in legacy_rows:
             try:
-                emb = self._decode_embedding(emb_blob)
+                emb = self._decode_embedding(row[1])
             except Exception as exc:
-                logger.warning(f"Failed to parse embedding for emp_id {row.get('emp_id')}: {exc}")
+                logger.warning(f"Failed to parse embedding for emp_id {row[0]}: {exc}")
                 continue
-
             if emb.shape != (512,):
-                logger.warning(f"Skipping embedding with unexpected size {emb.shape} for emp_id {row.get('emp_id')}")
+                logger.warning(f"Skipping embedding with unexpected size {emb.shape} for emp_id {row[0]}")
                 continue
-
-            # Normalize embedding to unit length to allow cosine similarity
-            try:
-                norm = np.linalg.norm(emb)
-                if norm > 0:
-                    emb = emb.astype(np.float32) / float(norm)
-                else:
-                    emb = emb.astype(np.float32)
-            except Exception:
-                emb = emb.astype(np.float32)
-
-            self.embeddings.append(emb)
-            self.employee_ids.append(row["emp_id"])
-
-        if self.embeddings:
-            # Stack normalized embeddings as rows
-            self._emb_matrix = np.vstack(self.embeddings).astype(np.float32)
+            legacy.append(emb)
+            legacy_kept.append(row)
+        if legacy:
+            matrices.append(np.vstack(legacy).astype(np.float32))
+
+        if matrices:
+            matrix = np.vstack(matrices) if len(matrices) > 1 else matrices[0]
+            # Normalize every row to unit length for cosine similarity
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = (matrix / norms).astype(np.float32)
         else:
-            self._emb_matrix = np.empty((0, 512), dtype=np.float32)
+            matrix = np.empty((0, 512), dtype=np.float32)
+        del matrices, legacy
+
+        kept_rows = raw_rows + legacy_kept
+        employee_ids = [row[0] for row in kept_rows]
+        columns = {
+            name: [row[2 + i] for row in kept_rows]
+            for i, name in enumerate(GALLERY_COLUMNS)
+        }
 
-        logger.info(f"[+] Loaded {len(self.embeddings)} embeddings")
+        # Built off to the side; recognitions keep using the old snapshot
+        # until the new one is published.
+        snap = self.gallery.load(employee_ids, matrix, columns)
+        del matrix
+        self.sync.watermark = watermark
+        self._loaded_at = loaded_at
+
+        logger.info(f"[+] Loaded {len(snap)} embeddings ({snap.store.mode}, {snap.store.nbytes / 1e6:.1f} MB)")
+
+    # ----------------------------------------------------
+    # SHARED GALLERY FILE
+    # ----------------------------------------------------
+    def _map_gallery_file(self):
+        """Publish the gallery file as the current snapshot; False if unusable."""
+        if file_signature(_GALLERY_FILE) is None:
+            return False
+        try:
+            mapped = read_gallery_file(_GALLERY_FILE, nprobe=_ANN_NPROBE)
+        except Exception as e:
+            logger.warning(f"Ignoring gallery file {_GALLERY_FILE}: {e}")
+            return False
+        if mapped.header.get("model") != FACE_MODEL:
+            logger.info(f"Gallery file was built with model {mapped.header.get('model')}; rebuilding")
+            return False
+        if mapped.store.mode != _EMBED_STORAGE:
+            logger.info(f"Gallery file stores {mapped.store.mode}, EMBED_STORAGE is {_EMBED_STORAGE}; rebuilding")
+            return False
+
+        try:
+            latest = latest_change_id()
+        except Exception:
+            latest = None
+        if latest is not None and mapped.watermark > latest:
+            logger.info("Gallery file is ahead of the change log (database reset?); rebuilding")
+            return False
+
+        self.gallery.adopt(mapped.employee_ids, mapped.store, mapped.columns, mapped.index)
+        self._file_signature = mapped.signature
+        self._file_generation = mapped.generation
+        self._changes_since_file = 0
+        self._loaded_at = mapped.loaded_at
+        # Without a change log the file is used as-is
+        self.sync.watermark = mapped.watermark if latest is not None else None
+        logger.info(
+            f"[+] Mapped gallery file generation {mapped.generation} "
+            f"({len(mapped.employee_ids)} embeddings, {mapped.store.mode})"
+        )
+        return True
+
+    def _gallery_file_stale(self):
+        """True if the gallery file should be rebuilt from the DB, not reused.
+
+        Employee names, departments and photos reach the file only through
+        the change log. The mapped file is rebuilt when its rows were last
+        read from the DB more than GALLERY_FILE_MAX_AGE_HOURS ago, or when
+        an employee row was updated since (if employees has an updated_at
+        column). Republishing after incremental changes does not reset this.
+        """
+        loaded_at = self._loaded_at or 0.0
+        if _GALLERY_FILE_MAX_AGE and time.time() - loaded_at > _GALLERY_FILE_MAX_AGE:
+            logger.info(f"Gallery file rows are older than {_GALLERY_FILE_MAX_AGE / 3600:g} h; rebuilding")
+            return True
+        try:
+            db = get_db()
+            cur = db.cursor()
+            cur.execute("SELECT UNIX_TIMESTAMP(MAX(updated_at)) FROM employees")
+            row = cur.fetchone()
+            cur.close()
+        except Exception:
+            return False  # no updated_at column: the age limit applies alone
+        if row and row[0] is not None and float(row[0]) > loaded_at:
+            logger.info("Employees were updated after the gallery file was built; rebuilding")
+            return True
+        return False
+
+    def _write_gallery_file(self):
+        # The rows and the watermark written must match: a poll between
+        # reading them would leave the file claiming changes it lacks
+        snap, watermark = self.sync.capture(lambda: self.gallery.snapshot)
+        try:
+            header = write_gallery_file(
+                _GALLERY_FILE, snap, watermark, self._file_generation + 1,
+                model=FACE_MODEL, loaded_at=self._loaded_at,
+            )
+        except Exception as e:
+            logger.error(f"Failed to write gallery file {_GALLERY_FILE}: {e}", exc_info=True)
+            return
+        logger.info(f"Wrote gallery file generation {header['generation']} ({header['rows']} rows)")
+        # Swap private copies for the shared mapping of what was just written
+        self._map_gallery_file()
+
+    def _remap_if_changed(self):
+        """Remap the gallery file if another worker published a new version."""
+        if not _GALLERY_FILE:
+            return
+        signature = file_signature(_GALLERY_FILE)
+        if signature is not None and signature != self._file_signature:
+            self._map_gallery_file()
+
+    # ----------------------------------------------------
+    # INCREMENTAL UPDATES (no full reload)
+    # ----------------------------------------------------
+    def _normalize(self, emb):
+        emb = np.asarray(emb, dtype=np.float32).reshape(-1)
+        if emb.shape != (512,):
+            raise ValueError(f"unexpected embedding size {emb.shape}")
+        norm = np.linalg.norm(emb)
+        return emb / float(norm) if norm > 0 else emb
+
+    @staticmethod
+    def _row_details(row):
+        return {
+            "name": row.get("full_name"),
+            "dept": row.get("department"),
+            "photo": row.get("photo"),
+        }
+
+    def upsert_embedding(self, emp_id, emb, details=None):
+        """Add or replace the embedding (and optionally details) for one employee."""
+        emp_id = int(emp_id)
+        self.gallery.upsert(emp_id, self._normalize(emb), details)
+        logger.info(f"Gallery: upserted embedding for emp_id {emp_id}")
+
+    def remove_embedding(self, emp_id):
+        """Drop one employee from the gallery (no-op if not enrolled)."""
+        emp_id = int(emp_id)
+        if not self.gallery.remove(emp_id):
+            return False
+        logger.info(f"Gallery: removed embedding for emp_id {emp_id}")
+        return True
+
+    def reload_embedding(self, emp_id):
+        """Re-read one employee's face data and details and patch the gallery.
+
+        This is the single refresh point after enrollment or employee edits.
+        Removes the employee if they have no face data or are inactive.
+        """
+        db = get_db()
+        cur = db.cursor(dictionary=True)
+        cur.execute("""
+            SELECT f.embedding, e.full_name, d.name AS department,
+                   e.profile_photo AS photo
+            FROM face_data f
+            JOIN employees e ON e.id = f.emp_id
+            LEFT JOIN departments d ON e.department_id = d.id
+            WHERE f.emp_id = %s AND e.status = 'active'
+            LIMIT 1
+        """, (emp_id,))
+        row = cur.fetchone()
+        cur.close()
+
+        if not row or row.get("embedding") is None:
+            self.remove_embedding(emp_id)
+            return
+        try:
+            self.upsert_embedding(emp_id, self._decode_embedding(row["embedding"]), self._row_details(row))
+        except Exception as exc:
+            logger.warning(f"Failed to reload embedding for emp_id {emp_id}: {exc}")
+
+    def publish_change(self, emp_id):
+        """Refresh one employee here and notify the other workers.
+
+        Call after committing any face_data write or employee status,
+        name, department or photo change.
+        """
+        try:
+            record_change(emp_id)
+        except Exception as e:
+            logger.error(f"Failed to log gallery change for emp_id {emp_id}: {e}", exc_info=True)
+        self.reload_embedding(emp_id)
+
+    def sync_changes(self):
+        """Apply gallery changes made by other workers (rate limited).
+
+        With a gallery file, a worker that has applied enough changes
+        republishes the file so every worker can remap it.
+        """
+        applied = self.sync.poll()
+        if applied and _GALLERY_FILE:
+            self._changes_since_file += applied
+            if self._changes_since_file >= _GALLERY_FILE_REPUBLISH:
+                with FileLock(_GALLERY_FILE, blocking=False) as locked:
+                    if locked:
+                        self._write_gallery_file()
+        return applied
+
+    def find_duplicate(self, emb, exclude_emp_id=None, threshold=0.5):
+        """(emp_id, similarity) of another employee's enrolled face matching `emb`, or None.
+
+        Active employees are searched in the gallery. The gallery leaves out
+        inactive employees, so their face_data rows (usually few) are then
+        scanned from the DB, like every row used to be.
+        """
+        for emp_id, sim in self.match_batch([emb], threshold=threshold, k=2)[0]:
+            if str(emp_id) != str(exclude_emp_id):
+                return emp_id, sim
+
+        query = self._normalize(emb)
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("""
+            SELECT f.emp_id, f.embedding
+            FROM face_data f
+            LEFT JOIN employees e ON e.id = f.emp_id
+            WHERE e.id IS NULL OR e.status <> 'active'
+        """)
+        rows = cur.fetchall()
+        cur.close()
+
+        best = None
+        for emp_id, blob in rows:
+            if blob is None or str(emp_id) == str(exclude_emp_id):
+                continue
+            try:
+                sim = float(np.dot(self._normalize(self._decode_embedding(blob)), query))
+            except Exception as exc:
+                logger.warning(f"Failed to parse embedding for emp_id {emp_id}: {exc}")
+                continue
+            if sim >= threshold and (best is None or sim > best[1]):
+                best = (emp_id, sim)
+        return best
 
 
     # ----------------------------------------------------
@@ -78,7 +461,7 @@ class FaceEncoder:
     # ----------------------------------------------------
     def get_embedding(self, frame_rgb):
         try:
-            faces = self.app.get(frame_rgb)
+            faces = self.profile("kiosk").get(frame_rgb)
         except Exception as e:
             logger.error(f"Face detection error in get_embedding: {e}", exc_info=True)
             return None
@@ -184,7 +567,8 @@ class FaceEncoder:
             # 4. Face detection
             faces = []
             try:
-                faces = self.app.get(rgb)
+                # Pose and landmarks are only computed for this check
+                faces = self.profile("enroll-quality").get(rgb)
             except Exception as e:
                 logger.error(f"Face detection during quality check failed: {e}", exc_info=True)
 
@@ -245,7 +629,7 @@ class FaceEncoder:
     # ----------------------------------------------------
     # MATCH (STRICT + RELIABLE)
     # ----------------------------------------------------
-    def match(self, emb, threshold=None):
+    def _resolve_threshold(self, threshold):
         # Use centralized threshold from config
         if threshold is None:
             from flask import current_app
@@ -253,38 +637,45 @@ class FaceEncoder:
                 threshold = float(current_app.config.get("EMBED_THRESHOLD", 0.75))
             except:
                 threshold = 0.75  # Fallback
-        
-        if self._emb_matrix.size == 0:
-            return None
-
-        # Ensure incoming embedding is normalized
-        try:
-            emb_arr = np.asarray(emb, dtype=np.float32)
-            nrm = np.linalg.norm(emb_arr)
-            if nrm > 0:
-                emb_arr = emb_arr / float(nrm)
-        except Exception:
-            emb_arr = np.asarray(emb, dtype=np.float32)
-
-        # Compute cosine similarities (dot product since vectors are normalized)
-        sims = np.dot(self._emb_matrix, emb_arr)
-        idx = int(np.argmax(sims))
-        best_sim = float(sims[idx])
+        return threshold
 
-        logger.debug(f"Match score: {best_sim}")
+    def match(self, emb, threshold=None):
+        results = self.match_batch([emb], threshold=threshold, k=1)
+        if results and results[0]:
+            return results[0][0]
+        return None
 
-        # For cosine similarity, higher is better. Threshold is interpreted as minimum similarity.
-        if threshold is None:
-            from flask import current_app
-            try:
-                threshold = float(current_app.config.get("EMBED_THRESHOLD", 0.75))
-            except:
-                threshold = 0.75
+    def match_batch(self, embs, threshold=None, k=1):
+        """
+        Match several face embeddings with a single similarity search.
+        Returns one list per embedding of up to k (emp_id, similarity)
+        pairs above threshold, best first.
+        """
+        threshold = self._resolve_threshold(threshold)
 
-        if best_sim >= threshold:
-            return self.employee_ids[idx], best_sim
+        # Cosine similarity search (dot product since vectors are normalized)
+        # against one gallery snapshot. Small galleries use an exact scan,
+        # large ones the IVF index; quantized galleries re-rank their best
+        # candidates in float32.
+        return self.gallery.match_batch(embs, threshold, k=k)
 
-        return None
+    def match_with_details(self, embs, threshold=None):
+        """
+        Like match_batch(k=1), but returns (details, similarity) per
+        embedding, or None when unmatched. Details ({"emp_id", "name",
+        "dept", "photo"}) come from the same gallery snapshot as the
+        match, so no DB query or cache lookup is needed.
+        """
+        threshold = self._resolve_threshold(threshold)
+        snap = self.gallery.snapshot
+        results = []
+        for matches in self.gallery.match_batch(embs, threshold, k=1, snap=snap):
+            if matches:
+                emp_id, sim = matches[0]
+                results.append((snap.details(emp_id), sim))
+            else:
+                results.append(None)
+        return results
 
 
     def _decode_embedding(self, emb_blob):
@@ -308,35 +699,3 @@ class FaceEncoder:
 
 
 face_encoder = FaceEncoder()
-
-
-def clear_embeddings_cache():
-    """Clear the in-memory embeddings stored on the face_encoder instance.
-
-    This is used after enrollment/update operations so that future
-    recognition calls will reload embeddings from the database.
-    """
-    global face_encoder
-    try:
-        face_encoder.embeddings = []
-        face_encoder.employee_ids = []
-        face_encoder._emb_matrix = np.empty((0, 512), dtype=np.float32)
-    except Exception:
-        # best-effort; do not raise in production flow
-        pass
-
-
-def invalidate_embeddings_cache():
-    """Invalidate the face embeddings cache (production-ready helper).
-
-    Clears in-memory embeddings on the `face_encoder` instance so that
-    subsequent recognition operations will reload embeddings from the DB.
-    """
-    global face_encoder
-    try:
-        face_encoder.embeddings = []
-        face_encoder.employee_ids = []
-        face_encoder._emb_matrix = np.empty((0, 512), dtype=np.float32)
-        logger.info("Face embeddings cache invalidated")
-    except Exception:
-        pass
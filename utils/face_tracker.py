@@ -0,0 +1,180 @@
+"""
+Per-kiosk face tracking across consecutive frames.
+
+A kiosk polls /kiosk/recognize every few hundred milliseconds, so the same
+person usually fills frame after frame while they stand in front of it.
+FaceTracker links each frame's detections to the previous frame's by box
+overlap (IoU). A track keeps the last embedding and match result, and the
+recognizer only runs again when the track is new, has moved noticeably
+since it was last embedded, or its result is older than the re-check
+interval. Repeated frames of a standing person cost detection only.
+
+The identity a track reports is a vote over its recent match results,
+so one poor frame (motion blur, head turned) that matches nobody does not
+flip the name shown. A fresh result naming a different employee does: the
+track's vote starts over from it, since someone else has stepped into the
+same spot. Attendance is only marked on a fresh result that agrees with
+the vote, never on a result replayed from the track.
+
+Gunicorn spreads a kiosk's frames over all workers, so the tracks are kept
+in the kiosk's shared state (utils.kiosk_state) between frames, like the
+liveness window: state_dict() / load_state() around each frame. Times are
+wall-clock seconds, which every worker agrees on.
+"""
+import time
+from collections import Counter, deque
+
+# Boxes overlapping at least this much are the same face in the next frame
+_TRACK_IOU = 0.3
+# Re-embed once the face has moved this far from where it was embedded
+_REEMBED_IOU = 0.6
+# Seconds a cached match result is trusted before re-checking it
+_RESULT_TTL = 2.0
+# Seconds a track survives without being seen
+_TRACK_MAX_AGE = 1.5
+# Match results a track votes over
+_VOTE_WINDOW = 5
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if inter <= 0:
+        return 0.0
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("track_id", "bbox", "last_seen", "embedding", "embedded_bbox",
+                 "embedded_at", "votes", "matches")
+
+    def __init__(self, track_id, bbox, now):
+        self.track_id = track_id
+        self.bbox = tuple(float(v) for v in bbox[:4])
+        self.last_seen = now
+        self.embedding = None
+        self.embedded_bbox = None
+        self.embedded_at = 0.0
+        self.votes = deque(maxlen=_VOTE_WINDOW)  # emp_id, or None for "unknown"
+        self.matches = {}  # emp_id -> (details, best similarity)
+
+    def record(self, embedding, match, now):
+        """Store a fresh recognition result: `match` is (details, sim) or None.
+
+        Returns True when the track now reports this match, i.e. attendance
+        may be marked for it.
+        """
+        self.embedding = embedding
+        self.embedded_bbox = self.bbox
+        self.embedded_at = now
+        emp_id = match[0]["emp_id"] if match else None
+        if emp_id is not None and self._winner() != emp_id:
+            # Someone else stepped into this track's place: their vote starts over
+            self.votes.clear()
+            self.matches.clear()
+        self.votes.append(emp_id)
+        if match:
+            best = self.matches.get(emp_id)
+            sim = max(match[1], best[1]) if best else match[1]
+            self.matches[emp_id] = (match[0], sim)
+        return emp_id is not None and self._winner() == emp_id
+
+    def state_dict(self):
+        """JSON-serializable track; the embedding itself is not kept."""
+        return {
+            "track_id": self.track_id,
+            "bbox": list(self.bbox),
+            "last_seen": self.last_seen,
+            "embedded_bbox": list(self.embedded_bbox) if self.embedded_bbox else None,
+            "embedded_at": self.embedded_at,
+            "votes": list(self.votes),
+            "matches": [[emp_id, details, float(sim)] for emp_id, (details, sim) in self.matches.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        track = cls(state["track_id"], state["bbox"], state["last_seen"])
+        if state.get("embedded_bbox"):
+            track.embedded_bbox = tuple(state["embedded_bbox"])
+        track.embedded_at = state.get("embedded_at", 0.0)
+        track.votes.extend(state.get("votes", ()))
+        track.matches = {emp_id: (details, sim) for emp_id, details, sim in state.get("matches", ())}
+        return track
+
+    def _winner(self):
+        """emp_id voted over the recent results (None = unknown)."""
+        if not self.votes:
+            return None
+        counts = Counter(self.votes)
+        top = max(counts.values())
+        # Ties go to the most recent result
+        return next(v for v in reversed(self.votes) if counts[v] == top)
+
+    def decision(self):
+        """Identity voted over the recent results: (details, sim) or None."""
+        winner = self._winner()
+        return self.matches.get(winner) if winner is not None else None
+
+
+class FaceTracker:
+    """Tracks of one kiosk's camera, loaded from and saved to its kiosk state."""
+
+    def __init__(self, track_iou=_TRACK_IOU, reembed_iou=_REEMBED_IOU,
+                 result_ttl=_RESULT_TTL, max_age=_TRACK_MAX_AGE):
+        self.track_iou = track_iou
+        self.reembed_iou = reembed_iou
+        self.result_ttl = result_ttl
+        self.max_age = max_age
+        self.tracks = []
+        self._next_id = 1
+
+    def state_dict(self):
+        return {"next_id": self._next_id, "tracks": [t.state_dict() for t in self.tracks]}
+
+    def load_state(self, state):
+        """Continue the tracks saved with state_dict() (empty/None = no tracks)."""
+        state = state or {}
+        self.tracks = [Track.from_state(t) for t in state.get("tracks", ())]
+        self._next_id = state.get("next_id", 1)
+
+    def assign(self, boxes, now=None):
+        """Track for each box (new tracks for unmatched boxes), greedy by IoU."""
+        now = time.time() if now is None else now
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+
+        pairs = sorted(
+            ((box_iou(box, track.bbox), i, j)
+             for i, box in enumerate(boxes) for j, track in enumerate(self.tracks)),
+            reverse=True,
+        )
+        assigned = [None] * len(boxes)
+        used = set()
+        for iou, i, j in pairs:
+            if iou < self.track_iou:
+                break
+            if assigned[i] is None and j not in used:
+                assigned[i] = self.tracks[j]
+                used.add(j)
+
+        for i, box in enumerate(boxes):
+            track = assigned[i]
+            if track is None:
+                track = Track(self._next_id, box, now)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[i] = track
+            else:
+                track.bbox = tuple(float(v) for v in box[:4])
+                track.last_seen = now
+        return assigned
+
+    def needs_embedding(self, track, now=None):
+        now = time.time() if now is None else now
+        if track.embedded_bbox is None:
+            return True
+        if now - track.embedded_at > self.result_ttl:
+            return True
+        return box_iou(track.bbox, track.embedded_bbox) < self.reembed_iou
+
@@ -0,0 +1,121 @@
+"""
+Per-kiosk change gate: skip inference on frames that did not change.
+
+A kiosk keeps polling /kiosk/recognize while nothing in front of it moves
+(an empty lobby, someone waiting outside the frame). Each frame is reduced
+to a tiny grayscale thumbnail and compared with the last frame that was
+fully processed for the same kiosk. When the mean absolute difference is
+under the threshold, the previous response is returned again instead of
+running liveness and face inference.
+
+Only responses without side effects are replayed (liveness WAIT and
+"ignore"); attendance results are never cached, so a check-in is not
+announced twice. A cached response is also re-checked after `max_age`
+seconds even if the scene stays still. Callers pass replay=False for
+responses that a near-identical next frame could change, e.g. a WAIT
+from multi-frame liveness: a blink barely moves the thumbnail.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Mean absolute gray-level difference (0-255) below which a frame counts as
+# unchanged; 0 disables the gate
+_KIOSK_CHANGE_THRESHOLD = float(os.getenv("KIOSK_CHANGE_THRESHOLD", "2.0"))
+# Seconds a replayed response stays valid
+_KIOSK_CHANGE_MAX_AGE = float(os.getenv("KIOSK_CHANGE_MAX_AGE", "3.0"))
+
+_THUMB_SIZE = (32, 18)  # 16:9, like the kiosk camera
+_REPLAYABLE = ("WAIT", "ignore")
+
+
+def frame_signature(frame):
+    """Tiny grayscale thumbnail of a BGR frame (area-averaged, so noise cancels out)."""
+    thumb = cv2.resize(frame, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return thumb.astype(np.int16)
+
+
+def frame_difference(a, b):
+    return float(np.abs(a - b).mean())
+
+
+class FrameGate:
+    """Last processed frame and response of one kiosk."""
+
+    __slots__ = ("signature", "response", "stored_at")
+
+    def __init__(self):
+        self.signature = None
+        self.response = None
+        self.stored_at = 0.0
+
+
+class FrameGateRegistry:
+    def __init__(self, threshold=_KIOSK_CHANGE_THRESHOLD, max_age=_KIOSK_CHANGE_MAX_AGE,
+                 max_kiosks=256):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_kiosks = max_kiosks
+        self._gates = OrderedDict()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def _gate(self, kiosk_id):
+        gate = self._gates.pop(kiosk_id, None) or FrameGate()
+        self._gates[kiosk_id] = gate
+        while len(self._gates) > self.max_kiosks:
+            self._gates.popitem(last=False)
+        return gate
+
+    def check(self, kiosk_id, frame, now=None):
+        """(signature, cached response or None) for a new frame from `kiosk_id`."""
+        now = time.monotonic() if now is None else now
+        signature = frame_signature(frame) if self.enabled else None
+        with self._lock:
+            self.frames += 1
+            if signature is None:
+                return None, None
+            gate = self._gate(kiosk_id)
+            if (gate.response is not None
+                    and now - gate.stored_at <= self.max_age
+                    and frame_difference(signature, gate.signature) < self.threshold):
+                self.skipped += 1
+                return signature, gate.response
+            return signature, None
+
+    def store(self, kiosk_id, signature, response, now=None, replay=True):
+        """Remember a processed frame; only side-effect-free responses are replayable."""
+        if signature is None:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            gate = self._gate(kiosk_id)
+            gate.signature = signature
+            replayable = replay and isinstance(response, dict) and response.get("status") in _REPLAYABLE
+            gate.response = response if replayable else None
+            gate.stored_at = now
+
+    def reset(self, kiosk_id):
+        with self._lock:
+            self._gates.pop(kiosk_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+                "kiosks": len(self._gates),
+                "threshold": self.threshold,
+            }
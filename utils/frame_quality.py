@@ -0,0 +1,112 @@
+"""
+Cheap frame quality gate, run before any face model.
+
+A frame that is nearly black, blown out, flat or badly motion-blurred
+cannot produce a usable embedding, so it is rejected from a downscaled
+grayscale copy (a couple of milliseconds for a 720p frame) instead of paying for face
+detection and recognition. Thresholds are deliberately loose: the gate
+only turns away frames recognition would fail on anyway. Enrollment
+scoring with stricter limits stays in FaceEncoder.check_image_quality.
+
+assess_frame() returns a FrameQuality whose `reason` is one of the
+codes below, for logs and API responses.
+"""
+import os
+
+import cv2
+import numpy as np
+
+QUALITY_OK = "ok"
+TOO_DARK = "too_dark"
+TOO_BRIGHT = "too_bright"
+LOW_CONTRAST = "low_contrast"
+TOO_BLURRY = "too_blurry"
+
+MESSAGES = {
+    QUALITY_OK: "Frame quality OK",
+    TOO_DARK: "Image too dark. Please improve the lighting.",
+    TOO_BRIGHT: "Image too bright. Please avoid direct light on the camera.",
+    LOW_CONTRAST: "Image too flat. Please make sure the camera is not covered.",
+    TOO_BLURRY: "Image too blurry. Please hold still.",
+}
+
+# Width of the grayscale copy the checks run on
+_ANALYSIS_WIDTH = 320
+# Too dark: even the brightest 5% of pixels stay below this gray level.
+# Too bright: even the darkest 5% are above this one. Percentiles rather
+# than the mean, so a face in front of a white wall still passes.
+_FRAME_DARK_LEVEL = float(os.getenv("FRAME_DARK_LEVEL", "40"))
+_FRAME_BRIGHT_LEVEL = float(os.getenv("FRAME_BRIGHT_LEVEL", "200"))
+# Contrast (gray-level std dev) below which the frame is flat
+_FRAME_MIN_CONTRAST = float(os.getenv("FRAME_MIN_CONTRAST", "10"))
+# Laplacian variance at 320 px wide; 0 disables the blur check
+_FRAME_MIN_SHARPNESS = float(os.getenv("FRAME_MIN_SHARPNESS", "15"))
+
+
+class FrameQuality:
+    __slots__ = ("reason", "brightness", "shadows", "highlights", "contrast", "sharpness")
+
+    def __init__(self, reason, brightness, shadows, highlights, contrast, sharpness):
+        self.reason = reason
+        self.brightness = brightness  # mean gray level
+        self.shadows = shadows  # 5th percentile
+        self.highlights = highlights  # 95th percentile
+        self.contrast = contrast
+        self.sharpness = sharpness
+
+    @property
+    def ok(self):
+        return self.reason == QUALITY_OK
+
+    @property
+    def message(self):
+        return MESSAGES[self.reason]
+
+    def __repr__(self):
+        return (f"FrameQuality({self.reason}, brightness={self.brightness:.0f}, "
+                f"range={self.shadows}-{self.highlights}, contrast={self.contrast:.0f}, "
+                f"sharpness={self.sharpness:.0f})")
+
+
+def assess_frame(frame, rgb=False):
+    """Quality of a BGR frame (RGB with rgb=True) from a downscaled gray copy."""
+    height, width = frame.shape[:2]
+    if width > _ANALYSIS_WIDTH:
+        size = (_ANALYSIS_WIDTH, max(1, int(round(height * _ANALYSIS_WIDTH / width))))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+
+    mean, std = cv2.meanStdDev(frame)
+    brightness, contrast = float(mean[0, 0]), float(std[0, 0])
+    cdf = np.cumsum(cv2.calcHist([frame], [0], None, [256], [0, 256]).ravel())
+    shadows, highlights = (int(v) for v in np.searchsorted(cdf, cdf[-1] * np.array([0.05, 0.95])))
+    sharpness = float(cv2.Laplacian(frame, cv2.CV_64F).var()) if _FRAME_MIN_SHARPNESS > 0 else 0.0
+
+    if highlights < _FRAME_DARK_LEVEL:
+        reason = TOO_DARK
+    elif shadows > _FRAME_BRIGHT_LEVEL:
+        reason = TOO_BRIGHT
+    elif contrast < _FRAME_MIN_CONTRAST:
+        reason = LOW_CONTRAST
+    elif _FRAME_MIN_SHARPNESS > 0 and sharpness < _FRAME_MIN_SHARPNESS:
+        reason = TOO_BLURRY
+    else:
+        reason = QUALITY_OK
+    return FrameQuality(reason, brightness, shadows, highlights, contrast, sharpness)
+
+
+def region_sharpness(frame, bbox, width=112):
+    """Laplacian variance of a box (x1, y1, x2, y2) resized to `width`, comparable across frames."""
+    height, frame_width = frame.shape[:2]
+    x1, y1, x2, y2 = (int(round(v)) for v in bbox[:4])
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(frame_width, x2), min(height, y2)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+    crop = frame[y1:y2, x1:x2]
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    size = (width, max(1, int(round((y2 - y1) * width / (x2 - x1)))))
+    crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var())
@@ -0,0 +1,123 @@
+"""
+Camera frame uploads for the kiosk and face-login endpoints.
+
+Clients can send a frame three ways; the endpoint does not care which:
+
+    Content-Type: image/jpeg      raw JPEG body, metadata in X-* headers
+    multipart/form-data           the image as file field `field`
+    application/json              {"<field>": "data:image/jpeg;base64,..."}
+
+A raw body saves the ~33% base64 overhead, the JSON parse and the base64
+decode; the bytes go straight to cv2.imdecode.
+
+A burst of frames (request_frames) comes the same three ways: several
+file fields of the same name, a JSON list, or one body of back-to-back
+JPEGs (Content-Type: image/jpeg or video/x-motion-jpeg).
+"""
+import base64
+import struct
+
+import cv2
+import numpy as np
+from flask import request
+
+
+def b64_image_bytes(value):
+    """Bytes of a base64 image or data URL."""
+    if value.startswith("data:"):
+        value = value.split(",", 1)[1]
+    return base64.b64decode(value)
+
+
+def decode_image(buf):
+    """Encoded image bytes -> BGR ndarray, without intermediate copies."""
+    frame = cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+    return frame
+
+
+def split_jpeg_stream(buf):
+    """Split back-to-back JPEG images (an MJPEG body) into one bytes object each.
+
+    Walks the marker segments by their lengths, so an EXIF thumbnail
+    inside a frame does not end it early; the entropy-coded data after
+    SOS ends at the first EOI marker (0xFF bytes in it are stuffed).
+    Raises ValueError on anything that is not a JPEG stream.
+    """
+    images = []
+    pos, size = 0, len(buf)
+    while pos < size:
+        if buf[pos:pos + 2] != b"\xff\xd8":
+            raise ValueError(f"Expected a JPEG start of image at byte {pos}")
+        start, pos = pos, pos + 2
+        while True:
+            if pos + 4 > size or buf[pos] != 0xFF:
+                raise ValueError("Truncated JPEG stream")
+            marker = buf[pos + 1]
+            if marker == 0xFF:  # fill byte
+                pos += 1
+                continue
+            (length,) = struct.unpack(">H", buf[pos + 2:pos + 4])
+            pos += 2 + length
+            if marker == 0xDA:  # start of scan: entropy-coded data up to EOI
+                end = buf.find(b"\xff\xd9", pos)
+                if end < 0:
+                    raise ValueError("Truncated JPEG stream")
+                pos = end + 2
+                break
+        images.append(bytes(buf[start:pos]))
+    return images
+
+
+def request_image_bytes(field):
+    """Encoded image bytes of the current request, or None if it has none."""
+    mimetype = request.mimetype or ""
+    if mimetype.startswith("image/") or mimetype == "application/octet-stream":
+        return request.get_data(cache=False) or None
+    if mimetype == "multipart/form-data":
+        upload = request.files.get(field)
+        return upload.read() if upload else None
+
+    data = request.get_json(silent=True) or {}
+    value = data.get(field)
+    if not value or not isinstance(value, str):
+        return None
+    return b64_image_bytes(value)
+
+
+def request_frame(field):
+    """BGR frame uploaded with the current request (None if missing).
+
+    Raises ValueError if the upload is not a decodable image.
+    """
+    buf = request_image_bytes(field)
+    if buf is None:
+        return None
+    try:
+        return decode_image(buf)
+    except Exception as e:
+        raise ValueError(f"Invalid image upload: {e}") from e
+
+
+def request_frames(field, max_frames):
+    """BGR frames of a burst uploaded with the current request, at most `max_frames`.
+
+    Raises ValueError if a frame is not a decodable image.
+    """
+    mimetype = request.mimetype or ""
+    if mimetype.startswith("image/") or mimetype in ("video/x-motion-jpeg", "application/octet-stream"):
+        buffers = split_jpeg_stream(request.get_data(cache=False))
+    elif mimetype == "multipart/form-data":
+        buffers = [upload.read() for upload in request.files.getlist(field)]
+    else:
+        data = request.get_json(silent=True) or {}
+        values = data.get(field)
+        if not isinstance(values, list):
+            return []
+        buffers = [b64_image_bytes(v) for v in values[:max_frames] if isinstance(v, str) and v]
+
+    try:
+        return [decode_image(buf) for buf in buffers[:max_frames]]
+    except Exception as e:
+        raise ValueError(f"Invalid image upload: {e}") from e
@@ -0,0 +1,225 @@
+"""
+Face gallery published as immutable snapshots.
+
+A GallerySnapshot bundles the embedding store, employee ids, the
+emp_id -> row map, per-row metadata columns (name, department, ...) and
+the similarity index. Snapshots are never modified:
+writers build a new one off to the side and publish it with a single
+reference assignment, so readers take `gallery.snapshot` once and search
+it without any lock and never see a half-applied update.
+"""
+import threading
+
+import numpy as np
+
+from utils.ann_index import ExactIndex, build_index, search_gallery
+from utils.embedding_store import EMBEDDING_DIM, empty_store, make_store
+from utils.logger import logger
+
+
+def _without_row(values, row):
+    """Tuple without `row`; the last value moves into its place."""
+    last = len(values) - 1
+    if row == last:
+        return values[:last]
+    return values[:row] + (values[last],) + values[row + 1:last]
+
+
+class GallerySnapshot:
+    """Read-only gallery state; build a new one instead of changing it."""
+
+    __slots__ = ("store", "employee_ids", "row_of", "columns", "index", "version")
+
+    def __init__(self, store, employee_ids, index, version=0, row_of=None, columns=None):
+        self.store = store
+        self.employee_ids = tuple(employee_ids)
+        self.row_of = row_of if row_of is not None else {
+            emp_id: row for row, emp_id in enumerate(self.employee_ids)
+        }
+        # Metadata is columnar: columns[name][row] belongs to employee_ids[row]
+        self.columns = {name: tuple(values) for name, values in (columns or {}).items()}
+        self.index = index
+        self.version = version
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+    def details(self, emp_id):
+        """Metadata dict for one employee (O(1)), or None if not in the gallery."""
+        row = self.row_of.get(emp_id)
+        if row is None:
+            return None
+        record = {name: values[row] for name, values in self.columns.items()}
+        record["emp_id"] = emp_id
+        return record
+
+    def search(self, queries, k=1, rerank=32):
+        """Return (rows, sims) for a (m, 512) batch of queries."""
+        return search_gallery(self.index, self.store, queries, k=k, rerank=rerank)
+
+
+class FaceGallery:
+    """Holds the current snapshot and serializes writers."""
+
+    def __init__(self, storage="float32", index_kind="auto", min_size=10000,
+                 nlist=0, nprobe=32, rerank=32, columns=()):
+        self.storage = storage
+        self.index_kind = (index_kind or "auto").lower()
+        self.min_size = min_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.column_names = tuple(columns)
+        self._write_lock = threading.Lock()
+        self._snapshot = self._empty_snapshot(0)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def _empty_snapshot(self, version):
+        return GallerySnapshot(
+            empty_store(self.storage), (), ExactIndex(), version,
+            columns={name: () for name in self.column_names},
+        )
+
+    def _index_kind_for(self, rows):
+        if self.index_kind == "exact" or (self.index_kind == "auto" and rows < self.min_size):
+            return "exact"
+        return "ivf"
+
+    def _build_index(self, store):
+        try:
+            index = build_index(
+                store,
+                kind=self.index_kind,
+                min_size=self.min_size,
+                nlist=self.nlist,
+                nprobe=self.nprobe,
+            )
+        except Exception as e:
+            logger.error(f"Failed to build {self.index_kind} index, using exact search: {e}", exc_info=True)
+            index = ExactIndex()
+        logger.info(f"Similarity index: {index.kind} ({len(store)} rows)")
+        return index
+
+    def _patched_index(self, snap, store, op, *args):
+        """Copy of the snapshot's index with one update applied."""
+        try:
+            index = snap.index.copy()
+            getattr(index, op)(*args)
+            outgrown = (
+                index.kind == "exact"
+                and self.index_kind in ("auto", "ivf")
+                and len(store) >= self.min_size
+            )
+        except Exception as e:
+            logger.warning(f"Index {op} failed, rebuilding: {e}")
+            outgrown = True
+        return self._build_index(store) if outgrown else index
+
+    # ----------------------------------------------------
+    # WRITERS (build off to the side, publish by one assignment)
+    # ----------------------------------------------------
+    def load(self, employee_ids, matrix, columns=None):
+        """Replace the whole gallery with normalized (n, 512) rows.
+
+        `columns` maps each metadata column name to one value per row.
+        """
+        return self.adopt(employee_ids, make_store(matrix, self.storage), columns)
+
+    def adopt(self, employee_ids, store, columns=None, index=None):
+        """Publish an already-built store, e.g. one mapped from a gallery file.
+
+        `index` is reused if it is the kind these settings call for.
+        """
+        columns = columns or {}
+        columns = {name: columns.get(name, (None,) * len(employee_ids)) for name in self.column_names}
+        if index is None or index.kind != self._index_kind_for(len(store)):
+            index = self._build_index(store)
+        with self._write_lock:
+            self._snapshot = GallerySnapshot(
+                store, employee_ids, index, self._snapshot.version + 1, columns=columns
+            )
+        return self._snapshot
+
+    def clear(self):
+        with self._write_lock:
+            self._snapshot = self._empty_snapshot(self._snapshot.version + 1)
+
+    def upsert(self, emp_id, emb, details=None):
+        """Add or replace one employee's normalized embedding.
+
+        `details` updates that employee's metadata columns; columns it does
+        not mention keep their previous value.
+        """
+        details = details or {}
+        with self._write_lock:
+            snap = self._snapshot
+            row = snap.row_of.get(emp_id)
+            if row is None:
+                row = len(snap)
+                store = snap.store.appended(emb)
+                ids = snap.employee_ids + (emp_id,)
+                row_of = dict(snap.row_of)
+                row_of[emp_id] = row
+                columns = {
+                    name: values + (details.get(name),)
+                    for name, values in snap.columns.items()
+                }
+                index = self._patched_index(snap, store, "add", row, emb)
+            else:
+                store = snap.store.with_row(row, emb)
+                ids = snap.employee_ids
+                row_of = snap.row_of
+                columns = {
+                    name: (values[:row] + (details[name],) + values[row + 1:]
+                           if name in details else values)
+                    for name, values in snap.columns.items()
+                }
+                index = self._patched_index(snap, store, "update", row, emb)
+            self._snapshot = GallerySnapshot(store, ids, index, snap.version + 1, row_of, columns)
+
+    def remove(self, emp_id):
+        """Drop one employee; returns False if they were not in the gallery."""
+        with self._write_lock:
+            snap = self._snapshot
+            row = snap.row_of.get(emp_id)
+            if row is None:
+                return False
+            last = len(snap) - 1
+            store = snap.store.without_row(row)
+            row_of = dict(snap.row_of)
+            del row_of[emp_id]
+            if row != last:
+                row_of[snap.employee_ids[last]] = row
+            ids = _without_row(snap.employee_ids, row)
+            columns = {name: _without_row(values, row) for name, values in snap.columns.items()}
+            index = self._patched_index(snap, store, "remove", row, last)
+            self._snapshot = GallerySnapshot(store, ids, index, snap.version + 1, row_of, columns)
+        return True
+
+    # ----------------------------------------------------
+    # READERS (lock-free)
+    # ----------------------------------------------------
+    def match_batch(self, queries, threshold, k=1, snap=None):
+        """Top-k (emp_id, similarity) pairs above threshold per query.
+
+        Pass `snap` to resolve details from the same snapshot afterwards.
+        """
+        if snap is None:
+            snap = self._snapshot
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if len(snap) == 0 or queries.shape[0] == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        rows, sims = snap.search(queries, k=k, rerank=self.rerank)
+        results = []
+        for face_rows, face_sims in zip(rows, sims):
+            logger.debug(f"Match score: {float(face_sims[0])}")
+            results.append([
+                (snap.employee_ids[int(r)], float(sim))
+                for r, sim in zip(face_rows, face_sims)
+                if r >= 0 and sim >= threshold
+            ])
+        return results
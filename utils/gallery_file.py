@@ -0,0 +1,222 @@
+"""
+Versioned, memory-mapped gallery file shared by all worker processes.
+
+Layout:
+    8 bytes   magic  b"FTGALLRY"
+    4 bytes   little-endian header length
+    header    UTF-8 JSON: format, generation, model, rows, dim, mode,
+              watermark (last applied face_data_changes id), created_at,
+              loaded_at (last full read of the rows from the DB)
+              and the (offset, dtype, shape) of every section
+    sections  each aligned to 64 bytes:
+              ids       int64 (n,)        employee ids by row
+              codes     float32/float16/int8 (n, 512) gallery rows
+              scale     float32 (n,)      int8 row scales only
+              exact     float32 (n, 512)  int8/float16 only: the rows the
+                                          codes were made from, for re-rank
+              centroids float32 (nlist, 512) and
+              assign    int32 (n,)        IVF index only
+              meta      UTF-8 JSON        metadata columns by row
+
+Workers map the file read-only; the arrays are views on the mapping, so
+the page cache holds one copy however many workers there are. A new
+version is written next to the old one and moved into place with
+os.replace(), so a reader never sees a partial file and workers that
+still map the old version keep a valid mapping until they remap.
+"""
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+
+from utils.ann_index import ExactIndex, IVFIndex
+from utils.embedding_store import EMBEDDING_DIM, Float32Store, QuantizedStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server
+    fcntl = None
+
+MAGIC = b"FTGALLRY"
+FORMAT_VERSION = 2
+_ALIGN = 64
+
+
+class MappedGallery:
+    """Arrays of one gallery file, backed by a read-only mapping."""
+
+    def __init__(self, header, employee_ids, store, columns, index, signature):
+        self.header = header
+        self.employee_ids = employee_ids
+        self.store = store
+        self.columns = columns
+        self.index = index
+        self.signature = signature
+
+    @property
+    def generation(self):
+        return self.header["generation"]
+
+    @property
+    def watermark(self):
+        return self.header["watermark"]
+
+    @property
+    def loaded_at(self):
+        return self.header.get("loaded_at", self.header["created_at"])
+
+
+def file_signature(path):
+    """Cheap identity of the file currently at `path` (None if missing)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# ----------------------------------------------------
+# WRITE
+# ----------------------------------------------------
+def _sections(snapshot):
+    store = snapshot.store
+    if store.mode == "float32":
+        codes, scale = store.matrix, None
+    else:
+        codes, scale = store.codes, store.scale
+
+    yield "ids", np.asarray(snapshot.employee_ids, dtype=np.int64)
+    yield "codes", np.ascontiguousarray(codes)
+    if scale is not None:
+        yield "scale", np.ascontiguousarray(scale, dtype=np.float32)
+    if store.mode != "float32":
+        yield "exact", np.ascontiguousarray(store.take(slice(None)), dtype=np.float32)
+    if snapshot.index.kind == "ivf":
+        yield "centroids", np.ascontiguousarray(snapshot.index.centroids, dtype=np.float32)
+        yield "assign", snapshot.index.row_list.astype(np.int32)
+    meta = json.dumps({name: list(values) for name, values in snapshot.columns.items()})
+    yield "meta", np.frombuffer(meta.encode("utf-8"), dtype=np.uint8)
+
+
+def write_gallery_file(path, snapshot, watermark, generation, model=None, loaded_at=None):
+    """Write `snapshot` to `path` atomically (temp file + os.replace).
+
+    `loaded_at` is when the rows were last read in full from the DB
+    (default now); republished files carry it forward.
+    """
+    sections = list(_sections(snapshot))
+    now = time.time()
+    header = {
+        "format": FORMAT_VERSION,
+        "generation": int(generation),
+        "model": model,
+        "rows": len(snapshot),
+        "dim": EMBEDDING_DIM,
+        "mode": snapshot.store.mode,
+        "watermark": int(watermark or 0),
+        "created_at": now,
+        "loaded_at": now if loaded_at is None else float(loaded_at),
+        "sections": {},
+    }
+
+    # Offsets depend on the header length; reserve generously and pad
+    header_room = 4096 + 64 * len(sections)
+    offset = len(MAGIC) + 4 + header_room
+    for name, arr in sections:
+        offset = -(-offset // _ALIGN) * _ALIGN
+        header["sections"][name] = [offset, arr.dtype.str, list(arr.shape)]
+        offset += arr.nbytes
+
+    blob = json.dumps(header).encode("utf-8")
+    if len(blob) > header_room:
+        raise ValueError("gallery file header too large")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(blob).to_bytes(4, "little"))
+        f.write(blob)
+        for name, arr in sections:
+            f.seek(header["sections"][name][0])
+            f.write(arr.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+# ----------------------------------------------------
+# READ
+# ----------------------------------------------------
+def read_gallery_file(path, nprobe=32):
+    """Map `path` read-only; returns a MappedGallery or raises ValueError."""
+    signature = file_signature(path)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a gallery file")
+    header_len = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 4], "little")
+    start = len(MAGIC) + 4
+    header = json.loads(mm[start:start + header_len].decode("utf-8"))
+    if header.get("format") != FORMAT_VERSION or header.get("dim") != EMBEDDING_DIM:
+        raise ValueError(f"{path}: unsupported gallery file format")
+
+    def section(name):
+        if name not in header["sections"]:
+            return None
+        offset, dtype, shape = header["sections"][name]
+        count = int(np.prod(shape)) if shape else 1
+        # Zero-copy, read-only view on the mapping
+        return np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=offset).reshape(shape)
+
+    mode = header["mode"]
+    codes = section("codes")
+    if mode == "float32":
+        store = Float32Store(codes)
+    else:
+        store = QuantizedStore.from_codes(mode, codes, section("scale"), section("exact"))
+
+    centroids = section("centroids")
+    if centroids is not None:
+        index = IVFIndex(nlist=centroids.shape[0], nprobe=nprobe).from_assignment(
+            centroids, section("assign")
+        )
+    else:
+        index = ExactIndex()
+
+    columns = json.loads(section("meta").tobytes().decode("utf-8"))
+    employee_ids = section("ids").tolist()
+    return MappedGallery(header, employee_ids, store, columns, index, signature)
+
+
+class FileLock:
+    """Exclusive advisory lock on `<path>.lock` (no-op without fcntl)."""
+
+    def __init__(self, path, blocking=True):
+        self.path = f"{path}.lock"
+        self.blocking = blocking
+        self._f = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._f = open(self.path, "a")
+        flags = fcntl.LOCK_EX | (0 if self.blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(self._f, flags)
+        except BlockingIOError:
+            self._f.close()
+            self._f = None
+            return False
+        return True
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+            self._f = None
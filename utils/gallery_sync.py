@@ -0,0 +1,114 @@
+"""
+Cross-worker gallery change notification.
+
+Every gunicorn worker holds its own copy of the face gallery. Writers
+append the changed emp_id to the `face_data_changes` table; each worker
+remembers the last change id it applied (its watermark) and, at most once
+per GALLERY_SYNC_INTERVAL seconds, re-reads only the employees changed
+since then. Nothing is reloaded when no row is newer than the watermark,
+so the check is a single primary-key range query.
+"""
+import os
+import threading
+import time
+
+from utils.db import get_db
+from utils.logger import logger
+
+_SYNC_INTERVAL = float(os.getenv("GALLERY_SYNC_INTERVAL", "1.0"))
+_SYNC_BATCH = 500
+
+
+def ensure_changelog_table():
+    """Create the change log table if it does not exist yet."""
+    db = get_db()
+    cur = db.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS face_data_changes (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            emp_id INT NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.commit()
+    cur.close()
+
+
+def record_change(emp_id):
+    """Log that one employee's face data or status changed."""
+    db = get_db()
+    cur = db.cursor()
+    cur.execute("INSERT INTO face_data_changes (emp_id) VALUES (%s)", (emp_id,))
+    db.commit()
+    cur.close()
+
+
+def latest_change_id():
+    """Highest change id so far (0 if none)."""
+    db = get_db()
+    cur = db.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM face_data_changes")
+    row = cur.fetchone()
+    cur.close()
+    return int(row[0]) if row else 0
+
+
+class GallerySync:
+    """Applies changes logged by other workers to this worker's gallery.
+
+    apply(emp_id) re-reads one employee (FaceEncoder.reload_embedding).
+    refresh(), if given, runs first on every poll (e.g. to remap a newer
+    gallery file, which may move the watermark).
+    """
+
+    def __init__(self, apply, interval=_SYNC_INTERVAL, refresh=None):
+        self.apply = apply
+        self.refresh = refresh
+        self.interval = interval
+        self.watermark = None
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def capture(self, read):
+        """(read(), watermark) with no poll applying changes in between.
+
+        A poll that runs meanwhile (another thread of the worker) returns
+        without doing anything, as when two threads poll at once.
+        """
+        with self._lock:
+            return read(), self.watermark
+
+    def poll(self, force=False):
+        """Apply changes newer than the watermark; returns how many employees."""
+        now = time.monotonic()
+        if self.watermark is None or (not force and now - self._last_poll < self.interval):
+            return 0
+        # One thread per worker polls; the others carry on without waiting
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_poll = now
+            if self.refresh is not None:
+                self.refresh()
+            db = get_db()
+            cur = db.cursor()
+            cur.execute("""
+                SELECT id, emp_id
+                FROM face_data_changes
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (self.watermark, _SYNC_BATCH))
+            rows = cur.fetchall()
+            cur.close()
+            if not rows:
+                return 0
+
+            changed = list(dict.fromkeys(emp_id for _, emp_id in rows))
+            for emp_id in changed:
+                self.apply(emp_id)
+            self.watermark = int(rows[-1][0])
+            logger.info(f"Gallery sync: applied {len(changed)} change(s) up to #{self.watermark}")
+            return len(changed)
+        finally:
+            self._lock.release()
@@ -0,0 +1,98 @@
+"""
+Worker-side client for the inference server (utils/inference_server.py).
+
+RemoteFaceAnalysis stands in for insightface's FaceAnalysis: get(img)
+sends the frame over the Unix socket and returns the same Face objects,
+so `face_encoder.app.get(...)` callers do not change. profile(name)
+returns a view that runs one inference profile (utils/inference_profiles.py)
+over the same connections.
+"""
+import os
+import threading
+from multiprocessing.connection import Client
+
+from insightface.app.common import Face
+
+from utils.inference_profiles import align
+from utils.logger import logger
+
+
+def inference_authkey():
+    """Shared secret for the socket (workers and server read the same env).
+
+    multiprocessing.connection unpickles what it receives, so anyone holding
+    the key can run code in the other process: there is no default.
+    """
+    key = os.getenv("INFERENCE_AUTHKEY") or os.getenv("SECRET_KEY")
+    if not key:
+        raise ValueError("INFERENCE_AUTHKEY (or SECRET_KEY) must be set to use the inference socket!")
+    return key.encode("utf-8")
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class RemoteFaceAnalysis:
+    """FaceAnalysis.get() served by the inference server process."""
+
+    def __init__(self, address, authkey=None, profile="full"):
+        self.address = address
+        self.authkey = authkey if authkey is not None else inference_authkey()
+        self.profile_name = profile
+        # One connection per request thread; requests on it are sequential
+        self._local = threading.local()
+
+    def profile(self, name):
+        """View running inference profile `name`, sharing this client's connections."""
+        view = RemoteFaceAnalysis.__new__(RemoteFaceAnalysis)
+        view.__dict__.update(self.__dict__)
+        view.profile_name = name
+        return view
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _request(self, message):
+        # Retry once on a fresh connection (e.g. after a server restart)
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.send(message)
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._drop_connection()
+                if attempt == 2:
+                    raise InferenceError(f"inference server unavailable at {self.address}: {e}") from e
+                logger.warning(f"Inference server connection lost, reconnecting: {e}")
+
+        if status != "ok":
+            raise InferenceError(payload)
+        return payload
+
+    def get(self, img, max_num=0, embed=True):
+        payload = self._request(("get", img, max_num, self.profile_name, embed))
+        return [Face(d) for d in payload]
+
+    def embed(self, img, faces):
+        """Set the embedding of `faces`; only their aligned crops are sent."""
+        if not faces:
+            return faces
+        feats = self._request(("embed", [align(img, face) for face in faces]))
+        for face, feat in zip(faces, feats):
+            face.embedding = feat
+        return faces
@@ -0,0 +1,163 @@
+"""
+Named inference profiles over one loaded InsightFace model set.
+
+FaceAnalysis.get() runs every bundled model at one detection size. A
+profile picks only the modules an endpoint needs and its own detection
+size, while all profiles share the same ONNX sessions:
+
+    full            every bundled model, 640x640 (plain app.get())
+    kiosk           detection + recognition, frame downscaled to 640 wide
+    kiosk-landmarks kiosk + 2D landmarks (eye contours for liveness)
+    enroll-quality  + 3D landmarks (pose) and 2D landmarks, 640x640
+    detect-only     detection alone, frame downscaled to 320 wide
+
+Profiles with a detection width run the detector on a downscaled copy of
+the frame, at an input size fitted to the frame's aspect ratio (a 16:9
+frame is not padded to a square), then map the boxes and keypoints back.
+Alignment, recognition and landmarks always use the full-resolution
+frame, so detection cost no longer grows with the camera resolution while
+the embedding is computed from the sharpest crop available.
+"""
+import math
+import os
+
+import cv2
+from insightface.app.common import Face
+from insightface.utils import face_align
+
+# Aligned crop size of the ArcFace recognition models bundled with insightface
+RECOGNITION_INPUT_SIZE = 112
+
+# Width kiosk frames are downscaled to before detection (0 = detect at 640x640)
+_KIOSK_DETECT_WIDTH = int(os.getenv("KIOSK_DETECT_WIDTH", "640"))
+
+
+class InferenceProfile:
+    __slots__ = ("name", "modules", "det_size", "detect_width")
+
+    def __init__(self, name, modules, det_size, detect_width=0):
+        self.name = name
+        self.modules = tuple(modules) if modules is not None else None  # None = all
+        self.det_size = tuple(det_size)
+        self.detect_width = detect_width  # 0 = detect on the frame as is, at det_size
+
+    def runs(self, taskname):
+        return self.modules is None or taskname in self.modules
+
+
+PROFILES = {
+    "full": InferenceProfile("full", None, (640, 640)),
+    "kiosk": InferenceProfile("kiosk", ("detection", "recognition"), (640, 640),
+                              detect_width=_KIOSK_DETECT_WIDTH),
+    "kiosk-landmarks": InferenceProfile("kiosk-landmarks",
+                                        ("detection", "recognition", "landmark_2d_106"),
+                                        (640, 640), detect_width=_KIOSK_DETECT_WIDTH),
+    "enroll-quality": InferenceProfile(
+        "enroll-quality",
+        ("detection", "recognition", "landmark_3d_68", "landmark_2d_106"),
+        (640, 640),
+    ),
+    "detect-only": InferenceProfile("detect-only", ("detection",), (320, 320), detect_width=320),
+}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference profile: {name}") from None
+
+
+def _stride_multiple(n, stride=32):
+    return max(stride, int(math.ceil(n / stride)) * stride)
+
+
+def detect(det_model, img, profile, max_num=0):
+    """Run the detector for `profile`; boxes and keypoints are in `img` coordinates."""
+    height, width = img.shape[:2]
+    if not profile.detect_width:
+        return det_model.detect(img, input_size=profile.det_size, max_num=max_num, metric="default")
+
+    scale = min(1.0, profile.detect_width / float(width))
+    small = img
+    if scale < 1.0:
+        small = cv2.resize(img, (int(round(width * scale)), int(round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    # Input fitted to the (downscaled) frame: no letterbox padding to run through the model
+    input_size = (_stride_multiple(small.shape[1]), _stride_multiple(small.shape[0]))
+    bboxes, kpss = det_model.detect(small, input_size=input_size, max_num=max_num, metric="default")
+    if scale < 1.0:
+        bboxes[:, 0:4] /= scale
+        if kpss is not None:
+            kpss /= scale
+    return bboxes, kpss
+
+
+def align(img, face, image_size=RECOGNITION_INPUT_SIZE):
+    """Aligned recognition crop of `face` from the full-resolution frame."""
+    return face_align.norm_crop(img, landmark=face.kps, image_size=image_size)
+
+
+def embed_crops(app, crops):
+    """Recognition features for aligned crops, in one model call."""
+    if not crops:
+        return []
+    return [feat.flatten() for feat in app.models["recognition"].get_feat(crops)]
+
+
+def analyze_batch(app, images, max_nums=None, profiles=None, embeds=None):
+    """FaceAnalysis.get() for several frames, batching the recognition model.
+
+    `profiles` gives each frame's InferenceProfile (default: full);
+    `embeds` can turn recognition off for a frame whose caller embeds only
+    some of its faces later (embed_crops). Returns one list of Face objects
+    per image, with the fields app.get() would set for that profile's modules.
+    """
+    max_nums = max_nums or [0] * len(images)
+    profiles = profiles or [PROFILES["full"]] * len(images)
+    embeds = embeds or [True] * len(images)
+    rec_model = app.models.get("recognition")
+    results, crops, owners = [], [], []
+
+    for img, max_num, profile, embed in zip(images, max_nums, profiles, embeds):
+        bboxes, kpss = detect(app.det_model, img, profile, max_num)
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(
+                bbox=bboxes[i, 0:4],
+                kps=kpss[i] if kpss is not None else None,
+                det_score=bboxes[i, 4],
+            )
+            for taskname, model in app.models.items():
+                if taskname in ("detection", "recognition") or not profile.runs(taskname):
+                    continue
+                model.get(img, face)
+            if embed and profile.runs("recognition") and rec_model is not None and face.kps is not None:
+                crops.append(align(img, face, rec_model.input_size[0]))
+                owners.append(face)
+            faces.append(face)
+        results.append(faces)
+
+    if crops:
+        feats = rec_model.get_feat(crops)
+        for face, feat in zip(owners, feats):
+            face.embedding = feat.flatten()
+    return results
+
+
+class ProfileAnalysis:
+    """FaceAnalysis-like view running one profile on a shared model set."""
+
+    def __init__(self, app, profile):
+        self.app = app
+        self.profile = profile
+
+    def get(self, img, max_num=0, embed=True):
+        return analyze_batch(self.app, [img], [max_num], [self.profile], [embed])[0]
+
+    def embed(self, img, faces):
+        """Set the embedding of `faces` (detected in `img` without one)."""
+        crops = [align(img, face) for face in faces]
+        for face, feat in zip(faces, embed_crops(self.app, crops)):
+            face.embedding = feat
+        return faces
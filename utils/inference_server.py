@@ -0,0 +1,165 @@
+"""
+Out-of-process face inference server.
+
+One process loads the InsightFace model and serves every gunicorn worker
+over a Unix socket (see utils/inference_client.py for the worker side).
+Requests arriving within INFERENCE_MAX_WAIT_MS of each other are handled
+as one micro-batch: each frame is detected on its own (with its
+inference profile's modules and detection size), then the aligned crops
+of every face in the batch go through the recognition model in a single
+call. "embed" requests carry aligned crops only (faces a worker detected
+earlier and now wants embedded) and join the same batches.
+
+Run with:
+    python -m utils.inference_server
+"""
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from utils.inference_client import inference_authkey
+from utils.inference_profiles import analyze_batch, embed_crops, get_profile
+from utils.logger import logger
+from utils.onnx_tuning import load_face_analysis, plan_from_env
+
+_INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/facetrack-inference.sock")
+_INFERENCE_MODEL = os.getenv("INFERENCE_MODEL", "buffalo_l")
+_INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+_INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+
+class _Pending:
+    """One queued request: a frame to analyze, or aligned crops to embed."""
+    __slots__ = ("image", "max_num", "profile", "embed", "crops", "result", "done")
+
+    def __init__(self, image=None, max_num=0, profile=None, embed=True, crops=None):
+        self.image = image
+        self.max_num = max_num
+        self.profile = profile
+        self.embed = embed
+        self.crops = crops
+        self.result = None
+        self.done = threading.Event()
+
+
+class InferenceServer:
+    def __init__(self, address, app, max_batch=_INFERENCE_MAX_BATCH,
+                 max_wait_ms=_INFERENCE_MAX_WAIT_MS, authkey=None):
+        self.address = address
+        self.app = app
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.authkey = authkey if authkey is not None else inference_authkey()
+        self._requests = queue.Queue()
+        self._listener = None
+
+    # ----------------------------------------------------
+    # CONNECTIONS (one thread per worker connection)
+    # ----------------------------------------------------
+    def serve_forever(self, ready=None):
+        if os.path.exists(self.address):
+            os.remove(self.address)  # stale socket from a previous run
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o660)
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        logger.info(f"Inference server listening on {self.address} "
+                    f"(max batch {self.max_batch}, wait {self.max_wait * 1000:.1f} ms)")
+        if ready is not None:
+            ready.set()
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break  # listener closed
+            except Exception as e:
+                logger.warning(f"Inference server: rejected connection: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                op = message[0]
+                if op == "get":
+                    _, image, max_num, profile_name, embed = message
+                    try:
+                        profile = get_profile(profile_name)
+                    except ValueError as e:
+                        conn.send(("error", str(e)))
+                        continue
+                    pending = _Pending(image, max_num, profile, embed)
+                elif op == "embed":
+                    pending = _Pending(crops=message[1])
+                else:
+                    conn.send(("error", f"unknown op {op!r}"))
+                    continue
+                self._requests.put(pending)
+                pending.done.wait()
+                conn.send(pending.result)
+
+    # ----------------------------------------------------
+    # MICRO-BATCHING
+    # ----------------------------------------------------
+    def _batch_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        frames = [p for p in batch if p.crops is None]
+        crops = [p for p in batch if p.crops is not None]
+        try:
+            if frames:
+                results = analyze_batch(
+                    self.app,
+                    [p.image for p in frames],
+                    [p.max_num for p in frames],
+                    [p.profile for p in frames],
+                    [p.embed for p in frames],
+                )
+                for pending, faces in zip(frames, results):
+                    pending.result = ("ok", [dict(face) for face in faces])
+            if crops:
+                # Crops from every embed request in the batch share one model call
+                feats = embed_crops(self.app, [c for p in crops for c in p.crops])
+                start = 0
+                for pending in crops:
+                    pending.result = ("ok", feats[start:start + len(pending.crops)])
+                    start += len(pending.crops)
+        except Exception as e:
+            logger.error(f"Inference batch of {len(batch)} failed: {e}", exc_info=True)
+            for pending in batch:
+                pending.result = ("error", str(e))
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+
+def main():
+    logger.info(f"[*] Loading InsightFace model {_INFERENCE_MODEL} for the inference server...")
+    # The only process running the model on this host: it gets every core
+    app = load_face_analysis(_INFERENCE_MODEL, plan_from_env(workers=1))
+    InferenceServer(_INFERENCE_SOCKET, app).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
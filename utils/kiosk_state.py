@@ -0,0 +1,154 @@
+"""
+Per-kiosk liveness and cooldown state, shared by every worker.
+
+The liveness voting window, head-movement history and the unknown-face
+cooldown used to live in one LivenessDetector per worker, shared by all
+kiosks. Two kiosks then mixed their frames into one window, and with
+several gunicorn workers one kiosk's frames were split across as many
+detectors, so liveness took several times the intended ~30 frames.
+
+State is now a small JSON-friendly dict per kiosk id, loaded at the start
+of a frame and saved at the end. A kiosk sends its next frame only after
+the previous response arrives, so last-write-wins is enough.
+
+Backends (KIOSK_STATE_BACKEND):
+
+- memory: in this process, least recently used kiosks dropped past
+  `max_kiosks`. Only correct with a single worker.
+- db: the `kiosk_state` table, so any worker can serve any frame.
+
+Both forget a kiosk that sent nothing for KIOSK_STATE_TTL seconds.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.db import get_db
+from utils.logger import logger
+
+_KIOSK_STATE_BACKEND = os.getenv("KIOSK_STATE_BACKEND", "memory")
+_KIOSK_STATE_TTL = float(os.getenv("KIOSK_STATE_TTL", "300"))
+
+# Seconds between deletions of expired rows (db backend)
+_PRUNE_INTERVAL = 60.0
+
+
+class MemoryKioskStateStore:
+    """Kiosk state in this process, LRU + TTL evicted."""
+
+    def __init__(self, ttl=_KIOSK_STATE_TTL, max_kiosks=256):
+        self.ttl = ttl
+        self.max_kiosks = max_kiosks
+        self._states = OrderedDict()  # kiosk_id -> (saved_at, state)
+        self._lock = threading.Lock()
+
+    def ensure_table(self):
+        pass
+
+    def load(self, kiosk_id, now=None):
+        """State saved for `kiosk_id` (a fresh dict if none or expired)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._states.get(kiosk_id)
+            if entry is None:
+                return {}
+            saved_at, state = entry
+            if now - saved_at > self.ttl:
+                del self._states[kiosk_id]
+                return {}
+            self._states.move_to_end(kiosk_id)
+            # Saved as JSON, like the db backend, so callers never share a dict
+            return json.loads(state)
+
+    def save(self, kiosk_id, state, now=None):
+        now = time.monotonic() if now is None else now
+        data = json.dumps(state)
+        with self._lock:
+            self._states.pop(kiosk_id, None)
+            self._states[kiosk_id] = (now, data)
+            while len(self._states) > self.max_kiosks:
+                self._states.popitem(last=False)
+
+    def reset(self, kiosk_id):
+        with self._lock:
+            self._states.pop(kiosk_id, None)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class DbKioskStateStore:
+    """Kiosk state in the `kiosk_state` table, visible to every worker."""
+
+    def __init__(self, ttl=_KIOSK_STATE_TTL, prune_interval=_PRUNE_INTERVAL):
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._last_prune = float("-inf")
+
+    def ensure_table(self):
+        """Create the state table if it does not exist yet."""
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS kiosk_state (
+                kiosk_id VARCHAR(64) PRIMARY KEY,
+                state MEDIUMTEXT NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        db.commit()
+        cur.close()
+
+    def load(self, kiosk_id):
+        db = get_db()
+        cur = db.cursor()
+        cur.execute(
+            "SELECT state FROM kiosk_state "
+            "WHERE kiosk_id = %s AND updated_at >= NOW() - INTERVAL %s SECOND",
+            (kiosk_id, int(self.ttl)))
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            return {}
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            logger.warning(f"Discarding unreadable kiosk state for {kiosk_id}")
+            return {}
+
+    def save(self, kiosk_id, state):
+        db = get_db()
+        cur = db.cursor()
+        cur.execute(
+            "INSERT INTO kiosk_state (kiosk_id, state) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE state = VALUES(state), updated_at = CURRENT_TIMESTAMP",
+            (kiosk_id, json.dumps(state)))
+        now = time.monotonic()
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            cur.execute(
+                "DELETE FROM kiosk_state WHERE updated_at < NOW() - INTERVAL %s SECOND",
+                (int(self.ttl),))
+        db.commit()
+        cur.close()
+
+    def reset(self, kiosk_id):
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("DELETE FROM kiosk_state WHERE kiosk_id = %s", (kiosk_id,))
+        db.commit()
+        cur.close()
+
+
+def make_kiosk_state_store(backend=_KIOSK_STATE_BACKEND):
+    if backend == "db":
+        return DbKioskStateStore()
+    if backend != "memory":
+        logger.warning(f"Unknown KIOSK_STATE_BACKEND {backend!r}, keeping kiosk state in memory")
+    return MemoryKioskStateStore()
+
+
+kiosk_states = make_kiosk_state_store()
@@ -0,0 +1,198 @@
+"""
+Liveness backends for the kiosk.
+
+A backend decides whether the faces in a kiosk frame are live:
+
+    heuristic   blink / head movement over several frames (utils.liveness_detector),
+                from InsightFace landmarks or, with LIVENESS_MODE=haar, Haar cascades
+    onnx        a silent anti-spoofing classifier (e.g. MiniFASNet from
+                Silent-Face-Anti-Spoofing) scoring every face crop of one frame
+                in a single batched call; no multi-frame window
+
+The admin setting `liveness_backend` picks one. Every backend has the same
+interface: `profile` names the inference profile the kiosk detects faces
+with before calling it (None = the backend needs no detections), and
+check(state, frame, faces) returns (is_live, confidence, message, faces),
+the faces being handed on to recognition. `replay_wait` says whether the
+kiosk change gate (utils/frame_gate.py) may replay a "not live yet"
+answer for an unchanged-looking frame: not for multi-frame checks, whose
+blinks hardly change the frame but must all be seen.
+"""
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from utils.frame_quality import region_sharpness
+from utils.liveness_detector import (
+    LIVENESS_MODE, LandmarkLivenessDetector, LivenessDetector, largest_face,
+)
+from utils.logger import logger
+
+LIVENESS_BACKENDS = ("heuristic", "onnx")
+
+# Local ONNX anti-spoofing model: (N, 3, H, W) BGR crops -> class scores
+_ANTISPOOF_MODEL = os.getenv("ANTISPOOF_MODEL", "models/anti_spoof.onnx")
+_ANTISPOOF_THRESHOLD = float(os.getenv("ANTISPOOF_THRESHOLD", "0.8"))
+# Crop side in face-box sizes, and the output class meaning "real face"
+_ANTISPOOF_SCALE = float(os.getenv("ANTISPOOF_SCALE", "2.7"))
+_ANTISPOOF_LIVE_INDEX = int(os.getenv("ANTISPOOF_LIVE_INDEX", "1"))
+
+
+class HeuristicLiveness:
+    """Multi-frame blink and head-movement checks, window kept in the kiosk state."""
+
+    name = "heuristic"
+    replay_wait = False
+
+    def __init__(self, mode=LIVENESS_MODE):
+        self.mode = mode
+        self.profile = "kiosk-landmarks" if mode == "landmarks" else None
+
+    def check(self, state, frame, faces=None):
+        if self.mode == "landmarks":
+            detector = LandmarkLivenessDetector()
+            detector.load_state(state.get("liveness"))
+            is_live, confidence, message = detector.check_liveness(largest_face(faces))
+        else:
+            detector = LivenessDetector()
+            detector.load_state(state.get("liveness"))
+            is_live, confidence, message = detector.check_liveness(frame)
+        state["liveness"] = detector.state_dict()
+        return is_live, confidence, message, faces
+
+
+def _softmax(scores):
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.min() >= 0 and np.allclose(scores.sum(axis=1), 1.0, atol=1e-3):
+        return scores  # the model already ends in a softmax
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class OnnxAntiSpoofLiveness:
+    """Single-frame live/spoof classifier over the detected face crops."""
+
+    name = "onnx"
+    profile = "kiosk"
+    replay_wait = True
+
+    def __init__(self, model_path=_ANTISPOOF_MODEL, threshold=_ANTISPOOF_THRESHOLD,
+                 scale=_ANTISPOOF_SCALE, live_index=_ANTISPOOF_LIVE_INDEX, plan=None):
+        import onnxruntime as ort
+
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Anti-spoofing model not found: {model_path}")
+        if plan is None:
+            from utils.onnx_tuning import plan_from_env
+            plan = plan_from_env()
+        self.session = ort.InferenceSession(model_path, sess_options=plan.session_options(),
+                                            providers=plan.providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.input_size = (width if isinstance(width, int) else 80,
+                           height if isinstance(height, int) else 80)
+        # Exports with a fixed batch of 1 are run crop by crop
+        self.batched = not isinstance(batch, int) or batch != 1
+        self.threshold = threshold
+        self.scale = scale
+        self.live_index = live_index
+
+    def crop(self, frame, bbox):
+        """Square crop of `scale` face-box sizes around the face, zero padded at the edges."""
+        x1, y1, x2, y2 = (float(v) for v in bbox[:4])
+        side = max(x2 - x1, y2 - y1) * self.scale
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        width, height = self.input_size
+        sx, sy = width / side, height / side
+        matrix = np.array([[sx, 0, width / 2 - cx * sx], [0, sy, height / 2 - cy * sy]],
+                          dtype=np.float32)
+        return cv2.warpAffine(frame, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT)
+
+    def scores(self, frame, faces):
+        """Probability that each face is real, from one model call."""
+        if not faces:
+            return []
+        crops = np.stack([self.crop(frame, face.bbox) for face in faces])
+        blob = crops.transpose(0, 3, 1, 2).astype(np.float32)
+        if self.batched:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                      for i in range(len(blob))])
+        return [float(p) for p in _softmax(outputs)[:, self.live_index]]
+
+    def check(self, state, frame, faces=None):
+        """Live if any face scores above the threshold; spoofed faces are dropped."""
+        if not faces:
+            return False, 0.0, "No face detected", faces
+        scores = self.scores(frame, faces)
+        live = [face for face, score in zip(faces, scores) if score >= self.threshold]
+        confidence = max(scores)
+        if not live:
+            return False, confidence, f"Spoof suspected (score {confidence:.2f})", faces
+        return True, confidence, "Live verified", live
+
+
+def check_clip(backend, state, frames, qualities, detect):
+    """Run a burst through `backend` frame by frame (unusable frames sit out).
+
+    `detect(frame)` returns a frame's faces when the backend has a profile.
+    Returns (is_live, confidence, message, best, faces): `best` is the index
+    of the frame to recognize, the live frame with the sharpest face (the
+    sharpest live frame in Haar mode), and `faces` the faces the backend
+    passed in it (None in Haar mode). A frame that failed its check is never
+    picked, so a sharp spoof after a live frame cannot be recognized.
+    """
+    is_live, confidence, message = False, 0.0, "No face detected"
+    best, best_faces, best_score = None, None, -1.0
+    for i, (frame, quality) in enumerate(zip(frames, qualities)):
+        if not quality.ok:
+            continue
+        faces = detect(frame) if backend.profile else None
+        live, conf, msg, faces = backend.check(state, frame, faces)
+        if not is_live:  # the first live frame decides
+            is_live, confidence, message = live, conf, msg
+        if not live:
+            continue
+        if faces is None:
+            score = quality.sharpness
+        else:
+            face = largest_face(faces)
+            score = region_sharpness(frame, face.bbox) if face is not None else -1.0
+        if score > best_score:
+            best, best_faces, best_score = i, faces, score
+    return is_live, confidence, message, best, best_faces
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_liveness_backend(name):
+    """Backend for the `liveness_backend` setting, built once per process.
+
+    If the ONNX model cannot be loaded, the heuristic backend is used
+    instead (and the error logged once).
+    """
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                if name == "onnx":
+                    try:
+                        backend = OnnxAntiSpoofLiveness()
+                        logger.info(f"Anti-spoofing model loaded, input {backend.input_size}")
+                    except Exception as e:
+                        logger.error(f"Anti-spoofing backend unavailable, using heuristic liveness: {e}")
+                        backend = HeuristicLiveness()
+                else:
+                    if name != "heuristic":
+                        logger.warning(f"Unknown liveness backend {name!r}, using heuristic")
+                    backend = HeuristicLiveness()
+                _backends[name] = backend
+    return backend
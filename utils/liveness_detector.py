@@ -6,13 +6,60 @@ Integration of all 5 enhancements:
 3. Adaptive Texture (Lighting Awareness)
 4. Time-window Voting System (Multi-frame analysis)
 5. Performance Optimization & Full Reset Functionality
+
+LandmarkLivenessDetector is the landmark mode: it reads the eye opening
+and head yaw from the faces InsightFace already detected for recognition,
+so a kiosk frame goes through one face detector instead of two or three.
 """
 
+import os
+
 import cv2
 import numpy as np
-from scipy.spatial import distance as dist
 import time
 
+# "landmarks" (InsightFace landmarks from the recognition pass) or "haar"
+LIVENESS_MODE = os.getenv("LIVENESS_MODE", "landmarks")
+# Eye aspect ratio below which an eye counts as closed
+_LIVENESS_EAR_THRESHOLD = float(os.getenv("LIVENESS_EAR_THRESHOLD", "0.2"))
+# Degrees of head yaw the face has to sweep to count as a head movement
+_LIVENESS_YAW_RANGE = float(os.getenv("LIVENESS_YAW_RANGE", "12"))
+
+# Per-session fields, saved between frames by the kiosk state store
+STATE_FIELDS = (
+    "BLINK_COUNTER", "TOTAL_BLINKS", "prev_nose_position", "movements_detected",
+    "last_direction", "direction_changes", "frame_results", "frame_count",
+    "cached_face_box",
+)
+
+_cascades = None
+
+
+def _load_cascades():
+    """Haar cascades, loaded once per process and shared by every detector."""
+    global _cascades
+    if _cascades is None:
+        try:
+            _cascades = (
+                cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'),
+                cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml'),
+            )
+        except Exception as e:
+            from utils.logger import logger
+            logger.error(f"Error loading cascade classifier: {e}")
+            return None, None
+    return _cascades
+
+
+def _plain(value):
+    """numpy scalars/arrays and tuples -> JSON-friendly Python values."""
+    if isinstance(value, (np.ndarray, tuple, list)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
 class LivenessDetector:
     def __init__(self):
         # --- 1. BLINK DETECTION VARIABLES ---
@@ -37,15 +84,8 @@ class LivenessDetector:
         self.cached_face_box = None
         self.face_detect_interval = 5  # Detect face every 5 frames for faster response
         
-        # Load Haar Cascades
-        try:
-            self.detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-        except Exception as e:
-            from utils.logger import logger
-            logger.error(f"Error loading cascade classifier: {e}")
-            self.detector = None
-            self.eye_cascade = None
+        # Load Haar Cascades (shared, so a detector per request is cheap)
+        self.detector, self.eye_cascade = _load_cascades()
 
     # --- MODULE 1: BLINK DETECTION ---
     def detect_blink(self, frame, face_coords):
@@ -182,6 +222,138 @@ class LivenessDetector:
         self.frame_count = 0
         self.cached_face_box = None
 
+    # --- STATE PERSISTENCE ---
+    def state_dict(self):
+        """Per-session state as a JSON-serializable dict."""
+        return {name: _plain(getattr(self, name)) for name in STATE_FIELDS}
+
+    def load_state(self, state):
+        """Continue a session saved with state_dict() (empty/None = fresh session)."""
+        self.reset()
+        for name in STATE_FIELDS:
+            if state and name in state:
+                setattr(self, name, state[name])
+
+# --- LANDMARK MODE ---
+# Eye contours (with the pupil centre) in InsightFace's 106-point 2D landmarks
+EYES_106 = (tuple(range(33, 43)), tuple(range(87, 97)))
+# Nose tip depth in front of the eyes, in inter-eye distances (yaw from kps)
+_NOSE_DEPTH = 0.6
+
+LANDMARK_STATE_FIELDS = ("closed_frames", "blinks", "yaw_min", "yaw_max", "frame_count")
+
+
+def eye_aspect_ratio(points):
+    """Eye opening: height across the corner-to-corner axis over the eye width.
+
+    Independent of the point order, so any eye contour works; about 0.3
+    for an open eye and under 0.15 for a closed one.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    dist2 = ((points[:, None, :] - points[None, :, :]) ** 2).sum(-1)
+    i, j = np.unravel_index(np.argmax(dist2), dist2.shape)
+    axis = points[j] - points[i]
+    width = float(np.hypot(axis[0], axis[1]))
+    if width == 0:
+        return 0.0
+    normal = np.array([-axis[1], axis[0]], dtype=np.float32) / width
+    offsets = (points - points[i]) @ normal
+    return float(offsets.max() - offsets.min()) / width
+
+
+def face_ear(face):
+    """Mean eye aspect ratio of an InsightFace face (None without 106 landmarks)."""
+    landmarks = face.get("landmark_2d_106")
+    if landmarks is None:
+        return None
+    return float(np.mean([eye_aspect_ratio(landmarks[list(eye)]) for eye in EYES_106]))
+
+
+def face_yaw(face):
+    """Head yaw in degrees: the 3D landmark pose if it ran, else from the 5 keypoints.
+
+    From the keypoints, the nose offset from the eyes' midpoint, measured
+    along the eye line and over the eye distance, is tan(yaw) times the
+    nose depth. Measuring along the eye line takes out head roll, so a flat
+    photo rotated in its own plane keeps a yaw near 0. A photo turned about
+    its vertical axis does not: its keypoints shift the way a head's do.
+    """
+    pose = face.get("pose")
+    if pose is not None:
+        return float(pose[1])
+    kps = face.get("kps")
+    if kps is None:
+        return None
+    left_eye, right_eye, nose = (np.asarray(p, dtype=np.float64) for p in kps[:3])
+    eye_line = right_eye - left_eye
+    eye_dist = float(np.hypot(*eye_line))
+    if eye_dist == 0:
+        return None
+    offset = float(np.dot(nose - (left_eye + right_eye) / 2, eye_line)) / eye_dist ** 2
+    return float(np.degrees(np.arctan(offset / _NOSE_DEPTH)))
+
+
+def largest_face(faces):
+    if not faces:
+        return None
+    return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+
+
+class LandmarkLivenessDetector:
+    """Blink and head-turn liveness from landmarks of an already detected face."""
+
+    def __init__(self, ear_threshold=_LIVENESS_EAR_THRESHOLD, yaw_range=_LIVENESS_YAW_RANGE):
+        self.ear_threshold = ear_threshold
+        self.yaw_range = yaw_range
+        self.reset()
+
+    def check_liveness(self, face):
+        """(is_live, confidence, message) after one more frame of `face` (None = no face)."""
+        if face is None:
+            return False, 0.0, "No face detected"
+        self.frame_count += 1
+
+        # Blink: the eyes close for at least two consecutive frames, then open again
+        ear = face_ear(face)
+        if ear is not None:
+            if ear < self.ear_threshold:
+                self.closed_frames += 1
+            else:
+                if self.closed_frames >= 2:  # one closed frame can be a landmark glitch
+                    self.blinks += 1
+                self.closed_frames = 0
+
+        # Head movement: range of yaw seen since the session started
+        yaw = face_yaw(face)
+        if yaw is not None:
+            self.yaw_min = yaw if self.yaw_min is None else min(self.yaw_min, yaw)
+            self.yaw_max = yaw if self.yaw_max is None else max(self.yaw_max, yaw)
+        swept = (self.yaw_max - self.yaw_min) if self.yaw_min is not None else 0.0
+
+        blink_detected = self.blinks >= 1
+        movement_detected = swept >= self.yaw_range
+        if blink_detected or movement_detected:
+            confidence = 0.5 + 0.5 * (blink_detected and movement_detected)
+            return True, confidence, "Live verified"
+        confidence = 0.5 * min(1.0, swept / self.yaw_range) if self.yaw_range else 0.0
+        return False, confidence, f"Analyzing... blink or turn your head slightly ({self.frame_count})"
+
+    def reset(self):
+        self.closed_frames = 0
+        self.blinks = 0
+        self.yaw_min = None
+        self.yaw_max = None
+        self.frame_count = 0
+
+    def state_dict(self):
+        return {name: getattr(self, name) for name in LANDMARK_STATE_FIELDS}
+
+    def load_state(self, state):
+        self.reset()
+        for name in LANDMARK_STATE_FIELDS:
+            if state and name in state:
+                setattr(self, name, state[name])
+
 # --- Execution Example ---
 if __name__ == "__main__":
     detector = LivenessDetector()
@@ -0,0 +1,159 @@
+"""
+ONNX Runtime execution plan for the InsightFace models.
+
+By default every ONNX session sizes its thread pool to all cores, so four
+gunicorn workers running the model in-process oversubscribe the CPU four
+times over. The plan gives each model process its share of the cores
+(cores / WEB_CONCURRENCY workers, or every core for the shared inference
+server) plus the configured execution mode, graph optimization level and
+providers (RECOGNITION_PROVIDER).
+
+    ORT_INTRA_OP_THREADS   threads per operator (0 = cores / workers)
+    ORT_INTER_OP_THREADS   threads across operators, parallel mode only (0 = 1)
+    ORT_EXECUTION_MODE     sequential | parallel
+    ORT_GRAPH_OPTIMIZATION disable | basic | extended | all
+"""
+import os
+
+import onnxruntime as ort
+from insightface.app import FaceAnalysis
+
+from utils.logger import logger
+
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+_GRAPH_OPTIMIZATIONS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+# RECOGNITION_PROVIDER shorthands
+_PROVIDER_ALIASES = {
+    "cpu": "CPUExecutionProvider",
+    "cuda": "CUDAExecutionProvider",
+    "gpu": "CUDAExecutionProvider",
+    "openvino": "OpenVINOExecutionProvider",
+    "dml": "DmlExecutionProvider",
+    "coreml": "CoreMLExecutionProvider",
+}
+
+
+def cpu_count():
+    """Cores this process may run on (honours CPU affinity / cgroup pinning)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def parse_providers(value):
+    """RECOGNITION_PROVIDER ("CPU", "CUDA", "CUDAExecutionProvider,CPU", ...) -> provider names.
+
+    Providers this onnxruntime build lacks are dropped, and the CPU provider
+    is always kept last as the fallback.
+    """
+    requested = []
+    for name in (value or "CPU").split(","):
+        name = name.strip()
+        if name:
+            requested.append(_PROVIDER_ALIASES.get(name.lower(), name))
+
+    available = set(ort.get_available_providers())
+    providers = []
+    for name in requested:
+        if name not in available:
+            logger.warning(f"ONNX Runtime provider {name} is not available, skipping")
+        elif name not in providers:
+            providers.append(name)
+    if "CPUExecutionProvider" in providers:
+        providers.remove("CPUExecutionProvider")
+    providers.append("CPUExecutionProvider")
+    return providers
+
+
+class OnnxPlan:
+    __slots__ = ("providers", "intra_op_threads", "inter_op_threads",
+                 "execution_mode", "graph_optimization", "cores", "workers")
+
+    def __init__(self, providers, intra_op_threads, inter_op_threads=1,
+                 execution_mode="sequential", graph_optimization="all", cores=None, workers=1):
+        if execution_mode not in _EXECUTION_MODES:
+            raise ValueError(f"Unknown ORT execution mode: {execution_mode}")
+        if graph_optimization not in _GRAPH_OPTIMIZATIONS:
+            raise ValueError(f"Unknown ORT graph optimization level: {graph_optimization}")
+        self.providers = list(providers)
+        self.intra_op_threads = max(1, int(intra_op_threads))
+        self.inter_op_threads = max(1, int(inter_op_threads))
+        self.execution_mode = execution_mode
+        self.graph_optimization = graph_optimization
+        self.cores = cores
+        self.workers = workers
+
+    @property
+    def uses_gpu(self):
+        return self.providers[0] != "CPUExecutionProvider"
+
+    def session_options(self):
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = self.intra_op_threads
+        opts.inter_op_num_threads = self.inter_op_threads
+        opts.execution_mode = _EXECUTION_MODES[self.execution_mode]
+        opts.graph_optimization_level = _GRAPH_OPTIMIZATIONS[self.graph_optimization]
+        # Threads would otherwise spin between requests, stealing CPU from other workers
+        opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        opts.add_session_config_entry("session.inter_op.allow_spinning", "0")
+        return opts
+
+    def describe(self):
+        return (f"providers={','.join(self.providers)} intra_op={self.intra_op_threads} "
+                f"inter_op={self.inter_op_threads} mode={self.execution_mode} "
+                f"graph_opt={self.graph_optimization} ({self.cores} cores / {self.workers} workers)")
+
+
+def plan_from_env(workers=None):
+    """Execution plan from the ORT_* / RECOGNITION_PROVIDER settings.
+
+    `workers` is how many processes load the model on this host (default
+    WEB_CONCURRENCY, gunicorn's worker count); automatic thread counts
+    split the cores between them.
+    """
+    if workers is None:
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    workers = max(1, workers)
+    cores = cpu_count()
+
+    intra = int(os.getenv("ORT_INTRA_OP_THREADS", "0")) or max(1, cores // workers)
+    inter = int(os.getenv("ORT_INTER_OP_THREADS", "0")) or 1
+    return OnnxPlan(
+        providers=parse_providers(os.getenv("RECOGNITION_PROVIDER", "CPU")),
+        intra_op_threads=intra,
+        inter_op_threads=inter,
+        execution_mode=os.getenv("ORT_EXECUTION_MODE", "sequential").lower(),
+        graph_optimization=os.getenv("ORT_GRAPH_OPTIMIZATION", "all").lower(),
+        cores=cores,
+        workers=workers,
+    )
+
+
+def apply_plan(app, plan):
+    """Recreate the ONNX sessions of a FaceAnalysis app under `plan`.
+
+    insightface only forwards `providers` to onnxruntime, so the sessions
+    it built are replaced by ones with the plan's SessionOptions.
+    """
+    opts = plan.session_options()
+    for model in app.models.values():
+        model.session = ort.InferenceSession(model.model_file, sess_options=opts,
+                                             providers=plan.providers)
+    logger.info(f"[+] ONNX Runtime plan: {plan.describe()}")
+    return app
+
+
+def load_face_analysis(name, plan, det_size=(640, 640)):
+    """FaceAnalysis(name) prepared with the given execution plan."""
+    app = FaceAnalysis(name=name, providers=plan.providers)
+    app.prepare(ctx_id=0 if plan.uses_gpu else -1, det_size=det_size)
+    return apply_plan(app, plan)
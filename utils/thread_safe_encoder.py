@@ -17,15 +17,32 @@ class ThreadSafeFaceEncoder:
         with self._lock:
             return self._encoder.load_all_embeddings()
     
+    def upsert_embedding(self, emp_id, emb):
+        """Thread-safe single-employee gallery update"""
+        with self._lock:
+            return self._encoder.upsert_embedding(emp_id, emb)
+    
+    def remove_embedding(self, emp_id):
+        """Thread-safe single-employee gallery removal"""
+        with self._lock:
+            return self._encoder.remove_embedding(emp_id)
+    
     def get_embedding(self, frame_rgb):
         """Thread-safe embedding extraction"""
         # InsightFace model is thread-safe for read operations
         return self._encoder.get_embedding(frame_rgb)
     
     def match(self, emb, threshold=None):
-        """Thread-safe embedding matching"""
-        with self._lock:
-            return self._encoder.match(emb, threshold)
+        """Embedding matching (lock-free: searches one immutable gallery snapshot)"""
+        return self._encoder.match(emb, threshold)
+    
+    def match_batch(self, embs, threshold=None, k=1):
+        """Batched embedding matching (lock-free, see match)"""
+        return self._encoder.match_batch(embs, threshold, k)
+    
+    def match_with_details(self, embs, threshold=None):
+        """Batched matching returning employee details (lock-free, see match)"""
+        return self._encoder.match_with_details(embs, threshold)
     
     def check_image_quality(self, image_path):
         """Thread-safe image quality check"""
@@ -33,9 +50,8 @@ class ThreadSafeFaceEncoder:
     
     @property
     def embeddings(self):
-        """Thread-safe access to embeddings list"""
-        with self._lock:
-            return self._encoder.embeddings.copy() if self._encoder.embeddings else []
+        """Float32 copy of the current gallery snapshot"""
+        return self._encoder.embeddings
     
     @property
     def app(self):